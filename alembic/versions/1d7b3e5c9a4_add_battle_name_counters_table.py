@@ -0,0 +1,28 @@
+"""Add battle_name_counters table.
+
+Revision ID: 1d7b3e5c9a4
+Revises: 3c1e8f0a2b7
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '1d7b3e5c9a4'
+down_revision = '3c1e8f0a2b7'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    # No need to fill this in; each count is worked out from the existing
+    # battles the first time it's needed
+    op.create_table('battle_name_counters',
+        sa.Column('base_name', sa.Unicode(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('base_name')
+    )
+
+
+def downgrade():
+    op.drop_table('battle_name_counters')
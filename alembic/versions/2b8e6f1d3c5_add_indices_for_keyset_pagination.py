@@ -0,0 +1,29 @@
+"""Add indices for keyset pagination.
+
+Revision ID: 2b8e6f1d3c5
+Revises: 52a9d4c7e1f
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '2b8e6f1d3c5'
+down_revision = '52a9d4c7e1f'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_index('ix_bank_transactions_trainer_id_id', 'bank_transactions',
+        ['trainer_id', 'id'])
+    op.create_index('ix_news_posts_post_time_id', 'news_posts',
+        ['post_time', 'id'])
+    op.create_index('ix_pokemon_pokemon_form_id_name_id', 'pokemon',
+        ['pokemon_form_id', 'name', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_pokemon_pokemon_form_id_name_id', 'pokemon')
+    op.drop_index('ix_news_posts_post_time_id', 'news_posts')
+    op.drop_index('ix_bank_transactions_trainer_id_id', 'bank_transactions')
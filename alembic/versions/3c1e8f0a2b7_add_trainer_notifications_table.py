@@ -0,0 +1,38 @@
+"""Add trainer_notifications table.
+
+Revision ID: 3c1e8f0a2b7
+Revises: 2979c1ca783
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3c1e8f0a2b7'
+down_revision = '2979c1ca783'
+
+from alembic import op
+import sqlalchemy as sa
+
+import asb.db
+
+
+def upgrade():
+    op.create_table('trainer_notifications',
+        sa.Column('trainer_id', sa.Integer(), nullable=False),
+        sa.Column('promotions', sa.Integer(), nullable=False),
+        sa.Column('form_uncertain', sa.Integer(), nullable=False),
+        sa.Column('unread_approved', sa.Integer(), nullable=False),
+        sa.Column('unread_denied', sa.Integer(), nullable=False),
+        sa.Column('unread_from_mod', sa.Integer(), nullable=False),
+        sa.Column('pending_gifts', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['trainer_id'], ['trainers.id'],
+            onupdate='cascade', ondelete='cascade'),
+        sa.PrimaryKeyConstraint('trainer_id')
+    )
+
+    # Fill it in for everyone who already exists
+    asb.db.TrainerNotifications.recount(bind=op.get_bind())
+
+
+def downgrade():
+    op.drop_table('trainer_notifications')
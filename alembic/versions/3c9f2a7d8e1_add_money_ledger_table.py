@@ -0,0 +1,38 @@
+"""Add money_ledger table.
+
+Revision ID: 3c9f2a7d8e1
+Revises: 2b8e6f1d3c5
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3c9f2a7d8e1'
+down_revision = '2b8e6f1d3c5'
+
+from alembic import op
+import sqlalchemy as sa
+
+money_ledger_id_seq = sa.Sequence('money_ledger_id_seq')
+
+def upgrade():
+    op.execute(sa.schema.CreateSequence(money_ledger_id_seq))
+
+    op.create_table('money_ledger',
+        sa.Column('id', sa.Integer(), money_ledger_id_seq, nullable=False),
+        sa.Column('trainer_id', sa.Integer(), nullable=False),
+        sa.Column('delta', sa.Integer(), nullable=False),
+        sa.Column('reason', sa.Unicode(), nullable=False),
+        sa.Column('timestamp', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['trainer_id'], ['trainers.id'],
+            onupdate='cascade', ondelete='cascade'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_money_ledger_trainer_id_id', 'money_ledger',
+        ['trainer_id', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_money_ledger_trainer_id_id', 'money_ledger')
+    op.drop_table('money_ledger')
+    op.execute(sa.schema.DropSequence(money_ledger_id_seq))
@@ -0,0 +1,29 @@
+"""Add indices on flavor edit times.
+
+Revision ID: 4a7d2e9c1b3
+Revises: 3c9f2a7d8e1
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '4a7d2e9c1b3'
+down_revision = '3c9f2a7d8e1'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_index('ix_ability_effects_edit_time', 'ability_effects',
+        ['edit_time'])
+    op.create_index('ix_item_effects_edit_time', 'item_effects',
+        ['edit_time'])
+    op.create_index('ix_move_effects_edit_time', 'move_effects',
+        ['edit_time'])
+
+
+def downgrade():
+    op.drop_index('ix_move_effects_edit_time', 'move_effects')
+    op.drop_index('ix_item_effects_edit_time', 'item_effects')
+    op.drop_index('ix_ability_effects_edit_time', 'ability_effects')
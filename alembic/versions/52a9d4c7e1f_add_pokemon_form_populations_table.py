@@ -0,0 +1,33 @@
+"""Add pokemon_form_populations table.
+
+Revision ID: 52a9d4c7e1f
+Revises: 1d7b3e5c9a4
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '52a9d4c7e1f'
+down_revision = '1d7b3e5c9a4'
+
+from alembic import op
+import sqlalchemy as sa
+
+import asb.db
+
+
+def upgrade():
+    op.create_table('pokemon_form_populations',
+        sa.Column('pokemon_form_id', sa.Integer(), nullable=False),
+        sa.Column('population', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['pokemon_form_id'], ['pokemon_forms.id'],
+            onupdate='cascade', ondelete='cascade'),
+        sa.PrimaryKeyConstraint('pokemon_form_id')
+    )
+
+    # Count everything that already exists
+    asb.db.PokemonFormPopulation.recount(bind=op.get_bind())
+
+
+def downgrade():
+    op.drop_table('pokemon_form_populations')
@@ -1,3 +1,5 @@
+import time
+
 from pyramid.authentication import AuthTktAuthenticationPolicy
 from pyramid.authorization import ACLAuthorizationPolicy
 from pyramid.config import Configurator
@@ -6,17 +8,32 @@ from sqlalchemy import engine_from_config
 from .db import DBSession, Base
 from .views import user
 from asb.resources import get_root
+import asb.assets
+import asb.autocomplete  # So its index gets built at warm-up
+import asb.db.ids
+import asb.output_cache
+import asb.passwords
+import asb.sprites  # So its manifest gets built at warm-up
+import asb.startup
 
 
 def main(global_config, **settings):
     """ This function returns a Pyramid WSGI application.
     """
+    start = time.perf_counter()
     settings.update(global_config)
+    asb.startup.configure_module_directory(settings)
     engine = engine_from_config(settings, 'sqlalchemy.')
     DBSession.configure(bind=engine)
     Base.metadata.bind = engine
+    asb.assets.configure(settings)
+    asb.autocomplete.configure(settings)
+    asb.passwords.configure(settings)
+    asb.db.ids.configure(settings)
+    asb.output_cache.configure(settings)
     config = Configurator(settings=settings, root_factory=get_root)
     config.include('pyramid_mako')
+    config.include('asb.output_cache')
 
     authn_policy = AuthTktAuthenticationPolicy(settings['secret'],
         callback=user.get_user_roles, hashalg='sha512', reissue_time=1728000,
@@ -24,12 +41,17 @@ def main(global_config, **settings):
     authz_policy = ACLAuthorizationPolicy()
     config.set_authentication_policy(authn_policy)
     config.set_authorization_policy(authz_policy)
+    config.add_request_method(user.get_principal, 'principal', reify=True)
     config.add_request_method(user.get_user, 'user', reify=True)
 
+    # Fingerprinted assets (see assets.py) never change, so they're cached
+    # forever; anything else in static is only cached for an hour
     config.add_static_view('static', 'static', cache_max_age=3600)
+    config.add_route('assets', '/assets/*subpath')
 
     # Add routes for one-off pages (most pages use traversal; see resources.py)
     config.add_route('home', '/')
+    config.add_route('autocomplete', '/autocomplete')
 
     config.add_route('register', '/register')
     config.add_route('validate', '/validate')
@@ -50,9 +72,28 @@ def main(global_config, **settings):
     config.add_route('bank.approve', '/bank/approve')
     config.add_route('bank.history', '/bank/history')
 
+    # The JSON API (see views/api.py)
+    config.add_route('api.species', '/api/v1/species')
+    config.add_route('api.moves', '/api/v1/moves')
+    config.add_route('api.trainer.pokemon',
+        r'/api/v1/trainers/{id:\d+}/pokemon')
+    config.add_route('api.battles', '/api/v1/battles')
+
     # A route to redirect away trailing slashes instead of just 404ing
     config.add_route('slash_redirect', '/{path:.+}/')
 
-    config.scan()
+    # Import and scan the views, keeping track of how long they take
+    import_timings = asb.startup.scan_views(config)
+    app = config.make_wsgi_app()
+
+    # Build caches etc. now, if so configured, instead of on first request
+    warm_up_timings = asb.startup.warm_up(config.registry, settings)
+
+    # Don't share pooled connections with any workers forked after this
+    engine.dispose()
+
+    if asb.startup.should_report(settings):
+        asb.startup.report(import_timings, warm_up_timings,
+            time.perf_counter() - start)
 
-    return config.make_wsgi_app()
+    return app
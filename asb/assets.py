@@ -0,0 +1,287 @@
+"""Fingerprinted, precompressed static assets.
+
+`asbassets` copies everything in asb/static into a build directory (by
+default asb/static/build) with a hash of its contents in its name, e.g.
+asb.css becomes asb.0123456789ab.css.  Compressible files (CSS etc.) also get
+.gz siblings, plus .br siblings if the brotli package is installed.  CSS
+url()s that point at other static files are rewritten to point at the
+fingerprinted versions.  A manifest.json in the build directory maps each
+original path to its fingerprinted one.
+
+A fingerprinted file's contents can never change, so they're served under
+/assets/ with a year-long max-age and Cache-Control: immutable, using the
+precompressed sibling that best suits the request's Accept-Encoding.
+
+Building again leaves the previous build's files alone, since workers still
+running the last deploy have the old manifest and keep handing out its URLs.
+Once they're gone, clear out everything the current manifest doesn't use with:
+
+    asbassets --prune
+
+Templates should get static URLs from url() (or h.asset() in Mako), which
+falls back to the plain /static/ URL if there's no manifest or the file isn't
+in it, so nothing breaks if the assets haven't been built.
+"""
+
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+
+import pkg_resources
+
+# Which files are worth compressing
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.json', '.svg', '.txt'}
+
+# Pairs of (Content-Encoding, file suffix), in order of preference
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+# url(/static/...) in CSS
+css_url_pattern = re.compile(
+    r'''url\(\s*(['"]?)/static/([^'")\s]+)\1\s*\)''')
+
+# A fingerprinted file name, e.g. asb.0123456789ab.css, maybe with a
+# compressed suffix
+fingerprinted_pattern = re.compile(
+    r'^.+\.[0-9a-f]{12}(\.[^.]+)?(' +
+    '|'.join(re.escape(suffix) for (encoding, suffix) in ENCODINGS) + ')?$')
+
+# Set up by configure()
+directory = None
+manifest = {}
+built_paths = {}
+version = ''
+modified = None
+
+def default_directory():
+    """Return the default build directory."""
+
+    return pkg_resources.resource_filename('asb', 'static/build')
+
+def fingerprint(path, data):
+    """Return the fingerprinted version of a path, given the file's contents.
+    """
+
+    (base, extension) = os.path.splitext(path)
+    digest = hashlib.sha1(data).hexdigest()[:12]
+    return '{0}.{1}{2}'.format(base, digest, extension)
+
+def compress(data):
+    """Return a dict of suffixes to compressed versions of data, for every
+    encoding we can do.
+    """
+
+    compressed = {}
+
+    # GzipFile instead of gzip.compress, so the output doesn't depend on the
+    # time
+    buffer = io.BytesIO()
+
+    with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=9,
+      mtime=0) as gzip_file:
+        gzip_file.write(data)
+
+    compressed['.gz'] = buffer.getvalue()
+
+    try:
+        import brotli
+    except ImportError:
+        pass
+    else:
+        compressed['.br'] = brotli.compress(data)
+
+    return compressed
+
+def rewrite_css(data, new_manifest):
+    """Point all the /static/ URLs in a stylesheet at their fingerprinted
+    versions.
+    """
+
+    def replace(match):
+        (quote, path) = match.groups()
+        entry = new_manifest.get(path)
+
+        if entry is None:
+            return match.group(0)
+
+        return 'url({0}/assets/{1}{0})'.format(quote, entry['path'])
+
+    css = data.decode('UTF-8')
+    return css_url_pattern.sub(replace, css).encode('UTF-8')
+
+def build(build_directory=None, log=print):
+    """Build every static file into build_directory, write the manifest, and
+    return it.
+
+    Files from earlier builds are left where they are; see prune().
+    """
+
+    if build_directory is None:
+        build_directory = default_directory()
+
+    static_directory = pkg_resources.resource_filename('asb', 'static')
+    build_directory = os.path.abspath(build_directory)
+
+    paths = []
+
+    for (dirpath, dirnames, filenames) in os.walk(static_directory):
+        if os.path.abspath(dirpath) == build_directory:
+            dirnames[:] = []
+            continue
+
+        for filename in filenames:
+            path = os.path.relpath(os.path.join(dirpath, filename),
+                static_directory)
+            paths.append(path.replace(os.sep, '/'))
+
+    # Do stylesheets last, so that everything they point to is already in the
+    # manifest
+    paths.sort(key=lambda path: (path.endswith('.css'), path))
+
+    new_manifest = {}
+
+    for path in paths:
+        with open(os.path.join(static_directory, path), 'rb') as source:
+            data = source.read()
+
+        if path.endswith('.css'):
+            data = rewrite_css(data, new_manifest)
+
+        built_path = fingerprint(path, data)
+        output_path = os.path.join(build_directory, built_path)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+        with open(output_path, 'wb') as output:
+            output.write(data)
+
+        encodings = []
+
+        if os.path.splitext(path)[1] in COMPRESSIBLE_EXTENSIONS:
+            compressed = compress(data)
+
+            for (encoding, suffix) in ENCODINGS:
+                # Only keep it if it's actually smaller
+                if len(compressed.get(suffix, data)) < len(data):
+                    with open(output_path + suffix, 'wb') as output:
+                        output.write(compressed[suffix])
+
+                    encodings.append(encoding)
+
+        new_manifest[path] = {'path': built_path, 'encodings': encodings}
+        log('  - {0} -> {1}'.format(path, built_path))
+
+    # Write it somewhere else and then move it into place, so that nothing
+    # ever reads a half-written manifest
+    manifest_path = os.path.join(build_directory, 'manifest.json')
+    os.makedirs(build_directory, exist_ok=True)
+
+    with open(manifest_path + '.new', 'w', encoding='UTF-8') as manifest_file:
+        json.dump(new_manifest, manifest_file, indent=1, sort_keys=True)
+
+    os.replace(manifest_path + '.new', manifest_path)
+
+    return new_manifest
+
+def prune(build_directory=None, log=print):
+    """Delete every built file that the current manifest doesn't use from
+    build_directory, and return how many there were.
+
+    Only fingerprinted files are touched, so nothing else that happens to live
+    in build_directory goes with them.
+    """
+
+    if build_directory is None:
+        build_directory = default_directory()
+
+    with open(os.path.join(build_directory, 'manifest.json'),
+      encoding='UTF-8') as manifest_file:
+        current_manifest = json.load(manifest_file)
+
+    keep = set()
+
+    for entry in current_manifest.values():
+        keep.add(entry['path'])
+        keep.update(entry['path'] + suffix for (encoding, suffix) in ENCODINGS)
+
+    pruned = 0
+
+    for (dirpath, dirnames, filenames) in os.walk(build_directory,
+      topdown=False):
+        for filename in filenames:
+            full_path = os.path.join(dirpath, filename)
+            path = os.path.relpath(full_path, build_directory)
+            path = path.replace(os.sep, '/')
+
+            if (path not in keep and fingerprinted_pattern.match(filename) and
+              not os.path.islink(full_path)):
+                os.remove(full_path)
+                log('  - deleted {0}'.format(path))
+                pruned += 1
+
+        # Tidy up any directories that are empty now
+        if dirpath != build_directory and not os.listdir(dirpath):
+            os.rmdir(dirpath)
+
+    return pruned
+
+def configure(settings):
+    """Load the manifest from the build directory named by the
+    asb.assets.directory setting (or the default one), if there is one.
+    """
+
+    global directory, manifest, built_paths, version, modified
+
+    directory = settings.get('asb.assets.directory') or default_directory()
+
+    manifest_path = os.path.join(directory, 'manifest.json')
+
+    try:
+        with open(manifest_path, encoding='UTF-8') as manifest_file:
+            manifest = json.load(manifest_file)
+
+        modified = os.path.getmtime(manifest_path)
+    except FileNotFoundError:
+        manifest = {}
+        modified = None
+
+    built_paths = {entry['path']: entry for entry in manifest.values()}
+
+    # A short hash of the manifest, which changes whenever any asset does
+    version = hashlib.sha1(json.dumps(manifest, sort_keys=True)
+        .encode('UTF-8')).hexdigest()[:16]
+
+def url(path):
+    """Return the URL for a static file, given its path relative to
+    asb/static.
+    """
+
+    entry = manifest.get(path)
+
+    if entry is None:
+        return '/static/{0}'.format(path)
+
+    return '/assets/{0}'.format(entry['path'])
+
+def main(argv=None):
+    """Build the assets."""
+
+    parser = argparse.ArgumentParser(
+        description='Build fingerprinted, precompressed static assets.')
+    parser.add_argument('-d', '--directory', default=None,
+        help='Where to put them (default: asb/static/build).')
+    parser.add_argument('--prune', action='store_true',
+        help='Also delete files from earlier builds.  Only do this once '
+        'nothing running still uses them.')
+    args = parser.parse_args(argv)
+
+    print('Building assets...')
+    built = build(args.directory)
+    print('Built {0} assets.'.format(len(built)))
+
+    if args.prune:
+        print('Pruning old assets...')
+        pruned = prune(args.directory)
+        print('Deleted {0} old files.'.format(pruned))
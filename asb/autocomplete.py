@@ -0,0 +1,370 @@
+"""In-memory autocompletion for species, items, moves and trainers.
+
+Names are reduced to lowercase letters and digits (so "Mr. Mime", "mr mime"
+and "MRMIME" all match), and then matched in a few ways, best first:
+
+- the whole name, exactly;
+- the start of the name (e.g. "pika" for Pikachu);
+- the start of any later word in the name (e.g. "mime" for Mr. Mime);
+- the start of the name with a typo or two (e.g. "pikahcu"), found by
+  looking up names that share three-letter chunks with the query and then
+  checking the edit distance.
+
+The Pokédex side is built once per process (see asb.pokedex).  The trainer
+side is built on first use, kept up to date as trainers in this process
+validate, change names, get banned or delete their accounts (see
+refresh_trainers), and rebuilt from scratch every asb.autocomplete.trainer_ttl
+seconds to pick up changes made by other workers.
+"""
+
+import bisect
+import collections
+import threading
+import time
+
+import sqlalchemy as sqla
+import sqlalchemy.orm
+import transaction
+
+from asb import db
+import asb.pokedex
+
+KINDS = ('species', 'item', 'move', 'trainer')
+
+Suggestion = collections.namedtuple('Suggestion', ['kind', 'name', 'path'])
+Suggestion.__doc__ = """Something to suggest.
+
+- kind: One of KINDS.
+- name: Its name, for display.
+- path: The path to its page.
+"""
+
+# Match tiers, for ranking
+EXACT = 0
+PREFIX = 1
+WORD_PREFIX = 2
+TYPO = 3
+
+def normalize(text):
+    """Reduce text to lowercase ASCII letters and digits, for matching."""
+
+    try:
+        return db.helpers.identifier(text).replace('-', '')
+    except ValueError:
+        return ''
+
+def trigrams(key):
+    """Return the set of three-character chunks of a normalized key."""
+
+    return {key[n:n + 3] for n in range(max(len(key) - 2, 1))}
+
+def edit_distance(a, b, limit):
+    """Return the number of insertions, deletions, substitutions and
+    transpositions it takes to turn a into b, or limit + 1 if it's more than
+    limit.
+    """
+
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    previous_row = None
+    row = list(range(len(b) + 1))
+
+    for (i, a_char) in enumerate(a, 1):
+        (previous_row, row) = (row, [i] + [0] * len(b))
+
+        for (j, b_char) in enumerate(b, 1):
+            row[j] = min(
+                previous_row[j] + 1,
+                row[j - 1] + 1,
+                previous_row[j - 1] + (a_char != b_char)
+            )
+
+            if (i > 1 and j > 1 and a_char == b[j - 2] and
+              a[i - 2] == b_char):
+                row[j] = min(row[j], two_rows_ago[j - 2] + 1)
+
+        if min(row) > limit:
+            return limit + 1
+
+        two_rows_ago = previous_row
+
+    return min(row[-1], limit + 1)
+
+def typo_limit(key):
+    """Return how many typos to allow in a query."""
+
+    if len(key) < 3:
+        return 0
+    elif len(key) < 6:
+        return 1
+    else:
+        return 2
+
+class AutocompleteIndex:
+    """A prefix and trigram index over some Suggestions, each with a unique,
+    hashable ID.
+    """
+
+    def __init__(self, suggestions=()):
+        self.suggestions = {}
+        self.full_keys = {}
+
+        # A sorted list of (key, ID) pairs, with one key for the whole name
+        # and one for each later word onwards
+        self.keys = []
+        self.trigrams = collections.defaultdict(set)
+
+        for (id, suggestion) in suggestions:
+            self.add(id, suggestion)
+
+    def add(self, id, suggestion):
+        """Add (or replace) a suggestion."""
+
+        if id in self.suggestions:
+            self.remove(id)
+
+        words = db.helpers.identifier(suggestion.name).split('-')
+        full_key = ''.join(words)
+
+        self.suggestions[id] = suggestion
+        self.full_keys[id] = full_key
+
+        for n in range(len(words)):
+            bisect.insort(self.keys, (''.join(words[n:]), id))
+
+        for trigram in trigrams(full_key):
+            self.trigrams[trigram].add(id)
+
+    def remove(self, id):
+        """Remove a suggestion, if it's there."""
+
+        if id not in self.suggestions:
+            return
+
+        suggestion = self.suggestions.pop(id)
+        full_key = self.full_keys.pop(id)
+        words = db.helpers.identifier(suggestion.name).split('-')
+
+        for n in range(len(words)):
+            key = (''.join(words[n:]), id)
+            index = bisect.bisect_left(self.keys, key)
+
+            if index < len(self.keys) and self.keys[index] == key:
+                del self.keys[index]
+
+        for trigram in trigrams(full_key):
+            self.trigrams[trigram].discard(id)
+
+    def search(self, key, limit, kinds=None):
+        """Return a list of (rank, suggestion) pairs matching a normalized key,
+        best first.  There might be more than limit of them.
+        """
+
+        matches = {}
+
+        def match(id, tier, distance=0):
+            suggestion = self.suggestions[id]
+
+            if kinds is not None and suggestion.kind not in kinds:
+                return
+
+            rank = (tier, distance, len(suggestion.name), suggestion.name)
+
+            if id not in matches or rank < matches[id]:
+                matches[id] = rank
+
+        # Prefix matches.  Short queries could match a lot of names, so don't
+        # look through all of them
+        start = bisect.bisect_left(self.keys, (key,))
+
+        for (word_key, id) in self.keys[start:start + limit * 20]:
+            if not word_key.startswith(key):
+                break
+
+            full_key = self.full_keys[id]
+
+            if full_key == key:
+                match(id, EXACT)
+            elif full_key == word_key:
+                match(id, PREFIX)
+            else:
+                match(id, WORD_PREFIX)
+
+        # Typos, if we don't have enough already
+        max_typos = typo_limit(key)
+
+        if len(matches) < limit and max_typos:
+            key_trigrams = trigrams(key)
+            shared = collections.Counter()
+
+            for trigram in key_trigrams:
+                shared.update(self.trigrams.get(trigram, ()))
+
+            # Each typo can spoil at most three chunks
+            min_shared = max(len(key_trigrams) - 3 * max_typos, 1)
+
+            for (id, count) in shared.most_common(limit * 2):
+                if count < min_shared:
+                    break
+                elif id in matches:
+                    continue
+
+                # Compare against the start of the name, give or take a
+                # letter, so typos in half-typed names still match
+                full_key = self.full_keys[id]
+                distance = min(
+                    edit_distance(key, full_key[:length], max_typos)
+                    for length in range(len(key) - 1, len(key) + 2)
+                )
+
+                if distance <= max_typos:
+                    match(id, TYPO, distance)
+
+        return [(rank, self.suggestions[id]) for (id, rank) in matches.items()]
+
+@asb.pokedex.cached
+def pokedex_index():
+    """Build and return the index of species, items and moves."""
+
+    session = sqla.orm.Session(bind=db.DBSession.bind)
+
+    try:
+        species = session.query(db.PokemonSpecies.identifier,
+            db.PokemonSpecies.name).all()
+        items = session.query(db.Item.identifier, db.Item.name).all()
+        moves = session.query(db.Move.identifier, db.Move.name).all()
+    finally:
+        session.close()
+
+    suggestions = []
+
+    for (kind, directory, rows) in [('species', 'species', species),
+                                    ('item', 'items', items),
+                                    ('move', 'moves', moves)]:
+        for (identifier, name) in rows:
+            path = '/{0}/{1}'.format(directory, identifier)
+            suggestions.append(
+                ((kind, identifier), Suggestion(kind, name, path)))
+
+    return AutocompleteIndex(suggestions)
+
+def has(kind, identifier):
+    """Return whether there's a species, item or move with this identifier,
+    without going to the database.
+    """
+
+    return (kind, identifier) in pokedex_index().suggestions
+
+# The trainer index, and when it has to be rebuilt
+_trainer_index = None
+_trainer_index_expiry = 0
+_trainer_lock = threading.Lock()
+trainer_ttl = 300
+
+def configure(settings):
+    """Set how long the trainer index lasts from the app settings."""
+
+    global trainer_ttl
+
+    trainer_ttl = float(settings.get('asb.autocomplete.trainer_ttl', 300))
+
+def trainer_suggestions(session, trainer_ids=None):
+    """Return (ID, Suggestion) pairs for active trainers, optionally only
+    the ones with the given IDs.
+    """
+
+    query = (
+        session.query(db.Trainer.id, db.Trainer.identifier, db.Trainer.name)
+        .filter(db.Trainer.is_active())
+    )
+
+    if trainer_ids is not None:
+        query = query.filter(db.Trainer.id.in_(trainer_ids))
+
+    return [
+        (trainer_id, Suggestion('trainer', name,
+                                '/trainers/{0}'.format(identifier)))
+        for (trainer_id, identifier, name) in query
+    ]
+
+def trainer_index():
+    """Return the trainer index, (re)building it if necessary."""
+
+    global _trainer_index, _trainer_index_expiry
+
+    with _trainer_lock:
+        if _trainer_index is None or _trainer_index_expiry <= time.monotonic():
+            session = sqla.orm.Session(bind=db.DBSession.bind)
+
+            try:
+                _trainer_index = AutocompleteIndex(
+                    trainer_suggestions(session))
+            finally:
+                session.close()
+
+            _trainer_index_expiry = time.monotonic() + trainer_ttl
+
+        return _trainer_index
+
+def refresh_trainers(*trainer_ids):
+    """Update these trainers in the trainer index once the current transaction
+    commits, adding or removing them depending on whether they're active.
+    """
+
+    def refresh(success):
+        if not success or _trainer_index is None:
+            return
+
+        session = sqla.orm.Session(bind=db.DBSession.bind)
+
+        try:
+            suggestions = dict(trainer_suggestions(session, trainer_ids))
+        finally:
+            session.close()
+
+        with _trainer_lock:
+            for trainer_id in trainer_ids:
+                if trainer_id in suggestions:
+                    _trainer_index.add(trainer_id, suggestions[trainer_id])
+                else:
+                    _trainer_index.remove(trainer_id)
+
+    transaction.get().addAfterCommitHook(refresh)
+
+def suggest(query, kinds=None, limit=10):
+    """Return a list of up to limit Suggestions for a query, best first.
+
+    kinds, if given, should be a collection of the KINDS to include.
+    """
+
+    key = normalize(query)
+
+    if not key:
+        return []
+
+    results = []
+
+    if kinds is None or set(kinds) - {'trainer'}:
+        results.extend(pokedex_index().search(key, limit, kinds))
+
+    if kinds is None or 'trainer' in kinds:
+        index = trainer_index()
+
+        with _trainer_lock:
+            results.extend(index.search(key, limit, kinds))
+
+    results.sort(key=lambda result: result[0])
+    return [suggestion for (rank, suggestion) in results[:limit]]
+
+def did_you_mean(query, kind):
+    """Return a " Did you mean ...?" hint for an error message about a
+    nonexistent thing of the given kind, or '' if there's nothing to suggest.
+    """
+
+    suggestions = suggest(query, kinds={kind}, limit=1)
+
+    if not suggestions:
+        return ''
+
+    return '  Did you mean {0}?'.format(suggestions[0].name)
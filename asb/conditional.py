@@ -0,0 +1,206 @@
+"""Conditional GET for dex pages.
+
+A dex page only changes when the Pokédex data does (i.e. on `asbdb update`),
+or when someone edits the flavor text of a move, ability or item it shows.  So
+each dex response gets a strong ETag built from exactly those things, and a
+request that already has the current version gets a 304 before the view even
+runs.
+
+Species pages also show league data (populations and the census), which has
+no cheap version to go by, so they aren't validated at all; the output cache
+only keeps them briefly instead.
+
+Only anonymous pages are validated.  Logged-in pages have the user menu, and
+pages with flash messages have the flash messages, neither of which the ETag
+knows about, so those are always rendered in full.  Even anonymous pages
+carry a login form with a per-session CSRF token, so the ETag is salted with
+a hash of the session's token; two visitors never share a validator.
+"""
+
+import datetime
+import functools
+import hashlib
+import os
+
+import pkg_resources
+import pyramid.httpexceptions as httpexc
+import sqlalchemy as sqla
+
+from asb import db
+import asb.assets
+import asb.pokedex
+import asb.resources
+import asb.startup
+
+# Which flavor edits show up on which pages, by context
+flavor_tables = {
+    asb.resources.AbilityIndex: (db.AbilityEffect,),
+    db.Ability: (db.AbilityEffect, db.MoveEffect),
+    asb.resources.ItemIndex: (db.ItemEffect,),
+    db.Item: (db.ItemEffect,),
+    asb.resources.MoveIndex: (db.MoveEffect,),
+    db.Move: (db.MoveEffect,),
+    asb.resources.TypeIndex: (),
+    db.Type: (db.MoveEffect,)
+}
+
+_code_modified = None
+
+def code_version():
+    """Return a hash of the templates (see asb.startup.template_version) and
+    the asset manifest (see asb.assets), so that deploying new templates or
+    assets invalidates everyone's ETags, along with the time of the most
+    recent change to them or the Pokédex CSVs.
+    """
+
+    global _code_modified
+
+    if _code_modified is None:
+        modified = asb.assets.modified or 0
+
+        for directory in ['templates', 'db/data']:
+            root = pkg_resources.resource_filename('asb', directory)
+
+            for (dirpath, dirnames, filenames) in os.walk(root):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    modified = max(modified, os.path.getmtime(path))
+
+        _code_modified = datetime.datetime.fromtimestamp(modified,
+            datetime.timezone.utc)
+
+    version = '{0}.{1}'.format(asb.startup.template_version(),
+        asb.assets.version)
+
+    return (version, _code_modified)
+
+def last_flavor_edit(effect_tables, request=None):
+    """Return the time of the latest edit to any of the given *Effect tables,
+    or None if they're empty.
+
+    If request is given, each table is only looked at once per request, no
+    matter how many times this gets called.
+    """
+
+    if not effect_tables:
+        return None
+
+    if request is None:
+        known = {}
+    else:
+        known = request.environ.setdefault('asb.conditional.flavor_edits', {})
+
+    missing = [table for table in effect_tables if table not in known]
+
+    if missing:
+        # Each subquery needs its own label, or SQLAlchemy can't tell their
+        # columns apart in the result
+        edit_times = [
+            sqla.select([sqla.func.max(table.edit_time)]).as_scalar()
+            .label('edit_time_{0}'.format(n))
+            for (n, table) in enumerate(missing)
+        ]
+
+        known.update(zip(missing, db.DBSession.query(*edit_times).one()))
+
+    edit_times = [known[table] for table in effect_tables
+                  if known[table] is not None]
+
+    if not edit_times:
+        return None
+
+    return max(edit_times).replace(tzinfo=datetime.timezone.utc)
+
+def page_version(context, request):
+    """Return a (version, last_modified) pair for a dex page, where version is
+    a hash of everything the page depends on.
+    """
+
+    (code_hash, code_modified) = code_version()
+    flavor_edited = last_flavor_edit(flavor_tables.get(type(context), ()),
+        request)
+
+    parts = [
+        asb.pokedex.data_version(),
+        code_hash,
+        flavor_edited.isoformat() if flavor_edited else ''
+    ]
+
+    version = hashlib.sha1('|'.join(parts).encode('UTF-8')).hexdigest()
+
+    if flavor_edited is not None:
+        last_modified = max(code_modified, flavor_edited)
+    else:
+        last_modified = code_modified
+
+    # HTTP dates only go down to the second
+    last_modified = last_modified.replace(microsecond=0)
+
+    return (version, last_modified)
+
+def etag(version, request):
+    """Return the ETag for a version of a page, salted with the session's CSRF
+    token.
+    """
+
+    csrf_token = request.session.get_csrf_token()
+    parts = [version, hashlib.sha1(csrf_token.encode('UTF-8')).hexdigest()]
+
+    return hashlib.sha1('|'.join(parts).encode('UTF-8')).hexdigest()
+
+def is_not_modified(request, etag, last_modified):
+    """Check the request's conditional headers against the page's validators.
+    """
+
+    if request.if_none_match:
+        # If-Modified-Since is ignored when there's an If-None-Match
+        return etag in request.if_none_match
+    elif request.if_modified_since is not None and last_modified is not None:
+        return last_modified <= request.if_modified_since
+    else:
+        return False
+
+def conditional_response(request, version, last_modified, render):
+    """Return a 304 if the request already has this version of the page, or
+    else whatever render() returns, with the page's validators either way.
+    """
+
+    page_etag = etag(version, request)
+
+    if is_not_modified(request, page_etag, last_modified):
+        response = httpexc.HTTPNotModified()
+    else:
+        response = render()
+
+    response.headers.update({
+        'Cache-Control': 'no-cache',
+        'Vary': 'Cookie'
+    })
+    response.etag = page_etag
+    response.last_modified = last_modified
+
+    return response
+
+def conditional_get(view):
+    """Decorate a dex view so that anonymous requests get an ETag, and a 304
+    if they already have the current version of the page.
+
+    Use it with view_config(decorator=...).  The validators are checked before
+    the view is called, so a 304 skips both the view and the renderer.  They're
+    also left in the environ, for the output cache to keep with the page.
+    """
+
+    @functools.wraps(view)
+    def wrapper(context, request):
+        if (request.method not in ('GET', 'HEAD') or
+          request.unauthenticated_userid is not None or
+          request.session.peek_flash()):
+            return view(context, request)
+
+        (version, last_modified) = page_version(context, request)
+        request.environ['asb.conditional.version'] = (version, last_modified)
+
+        return conditional_response(request, version, last_modified,
+            lambda: view(context, request))
+
+    return wrapper
@@ -1 +1,2 @@
 from .tables import *
+from . import ids
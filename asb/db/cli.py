@@ -62,6 +62,29 @@ def command_init(connection, alembic_config):
         print('  - {0}...'.format(table.name))
         load_table(table, connection)
 
+    # Give every form a population row
+    command_recount_populations(connection, alembic_config)
+
+def command_recount_notifications(connection, alembic_config):
+    """Recompute every trainer's bulletin notification counters from scratch.
+
+    alembic_config is unused; it's only there so that all the command methods
+    take the same arguments.
+    """
+
+    print('Recounting trainer notifications...')
+    asb.db.TrainerNotifications.recount(bind=connection)
+
+def command_recount_populations(connection, alembic_config):
+    """Recompute how many active Pokémon of each form there are from scratch.
+
+    alembic_config is unused; it's only there so that all the command methods
+    take the same arguments.
+    """
+
+    print('Recounting Pokémon form populations...')
+    asb.db.PokemonFormPopulation.recount(bind=connection)
+
 def command_update(connection, alembic_config):
     """Update the database by running alembic migrations and then reloading all
     the Pokédex tables from the CSVs.
@@ -121,6 +144,9 @@ def command_update(connection, alembic_config):
     for sequence_name, value in player_table_sequences.items():
         connection.execute(sqla.func.setval(sequence_name, value, False))
 
+    # Forms might have been added or removed
+    command_recount_populations(connection, alembic_config)
+
 def get_alembic_config(config_path, echo):
     """Create and return an alembic config."""
 
@@ -165,6 +191,16 @@ def get_parser():
         help='Update the data CSVs from the contents of the database.')
     dump_parser.set_defaults(func=command_dump)
 
+    # recount-notifications command
+    recount_parser = subparsers.add_parser('recount-notifications',
+        help="Recompute trainers' home page notification counts.")
+    recount_parser.set_defaults(func=command_recount_notifications)
+
+    # recount-populations command
+    populations_parser = subparsers.add_parser('recount-populations',
+        help='Recompute how many Pokémon of each form there are.')
+    populations_parser.set_defaults(func=command_recount_populations)
+
     return parser
 
 def load_table(table, connection):
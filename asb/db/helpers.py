@@ -56,3 +56,23 @@ def roman_numeral(n):
         n -= number * numeral_count
 
     return ''.join(result)
+
+def parse_roman_numeral(numeral):
+    """Turn a roman numeral, as written by roman_numeral, back into a number.
+
+    Raise ValueError if it isn't one.
+    """
+
+    n = 0
+    rest = numeral
+
+    for number, literal in roman_literals:
+        while rest.startswith(literal):
+            n += number
+            rest = rest[len(literal):]
+
+    # Checking the round trip weeds out things like IIII
+    if rest or not n or roman_numeral(n) != numeral:
+        raise ValueError('{0!r} is not a roman numeral'.format(numeral))
+
+    return n
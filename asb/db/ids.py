@@ -0,0 +1,90 @@
+"""Hand out IDs for new rows ahead of time, in blocks.
+
+Some rows need their IDs before they're inserted (e.g. so that a Pokémon's
+identifier can include its ID).  Rather than asking the sequence for one ID at
+a time, each worker reserves a block of IDs in a single statement and hands
+them out until it runs out.  IDs therefore won't always be handed out in
+order across workers, and a worker's leftover IDs are simply never used.
+
+On Postgres, blocks come from the sequences with nextval().  Databases without
+sequences (i.e. SQLite, for development) instead count up from the table's
+current max ID, which only works with a single process.
+"""
+
+import collections
+import threading
+
+import sqlalchemy as sqla
+
+from .tables import DBSession, BankTransaction, Battle, Pokemon
+
+class BlockAllocator:
+    """An allocator for one sequence."""
+
+    def __init__(self, sequence, column, block_size=20):
+        self.sequence = sequence
+        self.column = column
+        self.block_size = block_size
+        self.pool = collections.deque()
+        self.lock = threading.Lock()
+
+        # For databases without sequences: the last ID we handed out
+        self.last_id = None
+
+    def allocate(self, n, session=None):
+        """Return a sorted list of n unused IDs."""
+
+        if session is None:
+            session = DBSession
+
+        with self.lock:
+            if len(self.pool) < n:
+                wanted = max(self.block_size, n - len(self.pool))
+                self.pool.extend(self.reserve(wanted, session))
+
+            return sorted(self.pool.popleft() for _ in range(n))
+
+    def next_id(self, session=None):
+        """Return a single unused ID."""
+
+        (id,) = self.allocate(1, session)
+        return id
+
+    def reserve(self, n, session):
+        """Reserve n more IDs from the database and return them in order."""
+
+        dialect = session.get_bind().dialect
+
+        if dialect.name == 'postgresql':
+            # One round trip for the whole block
+            ids = session.execute(
+                sqla.select([self.sequence.next_value()])
+                .select_from(sqla.func.generate_series(1, n).alias())
+            )
+
+            return sorted(id for (id,) in ids)
+        elif dialect.supports_sequences:
+            return [session.execute(self.sequence) for _ in range(n)]
+        else:
+            # No sequences; pick up from the highest ID in use (or that we've
+            # handed out, since those might not have been inserted yet)
+            (max_id,) = session.query(sqla.func.max(self.column)).one()
+            first_id = max(max_id or 0, self.last_id or 0) + 1
+            self.last_id = first_id + n - 1
+
+            return list(range(first_id, first_id + n))
+
+pokemon = BlockAllocator(Pokemon.pokemon_id_seq, Pokemon.id)
+battles = BlockAllocator(Battle.battles_id_seq, Battle.id)
+bank_transactions = BlockAllocator(BankTransaction.__table__.c.id.default,
+                                   BankTransaction.id)
+
+allocators = [pokemon, battles, bank_transactions]
+
+def configure(settings):
+    """Set the block size from the app settings."""
+
+    block_size = int(settings.get('asb.id_block_size', 20))
+
+    for allocator in allocators:
+        allocator.block_size = block_size
@@ -1,18 +1,22 @@
+import collections
+import contextlib
 import datetime
 
-import pbkdf2
 import pyramid.security as sec
-from sqlalchemy import (Column, ForeignKey, ForeignKeyConstraint,
+from sqlalchemy import (Column, ForeignKey, ForeignKeyConstraint, Index,
     UniqueConstraint, Sequence, func)
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.ext.hybrid import hybrid_method
 from sqlalchemy.orm import relationship, scoped_session, sessionmaker
+import sqlalchemy.exc
+import sqlalchemy.orm.util
 import sqlalchemy.schema
 from sqlalchemy.sql import and_, or_
 from sqlalchemy.types import *
 from zope.sqlalchemy import ZopeTransactionExtension
 
+import asb.passwords
 import asb.tcodf
 from . import helpers
 
@@ -474,6 +478,9 @@ class AbilityEffect(PlayerTable):
     notes = Column(Unicode, nullable=False)
     is_current = Column(Boolean, nullable=False, default=True)
 
+    # For finding the latest edit (see asb.conditional)
+    __table_args__ = (Index('ix_ability_effects_edit_time', edit_time),)
+
 class BankTransaction(PlayerTable):
     """A bank transaction."""
 
@@ -493,6 +500,10 @@ class BankTransaction(PlayerTable):
     approver_id = Column(Integer, ForeignKey('trainers.id',
         onupdate='cascade'), nullable=True)
 
+    # For paging through a trainer's history
+    __table_args__ = (Index('ix_bank_transactions_trainer_id_id', trainer_id,
+        id),)
+
     @property
     def link(self):
         return asb.tcodf.post_link(self.tcod_post_id)
@@ -559,27 +570,62 @@ class Battle(PlayerTable):
 
         return asb.tcodf.thread_link(self.tcodf_thread_id)
 
-    def set_auto_name(self):
+    @classmethod
+    def awaiting_approval(class_, trainer_id=None):
+        """Return a query for closed battles that need their prizes approved.
+
+        If trainer_id is given, leave out any battles that trainer can't
+        approve because they battled in or are reffing them — the same rules
+        as in __acl__, but without having to load every battle's teams.
+        """
+
+        query = (
+            DBSession.query(class_)
+            .filter(class_.needs_approval, class_.end_date.isnot(None))
+        )
+
+        if trainer_id is not None:
+            reffed = (
+                sqlalchemy.sql.exists()
+                .where(BattleReferee.battle_id == class_.id)
+                .where(BattleReferee.trainer_id == trainer_id)
+                .where(BattleReferee.is_current_ref)
+            )
+
+            battled = (
+                sqlalchemy.sql.exists()
+                .where(BattleTrainer.battle_id == class_.id)
+                .where(BattleTrainer.trainer_id == trainer_id)
+            )
+
+            query = query.filter(~reffed, ~battled)
+
+        return query.order_by(class_.id)
+
+    def set_auto_name(self, teams=None):
         """Automatically generate a name for this battle, then set its
         identifier.
+
+        teams can be a list of lists of trainer names, for when the battle's
+        teams haven't been loaded (or created through the ORM at all).
         """
 
+        if teams is None:
+            teams = [[trainer.name for trainer in team.trainers]
+                     for team in self.teams]
+
         # Start with something like "A and B vs C and D"
-        base_name = name = ' vs '.join(
-            ' and '.join(trainer.name for trainer in team.trainers)
-            for team in self.teams
-        )
+        base_name = ' vs '.join(' and '.join(team) for team in teams)
 
-        # If necessary, bump a roman numeral until we get a unique name
+        # If this isn't the first time, add a roman numeral
         # e.g. "A and B vs C and D II"
-        n = 1
+        n = BattleNameCounter.bump(base_name)
 
-        while DBSession.query(Battle).filter_by(name=name).count():
-            n += 1
-            name = '{} {}'.format(base_name, helpers.roman_numeral(n))
+        if n == 1:
+            self.name = base_name
+        else:
+            self.name = '{} {}'.format(base_name, helpers.roman_numeral(n))
 
-        # Go for it
-        self.name = name
         self.set_identifier()
 
     def set_identifier(self):
@@ -587,6 +633,49 @@ class Battle(PlayerTable):
 
         self.identifier = helpers.identifier(self.name, id=self.id)
 
+    def acl_principals(self):
+        """Return a (ref, battlers) pair of ACL principals: the current ref's
+        (or None), and a frozenset of the battlers'.
+
+        They come from one small query instead of loading the ref, the teams
+        and every team's trainers, and they're kept on the instance, so all
+        the permission checks in a request share them.
+        """
+
+        cached = self.__dict__.get('_acl_principals')
+
+        if cached is not None:
+            return cached
+
+        refs = (
+            sqlalchemy.sql.select([sqlalchemy.sql.true(),
+                                   BattleReferee.trainer_id])
+            .where(BattleReferee.battle_id == self.id)
+            .where(BattleReferee.is_current_ref)
+        )
+
+        battlers = (
+            sqlalchemy.sql.select([sqlalchemy.sql.false(),
+                                   BattleTrainer.trainer_id])
+            .where(BattleTrainer.battle_id == self.id)
+            .where(BattleTrainer.trainer_id.isnot(None))
+        )
+
+        ref = None
+        trainers = set()
+
+        for (is_ref, trainer_id) in DBSession.execute(
+          sqlalchemy.sql.union_all(refs, battlers)):
+            principal = 'user:{}'.format(trainer_id)
+
+            if is_ref:
+                ref = principal
+            else:
+                trainers.add(principal)
+
+        self._acl_principals = (ref, frozenset(trainers))
+        return self._acl_principals
+
     @property
     def __acl__(self):
         """Return an list of permissions for Pyramid's authorization."""
@@ -594,17 +683,7 @@ class Battle(PlayerTable):
         permissions = []
 
         # Get ACL identifiers for ref + battlers
-        if self.ref is not None:
-            ref = 'user:{}'.format(self.ref.id)
-        else:
-            ref = None
-
-        trainers = [
-            'user:{}'.format(trainer.trainer_id)
-            for team in self.teams
-            for trainer in team.trainers
-            if trainer.trainer_id is not None
-        ]
+        (ref, trainers) = self.acl_principals()
 
         if self.end_date is None:
             # Battle's still going on
@@ -652,6 +731,127 @@ class Battle(PlayerTable):
 
         return self.identifier
 
+class BattleNameCounter(PlayerTable):
+    """A count of how many battles have been given a particular automatic
+    name, so that the next one can be numbered without looking at them all.
+
+    count is the highest numeral used so far, where the first battle (which
+    doesn't get a numeral) counts as one.
+    """
+
+    __tablename__ = 'battle_name_counters'
+
+    base_name = Column(Unicode, primary_key=True)
+    count = Column(Integer, nullable=False)
+
+    @classmethod
+    def bump(class_, base_name):
+        """Increment the count for a base name, and return the new count.
+
+        Concurrent battles with the same name are safe: the UPDATE locks the
+        row until the transaction commits, and if two transactions both try to
+        create the row, the loser just goes around again and bumps it.
+        """
+
+        table = class_.__table__
+
+        while True:
+            result = DBSession.execute(
+                table.update()
+                .where(table.c.base_name == base_name)
+                .values(count=table.c.count + 1)
+            )
+
+            if result.rowcount:
+                return DBSession.execute(
+                    sqlalchemy.sql.select([table.c.count])
+                    .where(table.c.base_name == base_name)
+                ).scalar()
+
+            # First time we've seen this name; start counting from whatever
+            # battles already have it
+            count = class_.existing_count(base_name) + 1
+
+            # The savepoint has to be the connection's, not the session's;
+            # zope.sqlalchemy won't let the session commit one itself
+            connection = DBSession.connection()
+            savepoint = connection.begin_nested()
+
+            try:
+                connection.execute(
+                    table.insert().values(base_name=base_name, count=count)
+                )
+            except sqlalchemy.exc.IntegrityError:
+                savepoint.rollback()
+            else:
+                savepoint.commit()
+                return count
+
+    @classmethod
+    def claim(class_, name):
+        """Make sure the count for a hand-picked battle name's base name is at
+        least the name's numeral, so no automatic name will collide with it.
+
+        Nothing needs doing if the name has no numeral, or if nothing has been
+        counted for its base name yet; in that case, bump() will count from
+        the existing battles, this one included, when it gets there.
+        """
+
+        (base_name, _, numeral) = name.rpartition(' ')
+
+        try:
+            count = helpers.parse_roman_numeral(numeral)
+        except ValueError:
+            return
+
+        if not base_name:
+            return
+
+        table = class_.__table__
+
+        DBSession.execute(
+            table.update()
+            .where(table.c.base_name == base_name)
+            .where(table.c.count < count)
+            .values(count=count)
+        )
+
+    @staticmethod
+    def existing_count(base_name):
+        """Figure out the count for a base name from existing battles' names,
+        in one query.
+        """
+
+        escaped_name = (base_name.replace('\\', '\\\\')
+                                 .replace('%', '\\%')
+                                 .replace('_', '\\_'))
+
+        names = (
+            DBSession.query(Battle.name)
+            .filter(or_(
+                Battle.name == base_name,
+                Battle.name.like(escaped_name + ' %', escape='\\')
+            ))
+        )
+
+        count = 0
+
+        for (name,) in names:
+            if name == base_name:
+                count = max(count, 1)
+                continue
+
+            try:
+                numeral = helpers.parse_roman_numeral(
+                    name[len(base_name) + 1:])
+            except ValueError:
+                # Something like "A vs B Rematch"
+                continue
+
+            count = max(count, numeral)
+
+        return count
+
 class BattlePokemon(PlayerTable):
     """A Pokémon that is part of a trainer's squad for a particular battle, and
     information about it at the time of the battle.
@@ -769,6 +969,132 @@ class ItemEffect(PlayerTable):
     notes = Column(Unicode, nullable=False)
     is_current = Column(Boolean, nullable=False, default=True)
 
+    # For finding the latest edit (see asb.conditional)
+    __table_args__ = (Index('ix_item_effects_edit_time', edit_time),)
+
+class MoneyLedger(PlayerTable):
+    """A record of every change to a trainer's money, and the one place that
+    changes it.
+
+    Trainer.money is never read-modify-written in Python; record() and
+    record_many() add to it with a single UPDATE, so concurrent requests
+    for the same trainer can't lose each other's changes, and log the
+    change here at the same time.  set_balance() locks the row instead.
+
+    reason says where the money came from or went: 'allowance', 'bank',
+    'battle', 'trade', 'pokemon', 'items', 'evolution', 'mod' or 'reset'.
+    """
+
+    __tablename__ = 'money_ledger'
+
+    id = Column(Integer, Sequence('money_ledger_id_seq'), primary_key=True)
+    trainer_id = Column(Integer, ForeignKey('trainers.id', onupdate='cascade',
+        ondelete='cascade'), nullable=False)
+    delta = Column(Integer, nullable=False)
+    reason = Column(Unicode, nullable=False)
+    timestamp = Column(DateTime, nullable=False,
+        default=datetime.datetime.utcnow)
+
+    # For looking through a trainer's history
+    __table_args__ = (Index('ix_money_ledger_trainer_id_id', trainer_id, id),)
+
+    @classmethod
+    def record(class_, trainer_id, delta, reason, non_negative=False):
+        """Atomically add delta (possibly negative) to a trainer's money, and
+        log it.
+
+        If non_negative is true, only do it if the trainer will still have
+        at least $0 afterwards.  Return whether the change was made.
+        """
+
+        trainers = Trainer.__table__
+        update = (
+            trainers.update()
+            .where(trainers.c.id == trainer_id)
+            .values(money=trainers.c.money + delta)
+        )
+
+        if non_negative:
+            update = update.where(trainers.c.money + delta >= 0)
+
+        if not DBSession.execute(update).rowcount:
+            return False
+
+        DBSession.execute(class_.__table__.insert().values(
+            trainer_id=trainer_id, delta=delta, reason=reason))
+        class_.expire_balances([trainer_id])
+
+        return True
+
+    @classmethod
+    def record_many(class_, deltas, reason):
+        """Atomically adjust several trainers' money at once, given a dict of
+        trainer IDs to amounts, and log it.
+        """
+
+        deltas = {trainer_id: delta for (trainer_id, delta) in deltas.items()
+                  if delta}
+
+        if not deltas:
+            return
+
+        trainers = Trainer.__table__
+
+        DBSession.execute(
+            trainers.update()
+            .where(trainers.c.id.in_(deltas))
+            .values(money=trainers.c.money +
+                sqlalchemy.sql.case(deltas, value=trainers.c.id, else_=0))
+        )
+
+        DBSession.execute(class_.__table__.insert(), [
+            {'trainer_id': trainer_id, 'delta': delta, 'reason': reason}
+            for (trainer_id, delta) in deltas.items()
+        ])
+
+        class_.expire_balances(deltas)
+
+    @classmethod
+    def set_balance(class_, trainer_id, balance, reason):
+        """Set a trainer's money to exactly balance, and log the difference.
+
+        The old balance is read with the row locked, so nothing else can
+        change it between working out the difference and writing the new one.
+        """
+
+        trainers = Trainer.__table__
+        old_balance = DBSession.execute(
+            sqlalchemy.select([trainers.c.money])
+            .where(trainers.c.id == trainer_id)
+            .with_for_update()
+        ).scalar()
+
+        DBSession.execute(
+            trainers.update()
+            .where(trainers.c.id == trainer_id)
+            .values(money=balance)
+        )
+
+        if old_balance is not None and balance != old_balance:
+            DBSession.execute(class_.__table__.insert().values(
+                trainer_id=trainer_id, delta=balance - old_balance,
+                reason=reason))
+
+        class_.expire_balances([trainer_id])
+
+    @staticmethod
+    def expire_balances(trainer_ids):
+        """Expire the money of any of these trainers already loaded in this
+        session, so that it gets read again from the database.
+        """
+
+        for trainer_id in trainer_ids:
+            trainer = DBSession.identity_map.get(
+                sqlalchemy.orm.util.identity_key(Trainer, trainer_id))
+
+            if trainer is not None:
+                DBSession.expire(trainer, ['money'])
+
 class MoveEffect(PlayerTable):
     """The editable parts of a move (its flavour text and energy)."""
 
@@ -784,6 +1110,9 @@ class MoveEffect(PlayerTable):
     notes = Column(Unicode, nullable=False)
     is_current = Column(Boolean, nullable=False, default=True)
 
+    # For finding the latest edit (see asb.conditional)
+    __table_args__ = (Index('ix_move_effects_edit_time', edit_time),)
+
 class MoveModification(PlayerTable):
     """A Pokémon's signature move or other movepool mod.
 
@@ -823,6 +1152,9 @@ class NewsPost(PlayerTable):
         nullable=False)
     text = Column(Unicode, nullable=False)
 
+    # For paging through the archive
+    __table_args__ = (Index('ix_news_posts_post_time_id', post_time, id),)
+
     def set_identifier(self):
         """Set an identifier based on ID and title."""
 
@@ -889,6 +1221,9 @@ class Pokemon(PlayerTable):
             [PokemonFormAbility.pokemon_form_id, PokemonFormAbility.slot],
             name='pokemon_ability_fkey', use_alter=True
         ),
+
+        # For paging through species censuses
+        Index('ix_pokemon_pokemon_form_id_name_id', pokemon_form_id, name, id),
     )
 
     @hybrid_method
@@ -965,11 +1300,20 @@ class Pokemon(PlayerTable):
 
     @property
     def __acl__(self):
-        """Return an list of permissions for Pyramid's authorization."""
+        """Return an list of permissions for Pyramid's authorization.
+
+        It only depends on the owner, so it's kept on the instance until that
+        changes rather than rebuilt for every permission check.
+        """
+
+        cached = self.__dict__.get('_acl')
+
+        if cached is not None and cached[0] == self.trainer_id:
+            return cached[1]
 
         trainer = 'user:{}'.format(self.trainer_id)
 
-        return [
+        acl = [
             (sec.Allow, trainer, 'edit.basics'),
             (sec.Allow, trainer, 'edit.evolve'),
             (sec.Allow, 'admin', 'edit.basics'),
@@ -977,6 +1321,116 @@ class Pokemon(PlayerTable):
             (sec.Allow, 'mod', 'edit.basics'),
         ]
 
+        self._acl = (self.trainer_id, acl)
+        return acl
+
+class PokemonFormPopulation(PlayerTable):
+    """How many active Pokémon of each form there are in the league, so that
+    the species index doesn't have to count them all every time.
+
+    Every form gets a row, even if there are none of it.  The code paths that
+    add Pokémon, change their form, or change whether they're active keep
+    this up to date with bump(), either directly for forms whose Pokémon are
+    known to be active or by doing the change inside tracking().  If it ever
+    drifts, `asbdb recount-populations` will recompute it from scratch.
+    """
+
+    __tablename__ = 'pokemon_form_populations'
+
+    pokemon_form_id = Column(Integer, ForeignKey(PokemonForm.id,
+        onupdate='cascade', ondelete='cascade'), primary_key=True)
+    population = Column(Integer, nullable=False, default=0)
+
+    @classmethod
+    def bump(class_, deltas):
+        """Atomically adjust populations, given a dict of form IDs to
+        amounts.
+        """
+
+        table = class_.__table__
+
+        for (form_id, delta) in deltas.items():
+            if delta:
+                DBSession.execute(
+                    table.update()
+                    .where(table.c.pokemon_form_id == form_id)
+                    .values(population=table.c.population + delta)
+                )
+
+    @staticmethod
+    def count_active(pokemon_ids=None, trainer_id=None):
+        """Return a Counter of how many of the given Pokémon, or of a trainer's
+        Pokémon, are active in each form.
+        """
+
+        query = (
+            DBSession.query(Pokemon.pokemon_form_id, func.count('*'))
+            .filter(Pokemon.is_active())
+            .group_by(Pokemon.pokemon_form_id)
+        )
+
+        if pokemon_ids is not None:
+            pokemon_ids = list(pokemon_ids)
+
+            if not pokemon_ids:
+                return collections.Counter()
+
+            query = query.filter(Pokemon.id.in_(pokemon_ids))
+
+        if trainer_id is not None:
+            query = query.filter(Pokemon.trainer_id == trainer_id)
+
+        return collections.Counter(dict(query))
+
+    @classmethod
+    @contextlib.contextmanager
+    def tracking(class_, pokemon_ids=None, trainer_id=None):
+        """Keep populations up to date across whatever happens in the with
+        block to the given Pokémon, or to a trainer's Pokémon.
+
+        They're counted before and after, and the difference is bump()ed, so
+        concurrent requests never step on each other's changes.
+        """
+
+        if pokemon_ids is not None:
+            pokemon_ids = list(pokemon_ids)
+
+        before = class_.count_active(pokemon_ids, trainer_id)
+        yield
+        DBSession.flush()
+        after = class_.count_active(pokemon_ids, trainer_id)
+
+        class_.bump({form_id: after[form_id] - before[form_id]
+                     for form_id in set(before) | set(after)})
+
+    @classmethod
+    def recount(class_, bind=None):
+        """Recompute every form's population from scratch.
+
+        This replaces every row, so it's only for `asbdb` and migrations, not
+        for use in requests.  bind can be a connection; by default, DBSession
+        is flushed and used.
+        """
+
+        if bind is None:
+            DBSession.flush()
+            bind = DBSession
+
+        table = class_.__table__
+
+        population = (
+            sqlalchemy.sql.select([func.count('*')])
+            .where(and_(Pokemon.pokemon_form_id == PokemonForm.id,
+                        Pokemon.is_active()))
+            .as_scalar()
+        )
+
+        populations = sqlalchemy.sql.select([PokemonForm.id, population])
+
+        bind.execute(table.delete())
+        bind.execute(table.insert().from_select(
+            ['pokemon_form_id', 'population'], populations))
+
 class PokemonUnlockedEvolution(PlayerTable):
     """A species which a Pokémon has fulfilled the requirements to evolve
     into.
@@ -1019,6 +1473,34 @@ class Promotion(PlayerTable):
 
         self.identifier = helpers.identifier(self.name)
 
+    @classmethod
+    def running(class_, today=None):
+        """Return a filter for promotions that have started and haven't
+        ended yet.
+        """
+
+        if today is None:
+            today = datetime.datetime.utcnow().date()
+
+        return and_(
+            or_(class_.start_date.is_(None), class_.start_date <= today),
+            or_(class_.end_date.is_(None), class_.end_date >= today)
+        )
+
+    @classmethod
+    def any_public_running(class_):
+        """Return whether any public promotions are running right now.
+
+        Public promotions are open to everyone, so they aren't counted in
+        anyone's notifications.
+        """
+
+        return DBSession.query(
+            sqlalchemy.sql.exists()
+            .where(class_.is_public)
+            .where(class_.running())
+        ).scalar()
+
 class PromotionItem(PlayerTable):
     """An item available through a promotion."""
 
@@ -1200,12 +1682,25 @@ class Trainer(PlayerTable):
     def set_password(self, password):
         """Hash and store the given password."""
 
-        self.password_hash = pbkdf2.crypt(password)
+        self.password_hash = asb.passwords.hash_password(password)
 
     def check_password(self, password):
-        """Check the given password against the stored password hash."""
+        """Check the given password against the stored password hash.
 
-        return pbkdf2.crypt(password, self.password_hash) == self.password_hash
+        If it's right but the hash is outdated (made with an old scheme or
+        different cost parameters), rehash it while we have the password.
+        """
+
+        if self.password_hash is None:
+            return False
+
+        if not asb.passwords.check_password(password, self.password_hash):
+            return False
+
+        if asb.passwords.needs_rehash(self.password_hash):
+            self.set_password(password)
+
+        return True
 
     def update_identifier(self):
         """Like it says on the tin."""
@@ -1322,11 +1817,7 @@ class Trainer(PlayerTable):
         ))
 
         # Filter out promotions that haven't started or have already ended
-        today = datetime.datetime.utcnow().date()
-        query = query.filter(
-            or_(Promotion.start_date.is_(None), Promotion.start_date <= today),
-            or_(Promotion.end_date.is_(None), Promotion.end_date >= today)
-        )
+        query = query.filter(Promotion.running())
 
         return query.all()
 
@@ -1381,6 +1872,167 @@ class TrainerItem(PlayerTable):
         (exists,) = DBSession.query(trade.exists()).one()
         return exists
 
+class TrainerNotifications(PlayerTable):
+    """Running counts of the things that show up on a trainer's bulletin, so
+    that the home page doesn't have to go looking for them.
+
+    These are kept up to date by the code paths that change the things being
+    counted, via bump().  If they ever drift, `asbdb recount-notifications`
+    will recompute them from scratch.
+
+    promotions only counts promotions meant for this trainer in particular;
+    public ones can be added straight to the database, so the home page checks
+    for those separately.  promotions and pending_gifts ignore start/end/reveal
+    dates, since those can come and go without anything being written; they're
+    only used to decide whether it's worth looking for promotions or gifts at
+    all.
+    """
+
+    __tablename__ = 'trainer_notifications'
+
+    trainer_id = Column(Integer, ForeignKey('trainers.id', onupdate='cascade',
+        ondelete='cascade'), primary_key=True)
+    promotions = Column(Integer, nullable=False, default=0)
+    form_uncertain = Column(Integer, nullable=False, default=0)
+    unread_approved = Column(Integer, nullable=False, default=0)
+    unread_denied = Column(Integer, nullable=False, default=0)
+    unread_from_mod = Column(Integer, nullable=False, default=0)
+    pending_gifts = Column(Integer, nullable=False, default=0)
+
+    # Map bank transaction states to the columns that count them
+    bank_state_columns = {
+        'approved': 'unread_approved',
+        'denied': 'unread_denied',
+        'from-mod': 'unread_from_mod'
+    }
+
+    @property
+    def bank_counts(self):
+        """Return a dict of unread bank transaction counts by state, leaving
+        out any states with nothing unread.
+        """
+
+        counts = {
+            state: getattr(self, column)
+            for (state, column) in self.bank_state_columns.items()
+        }
+
+        return {state: count for (state, count) in counts.items() if count}
+
+    @classmethod
+    def bump(class_, trainer_id, **deltas):
+        """Atomically add the given amounts to a trainer's counters, e.g.
+        bump(1, promotions=-1).
+        """
+
+        values = {
+            getattr(class_, column): getattr(class_, column) + delta
+            for (column, delta) in deltas.items() if delta
+        }
+
+        if trainer_id is None or not values:
+            return
+
+        (DBSession.query(class_)
+            .filter_by(trainer_id=trainer_id)
+            .update(values, synchronize_session=False))
+
+    @classmethod
+    def bump_bank(class_, trainer_id, state, delta):
+        """Adjust the unread count for a bank transaction state, if it's a
+        state that gets counted.
+        """
+
+        column = class_.bank_state_columns.get(state)
+
+        if column is not None:
+            class_.bump(trainer_id, **{column: delta})
+
+    @classmethod
+    def recount(class_, trainer_id=None, bind=None):
+        """Recompute counters from scratch, for one trainer or (by default)
+        all of them.
+
+        One trainer's counters are recomputed with a single UPDATE (or an
+        INSERT, if they don't have a row yet), so this is safe to use in a
+        request.  Doing everyone replaces every row, so that's only for
+        `asbdb` and migrations.
+
+        bind can be a connection, for use outside of a request; by default,
+        DBSession is used.
+        """
+
+        if bind is None:
+            bind = DBSession
+
+        table = class_.__table__
+
+        def counts(owner):
+            """Build correlated count subqueries for every counter, for the
+            trainer whose ID is in the column owner.
+            """
+
+            def count(*criteria, distinct=None):
+                if distinct is None:
+                    counter = func.count('*')
+                else:
+                    counter = func.count(distinct.distinct())
+
+                return (
+                    sqlalchemy.sql.select([counter])
+                    .where(and_(*criteria))
+                    .as_scalar()
+                )
+
+            counters = {
+                # Same logic as Trainer.promotions, minus the dates and public
+                # promotions
+                'promotions': count(PromotionRecipient.trainer_id == owner,
+                                    PromotionRecipient.received == False),
+
+                'form_uncertain': count(Pokemon.trainer_id == owner,
+                                        Pokemon.form_uncertain),
+
+                # Same logic as Trainer.pending_gifts, minus the dates
+                'pending_gifts': count(
+                    TradeLot.trade_id == Trade.id,
+                    TradeLot.recipient_id == owner,
+                    TradeLot.state == 'proposed',
+                    Trade.is_gift,
+                    distinct=Trade.id
+                )
+            }
+
+            for (state, column) in class_.bank_state_columns.items():
+                counters[column] = count(BankTransaction.trainer_id == owner,
+                                         BankTransaction.state == state,
+                                         ~BankTransaction.is_read)
+
+            return counters
+
+        if trainer_id is not None:
+            update = (
+                table.update()
+                .where(table.c.trainer_id == trainer_id)
+                .values(counts(table.c.trainer_id))
+            )
+
+            if bind.execute(update).rowcount:
+                return
+
+        new_counts = counts(Trainer.id)
+        columns = sorted(new_counts)
+        rows = sqlalchemy.sql.select(
+            [Trainer.id] + [new_counts[column] for column in columns])
+
+        if trainer_id is None:
+            bind.execute(table.delete())
+        else:
+            rows = rows.where(Trainer.id == trainer_id)
+
+        bind.execute(table.insert().from_select(['trainer_id'] + columns,
+            rows))
+
 class TrainerRole(PlayerTable):
     """A role that a trainer has."""
 
@@ -1464,6 +2116,8 @@ ItemCategory.items = relationship(Item, back_populates='category',
 
 ItemEffect.editor = relationship(Trainer)
 
+MoneyLedger.trainer = relationship(Trainer)
+
 Move.categories = relationship(MoveCategory, order_by=MoveCategory.id,
     secondary=MoveCategoryMap.__table__, back_populates='moves')
 Move.effect = relationship(MoveEffect, uselist=False,
@@ -1578,6 +2232,8 @@ Trainer.battle_trainers = relationship(BattleTrainer)
 Trainer.battle_refs = relationship(BattleReferee)
 
 Trainer.items = relationship(Item, secondary=TrainerItem.__table__)
+Trainer.notifications = relationship(TrainerNotifications, uselist=False,
+    viewonly=True)
 Trainer.roles = relationship(Role, secondary=TrainerRole.__table__)
 
 TrainerItem.trade_lots = relationship(TradeLot,
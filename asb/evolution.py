@@ -0,0 +1,230 @@
+"""Evolution data that only depends on the Pokédex: each family's evolution
+tree, which forms each species can evolve into, and everything else needed
+to check whether a Pokémon can evolve without going back to the database.
+
+Everything here is built once per process (see asb.pokedex) from objects
+loaded in a private session and then detached, like the shop catalog.  The
+forms have their species, condition and evolution method (with its gender
+and item) loaded; don't touch anything else on them.
+"""
+
+import collections
+import types
+
+import sqlalchemy as sqla
+import sqlalchemy.orm
+
+from asb import db
+import asb.pokedex
+
+EvolutionData = collections.namedtuple('EvolutionData',
+    ['forms', 'species_forms', 'form_abilities', 'trees', 'evolved_forms'])
+EvolutionData.__doc__ = """All the evolution data.
+
+- forms: A mapping of IDs to PokemonForms.
+- species_forms: A mapping of species IDs to a tuple of their forms, in
+  form order.
+- form_abilities: A mapping of (form ID, slot) pairs to ability IDs.
+- trees: A mapping of family IDs to EvolutionTrees.
+- evolved_forms: A mapping of species IDs to a tuple of all the forms of all
+  the species that species evolves into.
+"""
+
+EvolutionTree = collections.namedtuple('EvolutionTree',
+    ['layers', 'form_ids'])
+EvolutionTree.__doc__ = """An evolution family's tree, laid out for a table.
+
+- layers: A tuple of rows, one per evolution stage.  Each row is a tuple of
+  (form, colspan) pairs, with each form spanning all the forms that evolve
+  from it.  form is None for a gap under a branch that stopped evolving at an
+  earlier stage.
+- form_ids: A frozenset of the IDs of all the forms that appear in the tree.
+"""
+
+def show_form_evo(form):
+    """Determine whether to show this Pokémon form's evolution method
+    separately.
+    """
+
+    # XXX Sighhhh I'd like to not special-case this someday
+    return (form.is_default or form.identifier.endswith('-alola') or
+            form.species.identifier == 'meowstic')
+
+@asb.pokedex.cached
+def data():
+    """Build and return all the evolution data."""
+
+    session = sqla.orm.Session(bind=db.DBSession.bind)
+
+    try:
+        forms = (
+            session.query(db.PokemonForm)
+            .options(
+                sqla.orm.joinedload('species'),
+                sqla.orm.joinedload('condition'),
+                sqla.orm.joinedload('evolution_method').joinedload('gender'),
+                sqla.orm.joinedload('evolution_method').joinedload('item')
+            )
+            .order_by(db.PokemonForm.order)
+            .all()
+        )
+
+        form_abilities = session.query(db.PokemonFormAbility.pokemon_form_id,
+            db.PokemonFormAbility.slot, db.PokemonFormAbility.ability_id)
+
+        form_abilities = {
+            (form_id, slot): ability_id
+            for (form_id, slot, ability_id) in form_abilities
+        }
+    finally:
+        session.close()
+
+    species_forms = collections.defaultdict(list)
+
+    for form in forms:
+        species_forms[form.species_id].append(form)
+
+    for species_form_list in species_forms.values():
+        species_form_list.sort(key=lambda form: form.form_order)
+
+    # Figure out who evolves into what
+    evolved_forms = collections.defaultdict(list)
+
+    for form in forms:
+        prevo_id = form.species.evolves_from_species_id
+
+        if prevo_id is not None:
+            evolved_forms[prevo_id].append(form)
+
+    # Build the trees
+    family_forms = collections.defaultdict(list)
+
+    for form in forms:
+        family_forms[form.species.pokemon_family_id].append(form)
+
+    trees = {
+        family_id: build_tree(family_form_list, species_forms)
+        for (family_id, family_form_list) in family_forms.items()
+    }
+
+    return EvolutionData(
+        forms=types.MappingProxyType({form.id: form for form in forms}),
+        species_forms=types.MappingProxyType({
+            species_id: tuple(species_form_list)
+            for (species_id, species_form_list) in species_forms.items()
+        }),
+        form_abilities=types.MappingProxyType(form_abilities),
+        trees=types.MappingProxyType(trees),
+        evolved_forms=types.MappingProxyType({
+            species_id: tuple(species_evolved_forms)
+            for (species_id, species_evolved_forms) in evolved_forms.items()
+        })
+    )
+
+def pre_evolution_form(form, species_forms):
+    """Return the corresponding form for this form's pre-evolution, without
+    touching the database.
+
+    This is PokemonForm.pre_evolution_form, but with all the species' forms
+    passed in.
+    """
+
+    default_form = None
+
+    for prevo_form in species_forms[form.species.evolves_from_species_id]:
+        if prevo_form.form_order == form.form_order:
+            return prevo_form
+        elif prevo_form.is_default:
+            default_form = prevo_form
+
+    return default_form
+
+def build_tree(forms, species_forms):
+    """Build an EvolutionTree for one family, given all its forms (in order)
+    and a mapping of species IDs to their forms.
+
+    Branches don't have to all end at the same stage; if one stops early, the
+    stages below it get gaps.
+    """
+
+    # Start with every form that gets shown separately, plus whatever forms
+    # they evolve from
+    parents = {}
+    children = collections.defaultdict(list)
+    tree_forms = []
+    seen = set()
+
+    def add(form):
+        if form.id in seen:
+            return
+
+        seen.add(form.id)
+        tree_forms.append(form)
+
+        if form.species.evolves_from_species_id is not None:
+            parent = pre_evolution_form(form, species_forms)
+
+            if parent is not None:
+                parents[form.id] = parent
+                add(parent)
+
+    for form in forms:
+        if show_form_evo(form):
+            add(form)
+
+    tree_forms.sort(key=lambda form: form.order)
+
+    for form in tree_forms:
+        if form.id in parents:
+            children[parents[form.id].id].append(form)
+
+    roots = [form for form in tree_forms if form.id not in parents]
+
+    # Count how many columns each form spans
+    widths = {}
+
+    def width(form):
+        if form.id not in widths:
+            widths[form.id] = sum(
+                width(child) for child in children[form.id]) or 1
+
+        return widths[form.id]
+
+    def depth(form):
+        return 1 + max((depth(child) for child in children[form.id]),
+            default=0)
+
+    def cells(form, stage):
+        """Yield the cells for the given stage under this form, which is at
+        stage 0 as far as it's concerned.
+        """
+
+        if stage == 0:
+            yield (form, width(form))
+        elif not children[form.id]:
+            yield (None, width(form))
+        else:
+            for child in children[form.id]:
+                yield from cells(child, stage - 1)
+
+    stages = max((depth(root) for root in roots), default=0)
+
+    layers = tuple(
+        tuple(cell for root in roots for cell in cells(root, stage))
+        for stage in range(stages)
+    )
+
+    return EvolutionTree(
+        layers=layers,
+        form_ids=frozenset(form.id for form in tree_forms)
+    )
+
+def tree(family_id):
+    """Return the EvolutionTree for a family."""
+
+    return data().trees[family_id]
+
+def evolved_forms(species_id):
+    """Return all the forms of all the species this species evolves into."""
+
+    return data().evolved_forms.get(species_id, ())
@@ -7,6 +7,7 @@ import wtforms
 import wtforms.ext.csrf
 
 from asb import db
+import asb.autocomplete
 import asb.tcodf
 
 class CSRFTokenForm(wtforms.ext.csrf.SecureForm):
@@ -136,6 +137,11 @@ class PokemonSpeciesField(wtforms.StringField):
         elif identifier in ['nidoran-male', 'nidoranm']:
             identifier = 'nidoran-m'
 
+        # Don't bother with the database if it's not even a species
+        if not asb.autocomplete.has('species', identifier):
+            self.data = (name, None)
+            return
+
         # Try to fetch the species
         try:
             species = (
@@ -0,0 +1,196 @@
+"""Learnset bitmaps, for answering questions about who learns what without
+going through pokemon_form_moves every time.
+
+Every form gets a bit, in Pokédex order, and every move gets a bit, in
+alphabetical order.  Each form then has a bitset (a plain Python int) of the
+moves it learns, and each move has a bitset of the forms that learn it; types
+and abilities get bitsets of forms, too.  So e.g. "which forms learn both
+Surf and Fly and are Water-type" is just:
+
+    index.move_forms[surf] & index.move_forms[fly] & index.type_forms[water]
+
+and because the bits are in display order, reading the set bits back off
+gives the forms already sorted.
+
+The index is built once per process (see asb.pokedex) from a handful of
+narrow queries, and is about a hundred kilobytes.
+"""
+
+import collections
+import types
+
+import sqlalchemy as sqla
+import sqlalchemy.orm
+
+from asb import db
+import asb.pokedex
+
+LearnsetIndex = collections.namedtuple('LearnsetIndex', ['form_ids',
+    'move_ids', 'form_moves', 'move_forms', 'type_forms', 'ability_forms',
+    'listed_forms', 'form_identifiers', 'move_identifiers',
+    'ability_identifiers'])
+LearnsetIndex.__doc__ = """All the learnset bitmaps.
+
+- form_ids: A tuple of form IDs, in Pokédex order; form_ids[n] is the form
+  for bit n of a form bitset.
+- move_ids: A tuple of move IDs, in alphabetical order; move_ids[n] is the
+  move for bit n of a move bitset.
+- form_moves: A mapping of form IDs to bitsets of the moves they learn.
+- move_forms: A mapping of move IDs to bitsets of the forms that learn them.
+- type_forms: A mapping of type IDs to bitsets of the forms with that type.
+- ability_forms: A mapping of ability IDs to bitsets of the forms that can
+  have that ability.
+- listed_forms: A bitset of the forms that get listed in form tables, i.e.
+  leaving out all but the default form of species whose forms can be
+  squashed together.
+- form_identifiers: A mapping of form and species identifiers to form IDs,
+  with species identifiers going to the default form.
+- move_identifiers: A mapping of move identifiers to move IDs.
+- ability_identifiers: A mapping of ability identifiers to ability IDs.
+"""
+
+def positions(bitset):
+    """Return a list of the positions of the set bits in a bitset, lowest
+    first.
+    """
+
+    # Going through the binary string is much faster than shifting and
+    # masking a big int one bit at a time
+    return [position for (position, bit) in enumerate(reversed(bin(bitset)))
+            if bit == '1']
+
+@asb.pokedex.cached
+def index():
+    """Build and return the learnset index."""
+
+    session = sqla.orm.Session(bind=db.DBSession.bind)
+
+    try:
+        forms = (
+            session.query(db.PokemonForm.id, db.PokemonForm.identifier,
+                db.PokemonForm.is_default, db.PokemonSpecies.identifier,
+                db.PokemonSpecies.forms_are_squashable)
+            .join(db.PokemonForm.species)
+            .order_by(db.PokemonForm.order)
+            .all()
+        )
+
+        moves = (
+            session.query(db.Move.id, db.Move.identifier)
+            .order_by(db.Move.name, db.Move.id)
+            .all()
+        )
+
+        abilities = session.query(db.Ability.id, db.Ability.identifier).all()
+
+        form_moves = session.query(db.PokemonFormMove.pokemon_form_id,
+            db.PokemonFormMove.move_id).all()
+        form_types = session.query(db.PokemonFormType.pokemon_form_id,
+            db.PokemonFormType.type_id).all()
+        form_abilities = session.query(db.PokemonFormAbility.pokemon_form_id,
+            db.PokemonFormAbility.ability_id).all()
+    finally:
+        session.close()
+
+    form_bits = {form_id: 1 << n for (n, (form_id, *_)) in enumerate(forms)}
+    move_bits = {move_id: 1 << n for (n, (move_id, _)) in enumerate(moves)}
+
+    form_move_sets = dict.fromkeys(form_bits, 0)
+    move_form_sets = dict.fromkeys(move_bits, 0)
+
+    for (form_id, move_id) in form_moves:
+        form_move_sets[form_id] |= move_bits[move_id]
+        move_form_sets[move_id] |= form_bits[form_id]
+
+    type_form_sets = collections.defaultdict(int)
+
+    for (form_id, type_id) in form_types:
+        type_form_sets[type_id] |= form_bits[form_id]
+
+    ability_form_sets = collections.defaultdict(int)
+
+    for (form_id, ability_id) in form_abilities:
+        ability_form_sets[ability_id] |= form_bits[form_id]
+
+    listed_forms = 0
+    form_identifiers = {}
+
+    for (form_id, identifier, is_default, species_identifier,
+      squashable) in forms:
+        form_identifiers[identifier] = form_id
+
+        if is_default:
+            form_identifiers.setdefault(species_identifier, form_id)
+
+        if is_default or not squashable:
+            listed_forms |= form_bits[form_id]
+
+    return LearnsetIndex(
+        form_ids=tuple(form_id for (form_id, *_) in forms),
+        move_ids=tuple(move_id for (move_id, _) in moves),
+        form_moves=types.MappingProxyType(form_move_sets),
+        move_forms=types.MappingProxyType(move_form_sets),
+        type_forms=types.MappingProxyType(dict(type_form_sets)),
+        ability_forms=types.MappingProxyType(dict(ability_form_sets)),
+        listed_forms=listed_forms,
+        form_identifiers=types.MappingProxyType(form_identifiers),
+        move_identifiers=types.MappingProxyType(
+            {identifier: move_id for (move_id, identifier) in moves}),
+        ability_identifiers=types.MappingProxyType(
+            {identifier: ability_id for (ability_id, identifier) in abilities})
+    )
+
+def forms_in(bitset):
+    """Return the IDs of the forms in a form bitset, in Pokédex order."""
+
+    ids = index().form_ids
+    return [ids[position] for position in positions(bitset)]
+
+def moves_in(bitset):
+    """Return the IDs of the moves in a move bitset, in alphabetical order."""
+
+    ids = index().move_ids
+    return [ids[position] for position in positions(bitset)]
+
+def search(move_ids=(), type_ids=(), ability_ids=(), squashed=True):
+    """Return the IDs of the forms that learn all of the given moves, have all
+    of the given types and can have all of the given abilities, in Pokédex
+    order.
+
+    If squashed is true, leave out the forms that form tables leave out (see
+    LearnsetIndex.listed_forms).
+    """
+
+    learnsets = index()
+
+    if squashed:
+        bitset = learnsets.listed_forms
+    else:
+        bitset = (1 << len(learnsets.form_ids)) - 1
+
+    for move_id in move_ids:
+        bitset &= learnsets.move_forms.get(move_id, 0)
+
+    for type_id in type_ids:
+        bitset &= learnsets.type_forms.get(type_id, 0)
+
+    for ability_id in ability_ids:
+        bitset &= learnsets.ability_forms.get(ability_id, 0)
+
+    return forms_in(bitset)
+
+def learners(move_id, squashed=True):
+    """Return the IDs of the forms that learn a move, in Pokédex order."""
+
+    return search(move_ids=[move_id], squashed=squashed)
+
+def compare(form_a_id, form_b_id):
+    """Compare two forms' learnsets, and return a (shared, only_a, only_b)
+    triple of lists of move IDs, each in alphabetical order.
+    """
+
+    learnsets = index()
+    a = learnsets.form_moves[form_a_id]
+    b = learnsets.form_moves[form_b_id]
+
+    return (moves_in(a & b), moves_in(a & ~b), moves_in(b & ~a))
@@ -0,0 +1,478 @@
+"""A cache of fully rendered dex pages for anonymous visitors.
+
+Anonymous visitors all get the same HTML for a dex page, so there's no point
+running traversal, the queries, Mako and Markdown for every one of them.
+Dex views (i.e. anything under dex_paths) that opt in with the @cacheable
+decorator (or @cacheable_briefly, for pages that also show league data) have
+their anonymous responses stored in a bounded LRU in each worker, and the
+tween here serves later anonymous requests for the same URL straight from
+it.  Paths whose views don't opt in are remembered after their first page
+and skip the cache from then on.
+
+Entries are keyed by URL, the Pokédex data version and the time of the
+latest flavor edit, so flavor edits in any worker invalidate them; flavor
+edits in this worker also throw everything away to free up the space.  The
+cache starts out empty, so restarting the app after `asbdb update` clears it
+too.  Pages that show league data (e.g. species pages, with their census)
+only last for asb.output_cache.league_ttl seconds.
+
+The anonymous layout has a login form with the session's CSRF token in it,
+so the token is swapped out for a placeholder when a page is stored and
+swapped back in (with the current visitor's token) each time it's served.
+Each entry also keeps the page's validators from asb.conditional, so a
+visitor revalidating a cached page still gets a 304.  Requests from
+logged-in users, and requests with flash messages waiting to be shown,
+always skip the cache.
+
+Settings:
+
+    # How many pages each worker keeps in memory; 0 turns the cache off
+    asb.output_cache.size = 500
+    # Where to put pages that fall out of memory, if anywhere
+    asb.output_cache.directory = %(here)s/data/output_cache
+    asb.output_cache.league_ttl = 60
+    # Log the hit ratio every this many cacheable requests
+    asb.output_cache.report_interval = 1000
+"""
+
+import collections
+import datetime
+import functools
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from pyramid.response import Response
+import pyramid.tweens
+import transaction
+
+from asb import db
+import asb.conditional
+import asb.pokedex
+
+log = logging.getLogger(__name__)
+
+CSRF_PLACEHOLDER = b'\x00asb-csrf-token\x00'
+
+CacheEntry = collections.namedtuple('CacheEntry',
+    ['body', 'content_type', 'charset', 'expires', 'version', 'last_modified'])
+CacheEntry.__doc__ = """A cached page.
+
+- body: The page, with the CSRF token replaced by CSRF_PLACEHOLDER.
+- content_type, charset: The response's Content-Type.
+- expires: The time.time() after which the page is stale, or None if it
+  lasts until it's invalidated.
+- version, last_modified: The page's validators (see asb.conditional), or
+  None if it didn't have any.
+"""
+
+class OutputCache:
+    """A bounded LRU of rendered pages, optionally spilling pages it evicts to
+    a directory on disk.
+    """
+
+    def __init__(self, size, directory=None, league_ttl=60,
+      report_interval=1000):
+        self.size = size
+        self.directory = directory
+        self.league_ttl = league_ttl
+        self.report_interval = report_interval
+
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+        # Keys currently being rendered, for single-flight rendering
+        self.rendering = {}
+
+        # Paths whose views turned out not to be cacheable, so that requests
+        # for them can skip the cache (and working out a key) altogether
+        self.uncacheable = collections.OrderedDict()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the entry for key, or None if there isn't a fresh one."""
+
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is not None:
+                if entry.expires is None or entry.expires > time.time():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+
+                del self.entries[key]
+
+        entry = self.read_spilled(key)
+
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.disk_hits += 1
+                self.store(key, entry)
+
+        return entry
+
+    def put(self, key, entry):
+        """Add an entry to the cache."""
+
+        with self.lock:
+            self.store(key, entry)
+
+    def store(self, key, entry):
+        """Add an entry, evicting (and maybe spilling) the least recently used
+        ones as necessary.  The lock must already be held.
+        """
+
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.size:
+            (old_key, old_entry) = self.entries.popitem(last=False)
+            self.spill(old_key, old_entry)
+
+    def spill_path(self, key):
+        """Return the path to spill the given key to."""
+
+        name = hashlib.sha1(repr(key).encode('UTF-8')).hexdigest()
+        return os.path.join(self.directory, name[:2], name)
+
+    def spill(self, key, entry):
+        """Write an evicted entry to disk, if there's a spill directory."""
+
+        if self.directory is None:
+            return
+
+        path = self.spill_path(key)
+
+        if entry.last_modified is not None:
+            last_modified = entry.last_modified.timestamp()
+        else:
+            last_modified = None
+
+        header = json.dumps({
+            'content_type': entry.content_type,
+            'charset': entry.charset,
+            'expires': entry.expires,
+            'version': entry.version,
+            'last_modified': last_modified
+        }).encode('UTF-8')
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            # Write it somewhere else and then move it into place, so that
+            # other workers never read a half-written file
+            (fd, temp_path) = tempfile.mkstemp(dir=os.path.dirname(path))
+
+            with os.fdopen(fd, 'wb') as spill_file:
+                spill_file.write(header + b'\n' + entry.body)
+
+            os.replace(temp_path, path)
+        except OSError:
+            log.warning('Couldn\'t spill %s to %s', key[0], path,
+                exc_info=True)
+
+    def read_spilled(self, key):
+        """Return the entry for key from disk, or None if there isn't a fresh
+        one there.
+        """
+
+        if self.directory is None:
+            return None
+
+        try:
+            with open(self.spill_path(key), 'rb') as spill_file:
+                header = json.loads(spill_file.readline().decode('UTF-8'))
+                body = spill_file.read()
+        except (OSError, ValueError):
+            return None
+
+        last_modified = header['last_modified']
+
+        if last_modified is not None:
+            last_modified = datetime.datetime.fromtimestamp(last_modified,
+                datetime.timezone.utc)
+
+        entry = CacheEntry(body=body, content_type=header['content_type'],
+            charset=header['charset'], expires=header['expires'],
+            version=header['version'], last_modified=last_modified)
+
+        if entry.expires is not None and entry.expires <= time.time():
+            return None
+
+        return entry
+
+    def clear(self):
+        """Throw away every entry, both in memory and on disk."""
+
+        with self.lock:
+            self.entries.clear()
+
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def render_lock(self, key):
+        """Return a (lock, is_first) pair for rendering the given key.
+
+        Whoever gets is_first renders the page while holding the lock, and
+        then calls done_rendering(); everyone else waits for the lock and then
+        looks in the cache again.
+        """
+
+        with self.lock:
+            if key in self.rendering:
+                return (self.rendering[key], False)
+
+            lock = self.rendering[key] = threading.Lock()
+            lock.acquire()
+            return (lock, True)
+
+    def done_rendering(self, key, lock):
+        """Let everyone waiting on this key have a look at the cache."""
+
+        with self.lock:
+            del self.rendering[key]
+
+        lock.release()
+
+    def is_uncacheable(self, path):
+        """Return whether the view at this path is known not to be cacheable.
+        """
+
+        with self.lock:
+            return path in self.uncacheable
+
+    def mark_uncacheable(self, path):
+        """Remember that the view at this path isn't cacheable."""
+
+        with self.lock:
+            self.uncacheable[path] = True
+            self.uncacheable.move_to_end(path)
+
+            while len(self.uncacheable) > self.size:
+                self.uncacheable.popitem(last=False)
+
+    def hit_ratio(self):
+        """Return the fraction of lookups that were hits, in memory or on
+        disk.
+        """
+
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return (self.hits + self.disk_hits) / lookups if lookups else 0.0
+
+    def maybe_report(self):
+        """Log the hit ratio every report_interval lookups."""
+
+        lookups = self.hits + self.disk_hits + self.misses
+
+        if self.report_interval and lookups % self.report_interval == 0:
+            log.info('Output cache: %d lookups, %.1f%% hits (%d from disk), '
+                '%d pages in memory', lookups, self.hit_ratio() * 100,
+                self.disk_hits, len(self.entries))
+
+# The cache for this process, if it's turned on
+cache = None
+
+def configure(settings):
+    """Set up the cache from the app settings, and return it (or None if it's
+    turned off).
+    """
+
+    global cache
+
+    size = int(settings.get('asb.output_cache.size', 0))
+
+    if size <= 0:
+        cache = None
+        return None
+
+    cache = OutputCache(
+        size=size,
+        directory=settings.get('asb.output_cache.directory') or None,
+        league_ttl=float(settings.get('asb.output_cache.league_ttl', 60)),
+        report_interval=int(
+            settings.get('asb.output_cache.report_interval', 1000))
+    )
+
+    # Start from scratch; anything left on disk might be from old templates
+    cache.clear()
+
+    return cache
+
+@asb.pokedex.on_reload
+def clear():
+    """Throw away the whole cache, if there is one."""
+
+    if cache is not None:
+        cache.clear()
+
+def invalidate():
+    """Throw away the whole cache, both now and once the current transaction
+    commits (so that a request that renders the old data in between can't put
+    it back).
+    """
+
+    clear()
+    transaction.get().addAfterCommitHook(lambda success: clear())
+
+def cacheable(view):
+    """Decorate a dex view so its anonymous responses can be cached until the
+    next flavor edit.
+    """
+
+    @functools.wraps(view)
+    def wrapper(context, request):
+        request.environ['asb.output_cache.ttl'] = None
+        return view(context, request)
+
+    return wrapper
+
+def cacheable_briefly(view):
+    """Decorate a dex view that shows league data, so its anonymous responses
+    can be cached for asb.output_cache.league_ttl seconds.
+    """
+
+    @functools.wraps(view)
+    def wrapper(context, request):
+        if cache is not None:
+            request.environ['asb.output_cache.ttl'] = cache.league_ttl
+
+        return view(context, request)
+
+    return wrapper
+
+# The top-level resources for the dex, which is all that gets cached
+dex_paths = ('/species', '/moves', '/abilities', '/items', '/types')
+
+def can_use_cache(request):
+    """Return whether this request could be served from the cache."""
+
+    path = request.path
+
+    return (request.method in ('GET', 'HEAD') and
+            any(path == dex_path or path.startswith(dex_path + '/')
+                for dex_path in dex_paths) and
+            request.unauthenticated_userid is None and
+            not request.session.peek_flash())
+
+def cache_key(request):
+    """Return the cache key for a request.
+
+    The flavor edit times are remembered for the rest of the request, so the
+    view's validators don't have to look them up again.
+    """
+
+    flavor_edited = asb.conditional.last_flavor_edit(
+        (db.AbilityEffect, db.ItemEffect, db.MoveEffect), request)
+
+    return (
+        request.path_qs,
+        asb.pokedex.data_version(),
+        flavor_edited.isoformat() if flavor_edited else None
+    )
+
+def serve(request, entry):
+    """Build a response for request from a cache entry, or a 304 if the
+    request already has it.
+    """
+
+    def render():
+        token = request.session.get_csrf_token().encode('ASCII')
+
+        response = Response(
+            body=entry.body.replace(CSRF_PLACEHOLDER, token),
+            content_type=entry.content_type,
+            charset=entry.charset
+        )
+
+        response.cache_control = 'no-cache'
+        response.vary = ('Cookie',)
+        return response
+
+    if entry.version is None:
+        return render()
+
+    return asb.conditional.conditional_response(request, entry.version,
+        entry.last_modified, render)
+
+def tween_factory(handler, registry):
+    """Make a tween that serves cacheable pages from the cache."""
+
+    if cache is None:
+        return handler
+
+    def output_cache_tween(request):
+        if not can_use_cache(request) or cache.is_uncacheable(request.path):
+            return handler(request)
+
+        key = cache_key(request)
+        entry = cache.get(key)
+        cache.maybe_report()
+
+        if entry is not None:
+            return serve(request, entry)
+
+        # Only one thread at a time renders any given page; the rest wait and
+        # then use whatever it put in the cache
+        (lock, is_first) = cache.render_lock(key)
+
+        if not is_first:
+            with lock:
+                entry = cache.get(key)
+
+            if entry is not None:
+                return serve(request, entry)
+
+            return handler(request)
+
+        try:
+            response = handler(request)
+
+            ttl = request.environ.get('asb.output_cache.ttl', False)
+
+            # Errors, redirects and 304s say nothing about the view, so only
+            # go by full pages
+            if response.status_int == 200 and ttl is False:
+                cache.mark_uncacheable(request.path)
+            elif response.status_int == 200:
+                token = request.session.get_csrf_token().encode('ASCII')
+                (version, last_modified) = request.environ.get(
+                    'asb.conditional.version', (None, None))
+
+                cache.put(key, CacheEntry(
+                    body=response.body.replace(token, CSRF_PLACEHOLDER),
+                    content_type=response.content_type,
+                    charset=response.charset,
+                    expires=time.time() + ttl if ttl is not None else None,
+                    version=version,
+                    last_modified=last_modified
+                ))
+
+            return response
+        finally:
+            cache.done_rendering(key, lock)
+
+    return output_cache_tween
+
+def includeme(config):
+    """Add the tween, below pyramid_tm (if it's there) so everything happens
+    inside a transaction.
+
+    pyramid_tm already sits below the exception view, so this does too, and
+    errors propagate through it as exceptions rather than getting cached.
+    Asking to be over the exception view as well would be an ordering cycle.
+    """
+
+    config.add_tween('asb.output_cache.tween_factory',
+        under=('pyramid_tm.tm_tween_factory', pyramid.tweens.INGRESS))
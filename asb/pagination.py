@@ -0,0 +1,226 @@
+"""Keyset pagination for long lists of player data.
+
+Instead of using OFFSET, each page picks up where the last one left off,
+using the sort key of the last row it showed, e.g.:
+
+    WHERE (name, id) > ('Zapdos Fan', 123) ORDER BY name, id LIMIT 51
+
+so fetching a page costs the same no matter how far into the list it is, as
+long as there's an index on the sort columns.  The sort key has to be unique,
+so it should always end with a primary key.
+
+A page's position is passed around in the query string as an opaque cursor
+token: ?after=<token> for the page following a row, and ?before=<token> for
+the page preceding one.  No token means the first page.
+"""
+
+import base64
+import datetime
+import json
+import urllib.parse
+
+import pyramid.httpexceptions as httpexc
+import sqlalchemy as sqla
+
+class Paginator:
+    """A description of how to paginate a particular list: what to sort by,
+    and how many rows to show per page.
+
+    columns should be mapped attributes (e.g. db.Trainer.name, db.Trainer.id),
+    all sorted in the same direction.  By default, each row's key is read
+    from those attributes on the row, or on the first entity if rows are
+    tuples; pass key to do something else.
+    """
+
+    def __init__(self, *columns, descending=False, per_page=50,
+      max_per_page=200, key=None):
+        self.columns = columns
+        self.descending = descending
+        self.per_page = per_page
+        self.max_per_page = max_per_page
+
+        if key is not None:
+            self.key = key
+
+    def key(self, row):
+        """Return the sort key for a row, as a tuple."""
+
+        if isinstance(row, tuple):
+            row = row[0]
+
+        return tuple(getattr(row, column.key) for column in self.columns)
+
+    def encode_cursor(self, key):
+        """Turn a sort key into a cursor token."""
+
+        values = []
+
+        for value in key:
+            if isinstance(value, datetime.datetime):
+                value = value.strftime('%Y-%m-%d %H:%M:%S.%f')
+            elif isinstance(value, datetime.date):
+                value = value.strftime('%Y-%m-%d')
+
+            values.append(value)
+
+        data = json.dumps(values, separators=(',', ':')).encode('UTF-8')
+        return base64.urlsafe_b64encode(data).decode('ASCII').rstrip('=')
+
+    def decode_cursor(self, token):
+        """Turn a cursor token back into a sort key.
+
+        Raise ValueError if the token is garbage.
+        """
+
+        # base64, UTF-8, JSON and strptime errors are all ValueErrors
+        data = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(data.decode('UTF-8'))
+
+        if not isinstance(values, list) or len(values) != len(self.columns):
+            raise ValueError('Wrong number of values in cursor')
+
+        key = []
+
+        for (column, value) in zip(self.columns, values):
+            column_type = column.property.columns[0].type
+
+            if not isinstance(value, (str, int)):
+                raise ValueError('Bad value in cursor: {0!r}'.format(value))
+            elif isinstance(column_type, sqla.types.DateTime):
+                value = datetime.datetime.strptime(value,
+                    '%Y-%m-%d %H:%M:%S.%f')
+            elif isinstance(column_type, sqla.types.Date):
+                value = datetime.datetime.strptime(value, '%Y-%m-%d').date()
+
+            key.append(value)
+
+        return tuple(key)
+
+    def paginate(self, request, query):
+        """Fetch the page of query that request asks for, and return a Page.
+
+        Raise HTTPBadRequest if the request has a bad cursor or page size.
+        """
+
+        try:
+            per_page = int(request.GET.get('per_page', self.per_page))
+        except ValueError:
+            raise httpexc.HTTPBadRequest('per_page must be a number')
+
+        per_page = max(1, min(per_page, self.max_per_page))
+
+        if 'before' in request.GET:
+            (direction, token) = ('before', request.GET['before'])
+        elif 'after' in request.GET:
+            (direction, token) = ('after', request.GET['after'])
+        else:
+            (direction, token) = (None, None)
+
+        # Going backwards means flipping the sort order, and then flipping
+        # the rows back at the end
+        backwards = direction == 'before'
+        descending = self.descending != backwards
+
+        if token is not None:
+            try:
+                key = self.decode_cursor(token)
+            except (TypeError, ValueError):
+                raise httpexc.HTTPBadRequest('Bad page cursor')
+
+            columns = sqla.tuple_(*self.columns)
+            values = sqla.tuple_(*(sqla.literal(value) for value in key))
+
+            if descending:
+                query = query.filter(columns < values)
+            else:
+                query = query.filter(columns > values)
+
+        if descending:
+            query = query.order_by(*(column.desc() for column in self.columns))
+        else:
+            query = query.order_by(*self.columns)
+
+        # Grab one extra row to see if there's anything past this page
+        rows = query.limit(per_page + 1).all()
+        more = len(rows) > per_page
+        rows = rows[:per_page]
+
+        if backwards:
+            rows.reverse()
+            has_previous = more
+            has_next = True
+        else:
+            has_previous = direction == 'after'
+            has_next = more
+
+        return Page(self, request, rows, per_page, has_previous, has_next)
+
+class Page:
+    """One page of results from a Paginator.
+
+    Iterating over a page iterates over its rows.
+    """
+
+    def __init__(self, paginator, request, rows, per_page, has_previous,
+      has_next):
+        self.paginator = paginator
+        self.request = request
+        self.rows = rows
+        self.per_page = per_page
+        self.has_previous = has_previous and bool(rows)
+        self.has_next = has_next and bool(rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def url(self, **params):
+        """Return the URL of the current page with the given query parameters
+        (plus per_page, if it isn't the default), keeping any other parameters
+        the request had (e.g. filters).
+        """
+
+        if self.per_page != self.paginator.per_page:
+            params['per_page'] = self.per_page
+
+        query = [(name, value) for (name, value) in self.request.GET.items()
+                 if name not in ('before', 'after', 'per_page')]
+        query.extend(sorted(params.items()))
+
+        url = self.request.path_url
+
+        if query:
+            url = '{0}?{1}'.format(url, urllib.parse.urlencode(query))
+
+        return url
+
+    @property
+    def first_url(self):
+        """Return the URL of the first page."""
+
+        return self.url()
+
+    @property
+    def previous_url(self):
+        """Return the URL of the previous page, or None if this is the first
+        page.
+        """
+
+        if not self.has_previous:
+            return None
+
+        key = self.paginator.key(self.rows[0])
+        return self.url(before=self.paginator.encode_cursor(key))
+
+    @property
+    def next_url(self):
+        """Return the URL of the next page, or None if this is the last page.
+        """
+
+        if not self.has_next:
+            return None
+
+        key = self.paginator.key(self.rows[-1])
+        return self.url(after=self.paginator.encode_cursor(key))
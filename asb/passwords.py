@@ -0,0 +1,165 @@
+"""Password hashing.
+
+Hashes look like $<scheme>$<version>$<parameters>$<salt>$<hash>, e.g.:
+
+    $pbkdf2-sha256$v1$4000$<salt>$<hash>
+    $scrypt$v1$16384,8,1$<salt>$<hash>
+
+with the salt and hash base64-encoded.  Which scheme new hashes use, and with
+what parameters, is set by configure(), which main() calls with the app
+settings:
+
+    asb.password_scheme = pbkdf2-sha256 (or scrypt)
+    asb.password_pbkdf2_iterations = 4000
+    asb.password_scrypt_n = 16384
+    asb.password_scrypt_r = 8
+    asb.password_scrypt_p = 1
+
+Hashes made with any other scheme or parameters (including old $p5k2$
+hashes from the pbkdf2 package) still verify; needs_rehash() says whether
+they should be replaced.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+
+class PBKDF2Hasher:
+    """PBKDF2-HMAC-SHA256, via hashlib."""
+
+    scheme = 'pbkdf2-sha256'
+    version = 'v1'
+
+    def __init__(self, iterations=4000):
+        self.iterations = iterations
+
+    @property
+    def parameters(self):
+        """Return this hasher's parameters as they appear in a hash."""
+
+        return str(self.iterations)
+
+    @classmethod
+    def from_parameters(class_, parameters):
+        """Create a hasher from the parameters part of a hash."""
+
+        return class_(int(parameters))
+
+    def derive(self, password, salt):
+        """Hash a password with the given salt and return the raw bytes."""
+
+        return hashlib.pbkdf2_hmac('sha256', password.encode('UTF-8'), salt,
+                                   self.iterations)
+
+class ScryptHasher:
+    """scrypt, via hashlib.  Needs Python 3.6+ built against OpenSSL 1.1+."""
+
+    scheme = 'scrypt'
+    version = 'v1'
+
+    def __init__(self, n=16384, r=8, p=1):
+        self.n = n
+        self.r = r
+        self.p = p
+
+    @property
+    def parameters(self):
+        """Return this hasher's parameters as they appear in a hash."""
+
+        return '{0},{1},{2}'.format(self.n, self.r, self.p)
+
+    @classmethod
+    def from_parameters(class_, parameters):
+        """Create a hasher from the parameters part of a hash."""
+
+        (n, r, p) = (int(value) for value in parameters.split(','))
+        return class_(n, r, p)
+
+    def derive(self, password, salt):
+        """Hash a password with the given salt and return the raw bytes."""
+
+        # scrypt needs about 128 * n * r bytes; give it some headroom
+        return hashlib.scrypt(password.encode('UTF-8'), salt=salt, n=self.n,
+                              r=self.r, p=self.p,
+                              maxmem=256 * self.n * self.r + 2 ** 20)
+
+hashers = {
+    (PBKDF2Hasher.scheme, PBKDF2Hasher.version): PBKDF2Hasher,
+    (ScryptHasher.scheme, ScryptHasher.version): ScryptHasher
+}
+
+current_hasher = PBKDF2Hasher()
+
+def configure(settings):
+    """Pick the hasher for new hashes based on the app settings."""
+
+    global current_hasher
+
+    scheme = settings.get('asb.password_scheme', PBKDF2Hasher.scheme)
+
+    if scheme == PBKDF2Hasher.scheme:
+        current_hasher = PBKDF2Hasher(
+            int(settings.get('asb.password_pbkdf2_iterations', 4000))
+        )
+    elif scheme == ScryptHasher.scheme:
+        current_hasher = ScryptHasher(
+            int(settings.get('asb.password_scrypt_n', 16384)),
+            int(settings.get('asb.password_scrypt_r', 8)),
+            int(settings.get('asb.password_scrypt_p', 1))
+        )
+    else:
+        raise ValueError('Unknown password scheme: {0}'.format(scheme))
+
+def encode(data):
+    """base64-encode some bytes for putting in a hash string."""
+
+    return base64.b64encode(data).decode('ASCII').rstrip('=')
+
+def decode(data):
+    """Undo encode()."""
+
+    return base64.b64decode(data + '=' * (-len(data) % 4))
+
+def hash_password(password):
+    """Hash a password with the current hasher."""
+
+    salt = os.urandom(16)
+
+    return '${0}${1}${2}${3}${4}'.format(
+        current_hasher.scheme, current_hasher.version,
+        current_hasher.parameters, encode(salt),
+        encode(current_hasher.derive(password, salt))
+    )
+
+def check_password(password, password_hash):
+    """Return whether the password matches the hash."""
+
+    if password_hash.startswith('$p5k2$'):
+        # Old hash from the pbkdf2 package
+        import pbkdf2
+
+        return hmac.compare_digest(pbkdf2.crypt(password, password_hash),
+                                   password_hash)
+
+    # A malformed hash just doesn't match anything (binascii.Error, from bad
+    # base64, is a ValueError)
+    try:
+        (_, scheme, version, parameters, salt, hash) = password_hash.split('$')
+        hasher = hashers[scheme, version].from_parameters(parameters)
+        salt = decode(salt)
+        hash = decode(hash)
+    except (ValueError, KeyError):
+        return False
+
+    return hmac.compare_digest(hasher.derive(password, salt), hash)
+
+def needs_rehash(password_hash):
+    """Return whether a hash was made with something other than the current
+    hasher and its current parameters.
+    """
+
+    prefix = '${0}${1}${2}$'.format(current_hasher.scheme,
+        current_hasher.version, current_hasher.parameters)
+
+    return not password_hash.startswith(prefix)
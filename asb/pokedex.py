@@ -0,0 +1,97 @@
+"""Per-process caches of data derived from the Pokédex tables.
+
+Pokédex tables only change when the CSVs are reloaded with `asbdb update`, so
+anything built purely from them can be built once per process and then kept
+around.  Builders register themselves with the @cached decorator; reload()
+throws everything away so it'll be rebuilt on next use (and lets anything
+registered with @on_reload know), and warm_up() builds everything ahead of
+time.
+
+Nothing tells running workers about `asbdb update`, so restart the app
+afterwards to pick up the new data.
+"""
+
+import functools
+import hashlib
+import threading
+
+import pkg_resources
+
+_builders = []
+_reload_hooks = []
+_cache = {}
+_lock = threading.RLock()
+_data_version = None
+
+def cached(builder):
+    """Decorate a function that takes no arguments and builds something from
+    the Pokédex, so that it only gets called once until the next reload().
+    """
+
+    @functools.wraps(builder)
+    def get():
+        try:
+            return _cache[builder]
+        except KeyError:
+            pass
+
+        with _lock:
+            # Someone else might have built it while we waited for the lock
+            if builder not in _cache:
+                _cache[builder] = builder()
+
+            return _cache[builder]
+
+    _builders.append(get)
+    return get
+
+def on_reload(hook):
+    """Decorate a function that takes no arguments, so that it gets called
+    whenever the caches are reloaded.
+    """
+
+    _reload_hooks.append(hook)
+    return hook
+
+def reload():
+    """Forget everything, so that it'll all be rebuilt from the database."""
+
+    global _data_version
+
+    with _lock:
+        _cache.clear()
+        _data_version = None
+
+    for hook in _reload_hooks:
+        hook()
+
+def warm_up(registry=None):
+    """Build every registered cache now.
+
+    This is meant to be used as a warm-up hook (see asb.startup), which is
+    where the registry argument comes from.
+    """
+
+    for get in _builders:
+        get()
+
+def data_version():
+    """Return a short hash of the Pokédex CSVs, which changes whenever the data
+    does.
+    """
+
+    global _data_version
+
+    if _data_version is None:
+        hash = hashlib.sha1()
+        filenames = pkg_resources.resource_listdir('asb', 'db/data')
+
+        for filename in sorted(filenames):
+            if filename.endswith('.csv'):
+                hash.update(filename.encode('UTF-8'))
+                hash.update(pkg_resources.resource_string(
+                    'asb', 'db/data/{0}'.format(filename)))
+
+        _data_version = hash.hexdigest()[:16]
+
+    return _data_version
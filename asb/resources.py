@@ -34,6 +34,10 @@ class Root(dict):
         (sec.Allow, 'admin', 'battle.edit'),
         (sec.Deny, sec.Everyone, 'battle.edit'),
 
+        (sec.Allow, 'admin', 'battle.approve-queue'),
+        (sec.Allow, 'mod', 'battle.approve-queue'),
+        (sec.Deny, sec.Everyone, 'battle.approve-queue'),
+
         (sec.Allow, 'admin', 'flavor.edit'),
         (sec.Allow, 'mod', 'flavor.edit'),
         (sec.Deny, sec.Everyone, 'flavor.edit'),
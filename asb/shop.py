@@ -0,0 +1,89 @@
+"""The shop catalog: everything the Pokémon and item shops need to know about
+what's for sale.
+
+The catalog is built once per process from the Pokédex tables and then never
+changes (until the app is restarted), so the shops can render pages and price
+carts without going to the database.  The objects in it are detached from any
+session, with everything the shops use already loaded; don't try to add them
+to a session, and don't touch any other relationships on them.
+"""
+
+import collections
+import itertools
+import types
+
+import sqlalchemy as sqla
+import sqlalchemy.orm
+
+from asb import db
+import asb.pokedex
+
+ShopCatalog = collections.namedtuple('ShopCatalog',
+    ['rarities', 'species', 'item_categories', 'items'])
+ShopCatalog.__doc__ = """The shop catalog.
+
+- rarities: A tuple of Rarity objects, in order, each with its buyable
+  species in rarity.pokemon_species.
+- species: A mapping of identifiers to buyable PokemonSpecies.
+- item_categories: A tuple of (ItemCategory, items) pairs, in order, where
+  items is a tuple of the buyable Items in that category.
+- items: A mapping of identifiers to buyable Items.
+"""
+
+@asb.pokedex.cached
+def catalog():
+    """Build and return the shop catalog."""
+
+    session = sqla.orm.Session(bind=db.DBSession.bind)
+
+    try:
+        rarities = (
+            session.query(db.Rarity)
+            .options(
+                sqla.orm.subqueryload_all(
+                    'pokemon_species.default_form.abilities.ability'),
+                sqla.orm.subqueryload('pokemon_species.default_form.types'),
+                sqla.orm.subqueryload_all(
+                    'pokemon_species.forms.condition'),
+                sqla.orm.subqueryload('pokemon_species.genders')
+            )
+            .order_by(db.Rarity.id)
+            .all()
+        )
+
+        species = {}
+
+        for rarity in rarities:
+            for a_species in rarity.pokemon_species:
+                # These are all already in the identity map, but they still
+                # need to be "loaded" before we detach everything
+                a_species.rarity
+                a_species.default_form.species
+
+                species[a_species.identifier] = a_species
+
+        items = (
+            session.query(db.Item)
+            .join(db.ItemCategory)
+            .filter(db.Item.price.isnot(None))
+            .options(sqla.orm.contains_eager('category'))
+            .order_by(db.ItemCategory.order, db.Item.order, db.Item.name)
+            .all()
+        )
+
+        item_categories = tuple(
+            (category, tuple(category_items))
+            for (category, category_items) in
+            itertools.groupby(items, lambda item: item.category)
+        )
+    finally:
+        # Closing the session detaches everything without expiring it
+        session.close()
+
+    return ShopCatalog(
+        rarities=tuple(rarities),
+        species=types.MappingProxyType(species),
+        item_categories=item_categories,
+        items=types.MappingProxyType(
+            {item.identifier: item for item in items})
+    )
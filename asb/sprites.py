@@ -0,0 +1,336 @@
+"""Sprite sheets for icons, and the CSS to go with them.
+
+`asbsprites items` packs every icon in asb/static/images/items into one sheet,
+asb/static/images/item-icons.png, and writes asb/static/item-icons.css with a
+class for each item, so that a page full of items only needs one image:
+
+    <span class="item-icon item-potion"></span>
+
+`asbsprites pokemon-icons DIRECTORY` does the same for Pokémon icons: it
+regenerates asb/static/images/pokemon-icons.png, pokemon-icons-shiny.png and
+asb/static/icons.css from a directory of individual icons.  The icons should be
+named after form identifiers (e.g. deoxys-attack.png), with -male or -female
+on the end for gender differences (e.g. unfezant-male.png), with the shiny
+versions under the same names in a shiny/ subdirectory.  Identical icons only
+go on the sheet once and share a rule, and each species' default form also
+gets the species identifier as a class.
+
+Both commands need Pillow, which the site itself doesn't.
+
+At runtime, sprite_url() finds the right sprite for a form (and gender, and
+shininess) with a single dict lookup, using a manifest of
+asb/static/images/pokemon built once per process instead of checking the
+filesystem on every render.
+"""
+
+import argparse
+import collections
+import csv
+import hashlib
+import importlib.util
+import math
+import os
+
+import pkg_resources
+
+import asb.assets
+import asb.pokedex
+
+ITEM_ICON_HEADER = """\
+/* Generated by `asbsprites items`; don't edit by hand! */
+
+span.item-icon {{
+    width: {width}px;  height: {height}px;
+    background-image: url(/static/images/item-icons.png);
+    display: inline-block;
+    vertical-align: middle;
+    padding: 0;  margin: 0;
+}}
+"""
+
+POKEMON_ICON_HEADER = """\
+/* Generated by `asbsprites pokemon-icons`; don't edit by hand! */
+
+span.pokemon-icon {{
+    width: {width}px;  height: {height}px;
+    background-image: url(/static/images/pokemon-icons.png);
+    display: inline-block;
+    vertical-align: middle;
+    padding: 0;  margin: 0;
+}}
+
+span.pokemon-icon.shiny {{
+    background-image: url(/static/images/pokemon-icons-shiny.png);
+}}
+"""
+
+GENDERS = ['male', 'female']
+
+# Every gender a Pokémon can have, for the sprite manifest
+ALL_GENDERS = ['female', 'male', 'genderless']
+
+def static_path(path):
+    """Return the filesystem path to something in asb/static."""
+
+    return pkg_resources.resource_filename('asb', 'static/{0}'.format(path))
+
+@asb.pokedex.cached
+def sprite_manifest():
+    """Build and return a dict of (form identifier, gender identifier, shiny)
+    triples to sprite URLs, with None for the gender meaning any gender.
+
+    Every gender has an entry for every form, falling back to the form's
+    ungendered sprite if there isn't a gendered one.
+    """
+
+    manifest = {}
+
+    for (shiny, path) in [(False, 'images/pokemon'),
+                          (True, 'images/pokemon/shiny')]:
+        filenames = pkg_resources.resource_listdir('asb',
+            'static/{0}'.format(path))
+        names = {filename[:-len('.png')] for filename in filenames
+                 if filename.endswith('.png')}
+
+        for name in names:
+            url = asb.assets.url('{0}/{1}.png'.format(path, name))
+            manifest[name, None, shiny] = url
+
+            for gender in ALL_GENDERS:
+                manifest.setdefault((name, gender, shiny), url)
+
+        # Gendered sprites take precedence over the fallbacks above
+        for name in names:
+            (base, _, gender) = name.rpartition('-')
+
+            if gender in GENDERS and base in names:
+                manifest[base, gender, shiny] = manifest[name, None, shiny]
+
+    return manifest
+
+def sprite_url(form_identifier, gender=None, shiny=False):
+    """Return the URL of a form's sprite, for the given gender (if any) and
+    shininess.
+    """
+
+    try:
+        return sprite_manifest()[form_identifier, gender, shiny]
+    except KeyError:
+        # No sprite at all; this'll be a broken image, but at least it'll be
+        # obvious which one is missing
+        path = 'images/pokemon/shiny' if shiny else 'images/pokemon'
+        return asb.assets.url('{0}/{1}.png'.format(path, form_identifier))
+
+def css_rule(selectors, x, y):
+    """Return a CSS rule setting the background position for some selectors,
+    wrapped to 79 columns.
+    """
+
+    declaration = '{{ background-position: -{0}px -{1}px; }}'.format(x, y)
+    lines = []
+    line = ''
+
+    for selector in selectors:
+        piece = selector if not line else ', ' + selector
+
+        if line and len(line) + len(piece) + 1 > 79:
+            lines.append(line + ',')
+            line = '    ' + selector
+        else:
+            line += piece
+
+    if len(line) + len(declaration) + 1 > 79:
+        lines.extend([line, '    ' + declaration])
+    else:
+        lines.append(line + ' ' + declaration)
+
+    return '\n'.join(lines)
+
+def pack(images, columns=None):
+    """Pack a list of same-sized PIL images into a grid, and return the sheet
+    along with a list of each image's (x, y) position on it.
+    """
+
+    from PIL import Image
+
+    (width, height) = images[0].size
+
+    if columns is None:
+        columns = math.ceil(math.sqrt(len(images)))
+
+    rows = math.ceil(len(images) / columns)
+    sheet = Image.new('RGBA', (columns * width, rows * height))
+    positions = []
+
+    for (n, image) in enumerate(images):
+        (row, column) = divmod(n, columns)
+        position = (column * width, row * height)
+        sheet.paste(image.convert('RGBA'), position)
+        positions.append(position)
+
+    return (sheet, positions)
+
+def build_item_icons():
+    """Pack the item icons into a sheet and write the sheet and its CSS."""
+
+    from PIL import Image
+
+    directory = static_path('images/items')
+    filenames = sorted(filename for filename in os.listdir(directory)
+                       if filename.endswith('.png'))
+
+    images = [Image.open(os.path.join(directory, filename))
+              for filename in filenames]
+
+    (sheet, positions) = pack(images)
+    sheet.save(static_path('images/item-icons.png'), optimize=True)
+
+    (width, height) = images[0].size
+    rules = [ITEM_ICON_HEADER.format(width=width, height=height)]
+
+    for (filename, (x, y)) in zip(filenames, positions):
+        identifier = filename[:-len('.png')]
+        rules.append(css_rule(['.item-{0}'.format(identifier)], x, y))
+
+    with open(static_path('item-icons.css'), 'w', encoding='UTF-8') as css:
+        css.write('\n'.join(rules) + '\n')
+
+    print('Packed {0} item icons.'.format(len(filenames)))
+
+def pokedex_forms():
+    """Read the forms from the Pokédex CSVs, and return a dict of form
+    identifiers to (order, species identifier, is default) triples.
+    """
+
+    def read(table):
+        filename = pkg_resources.resource_filename('asb',
+            'db/data/{0}.csv'.format(table))
+
+        with open(filename, encoding='UTF-8', newline='') as table_csv:
+            return list(csv.DictReader(table_csv))
+
+    species = {row['id']: row['identifier'] for row in read('pokemon_species')}
+
+    return {
+        row['identifier']: (int(row['order']), species[row['species_id']],
+                            row['is_default'] == 'True')
+        for row in read('pokemon_forms')
+    }
+
+def icon_selectors(name, forms):
+    """Return the CSS selectors for the icon with the given name (i.e. its
+    filename without .png), and a sort key for it.
+    """
+
+    (base, _, gender) = name.rpartition('-')
+    species_identifiers = {species for (order, species, is_default)
+                           in forms.values()}
+    gendered = gender in GENDERS and (base in forms or
+                                      base in species_identifiers)
+    selectors = []
+
+    if name in forms:
+        (order, species, is_default) = forms[name]
+        selectors.append('.{0}'.format(name))
+
+        if is_default and species != name:
+            selectors.append('.{0}'.format(species))
+
+        # e.g. Meowstic's male form is also male Meowstic
+        if gendered:
+            selectors.append('.{0}.{1}'.format(base, gender))
+
+        return (selectors, (order, name))
+    elif gendered and base in forms:
+        return (['.{0}.{1}'.format(base, gender)], (forms[base][0], name))
+    else:
+        return (['.{0}'.format(name)], (math.inf, name))
+
+def build_pokemon_icons(directory, columns=31):
+    """Pack a directory of Pokémon icons into the two icon sheets, and write
+    the sheets and icons.css.
+    """
+
+    from PIL import Image
+
+    forms = pokedex_forms()
+    shiny_directory = os.path.join(directory, 'shiny')
+
+    names = [filename[:-len('.png')] for filename in os.listdir(directory)
+             if filename.endswith('.png')]
+
+    # Group identical icons (both normal and shiny) together
+    icons = collections.OrderedDict()
+
+    for name in sorted(names, key=lambda name: icon_selectors(name, forms)[1]):
+        paths = [os.path.join(directory, name + '.png'),
+                 os.path.join(shiny_directory, name + '.png')]
+
+        if not os.path.exists(paths[1]):
+            # No shiny version; use the normal one for both
+            paths[1] = paths[0]
+
+        # Compare the actual pixels, since the same image can be saved in
+        # different ways
+        digest = hashlib.sha1()
+
+        for path in paths:
+            digest.update(Image.open(path).convert('RGBA').tobytes())
+
+        key = digest.hexdigest()
+
+        if key not in icons:
+            icons[key] = (paths, [])
+
+        for selector in icon_selectors(name, forms)[0]:
+            if selector not in icons[key][1]:
+                icons[key][1].append(selector)
+
+    normal = [Image.open(paths[0]) for (paths, selectors) in icons.values()]
+    shiny = [Image.open(paths[1]) for (paths, selectors) in icons.values()]
+
+    (sheet, positions) = pack(normal, columns)
+    sheet.save(static_path('images/pokemon-icons.png'), optimize=True)
+    (shiny_sheet, _) = pack(shiny, columns)
+    shiny_sheet.save(static_path('images/pokemon-icons-shiny.png'),
+        optimize=True)
+
+    (width, height) = normal[0].size
+    rules = [POKEMON_ICON_HEADER.format(width=width, height=height)]
+
+    for ((paths, selectors), (x, y)) in zip(icons.values(), positions):
+        rules.append(css_rule(selectors, x, y))
+
+    with open(static_path('icons.css'), 'w', encoding='UTF-8') as css:
+        css.write('\n'.join(rules) + '\n')
+
+    print('Packed {0} Pokémon icons ({1} unique).'.format(len(names),
+        len(icons)))
+
+def main(argv=None):
+    """Parse arguments and build whichever sheet was asked for."""
+
+    parser = argparse.ArgumentParser(
+        description='Build icon sprite sheets and their CSS.')
+    subparsers = parser.add_subparsers(title='commands', dest='command')
+    subparsers.required = True
+
+    items_parser = subparsers.add_parser('items',
+        help='Pack the item icons into a sheet.')
+    items_parser.set_defaults(func=lambda args: build_item_icons())
+
+    pokemon_parser = subparsers.add_parser('pokemon-icons',
+        help='Rebuild the Pokémon icon sheets from individual icons.')
+    pokemon_parser.add_argument('directory',
+        help='The directory with all the icons in it.')
+    pokemon_parser.add_argument('--columns', type=int, default=31,
+        help='How many icons wide to make the sheet.')
+    pokemon_parser.set_defaults(
+        func=lambda args: build_pokemon_icons(args.directory, args.columns))
+
+    args = parser.parse_args(argv)
+
+    if importlib.util.find_spec('PIL') is None:
+        parser.error('asbsprites needs Pillow; pip install Pillow first')
+
+    args.func(args)
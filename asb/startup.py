@@ -0,0 +1,250 @@
+"""Bits for getting the app up and running.
+
+Startup is split into two phases.  The import phase imports and scans the
+views and sets up the WSGI app, and doesn't touch the database.  The warm-up
+phase is optional and runs whatever hooks are listed in the asb.warm_up
+setting, e.g.:
+
+    asb.warm_up =
+        asb.pokedex.warm_up
+        asb.startup.compile_templates
+
+Each hook is called with the app's registry.  When the app is loaded before
+forking workers (e.g. gunicorn's --preload), anything the hooks build is
+shared with every worker.
+
+Set asb.startup_report = true to log how long each step took.
+
+Compiled templates are kept in memory, and also written to disk if
+mako.module_directory is set, so that other workers (and the next restart)
+can skip compiling them.  Each version of the templates gets its own
+subdirectory, named after a hash of their source, so compiled modules never
+outlive the templates they came from.  To compile them all ahead of time,
+e.g. while deploying:
+
+    asbtemplates production.ini
+
+Old versions are left alone, since workers still running the last deploy may
+be using them.  Once they're gone, clear them out with:
+
+    asbtemplates --prune production.ini
+"""
+
+import argparse
+import hashlib
+import importlib
+import logging
+import os
+import pkgutil
+import re
+import shutil
+import sys
+import time
+
+import pkg_resources
+from pyramid.config import Configurator
+from pyramid.interfaces import IRendererFactory
+import pyramid.paster
+from pyramid.path import DottedNameResolver
+from pyramid.settings import asbool, aslist
+import transaction
+
+from asb.db import DBSession
+
+log = logging.getLogger(__name__)
+
+def timed(name, function, *args):
+    """Call function(*args), and return a (name, seconds, new modules) tuple.
+
+    The time includes any other modules that were imported for the first time
+    along the way, so whatever imports something heavy first gets the blame
+    for it.
+    """
+
+    already_loaded = set(sys.modules)
+    start = time.perf_counter()
+    function(*args)
+    seconds = time.perf_counter() - start
+    new_modules = len(set(sys.modules) - already_loaded)
+
+    return (name, seconds, new_modules)
+
+def scan_views(config):
+    """Import every module under asb.views, then scan them for views, and
+    return a list of (step, seconds, new modules) tuples.
+
+    Only asb.views is scanned, since that's where all the view_configs are;
+    scanning all of asb would import everything in it, including Markdown and
+    bleach (which only the templates use).
+    """
+
+    import asb.views
+
+    timings = []
+    modules = asb.views.__path__
+
+    for (finder, name, is_package) in pkgutil.walk_packages(modules,
+      'asb.views.'):
+        timings.append(timed('import ' + name, importlib.import_module,
+            name))
+
+    timings.append(timed('scan asb.views', config.scan, 'asb.views'))
+    return timings
+
+def warm_up(registry, settings):
+    """Run all the warm-up hooks listed in settings, and return a list of
+    (hook, seconds) pairs.
+    """
+
+    resolver = DottedNameResolver()
+    timings = []
+
+    try:
+        for hook_name in aslist(settings.get('asb.warm_up', '')):
+            hook = resolver.maybe_resolve(hook_name)
+
+            start = time.perf_counter()
+            hook(registry)
+            timings.append((hook_name, time.perf_counter() - start))
+    finally:
+        # None of this should have written anything, and we don't want to
+        # hang onto a connection we're about to share with forked workers
+        transaction.abort()
+        DBSession.remove()
+
+    return timings
+
+def compile_templates(registry):
+    """Compile every Mako template ahead of time."""
+
+    lookup = registry.getUtility(IRendererFactory, name='.mako').lookup
+
+    for template in template_paths():
+        lookup.get_template(template)
+
+_template_version = None
+
+def template_version():
+    """Return a short hash of the source of every template."""
+
+    global _template_version
+
+    if _template_version is None:
+        hash = hashlib.sha1()
+
+        for path in sorted(template_paths()):
+            hash.update(path.encode('UTF-8'))
+            hash.update(pkg_resources.resource_string('asb',
+                'templates{0}'.format(path)))
+
+        _template_version = hash.hexdigest()[:16]
+
+    return _template_version
+
+def configure_module_directory(settings):
+    """Point mako.module_directory at the subdirectory for the current
+    templates, if it's set at all.
+    """
+
+    root = settings.get('mako.module_directory')
+
+    if not root:
+        return
+
+    version = template_version()
+
+    if os.path.basename(os.path.normpath(root)) == version:
+        # Already done
+        return
+
+    settings['mako.module_directory'] = os.path.join(root, version)
+
+def prune_module_directory(root):
+    """Delete the compiled templates for every other version of the
+    templates from root, and return the names of the directories deleted.
+
+    Only directories named like a template version are touched, so nothing
+    else that happens to live in root goes with them.
+    """
+
+    version = template_version()
+    pruned = []
+
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+
+        if (name != version and re.fullmatch('[0-9a-f]{16}', name) and
+          os.path.isdir(path) and not os.path.islink(path)):
+            shutil.rmtree(path)
+            pruned.append(name)
+
+    return pruned
+
+def precompile_main(argv=None):
+    """Compile every template into mako.module_directory, without starting
+    the app.
+    """
+
+    parser = argparse.ArgumentParser(
+        description='Compile all the templates ahead of time.')
+    parser.add_argument('config',
+        help='The path to the configuration .ini to use.')
+    parser.add_argument('--prune', action='store_true',
+        help='Also delete templates compiled for any other version of the '
+        'templates.  Only do this once nothing running still uses them.')
+    args = parser.parse_args(argv)
+
+    settings = pyramid.paster.get_appsettings(args.config)
+    root = settings.get('mako.module_directory')
+
+    if not root:
+        parser.error('mako.module_directory isn\'t set, so there\'s nowhere '
+            'to put the compiled templates')
+
+    configure_module_directory(settings)
+
+    config = Configurator(settings=settings)
+    config.include('pyramid_mako')
+    config.commit()
+
+    start = time.perf_counter()
+    compile_templates(config.registry)
+
+    print('Compiled templates into {0} in {1:.3f}s'.format(
+        settings['mako.module_directory'], time.perf_counter() - start))
+
+    if args.prune:
+        for name in prune_module_directory(root):
+            print('Deleted old templates in {0}'.format(
+                os.path.join(root, name)))
+
+def template_paths(directory='templates'):
+    """Recursively list all the .mako files in asb's templates directory, as
+    lookup paths (e.g. /indices/trainers.mako).
+    """
+
+    for filename in pkg_resources.resource_listdir('asb', directory):
+        path = '{0}/{1}'.format(directory, filename)
+
+        if pkg_resources.resource_isdir('asb', path):
+            yield from template_paths(path)
+        elif filename.endswith('.mako'):
+            yield path[len('templates'):]
+
+def report(import_timings, warm_up_timings, total):
+    """Log how long startup took, and where that time went."""
+
+    log.info('Started up in %.3fs', total)
+
+    for (step, seconds, new_modules) in sorted(import_timings,
+      key=lambda timing: timing[1], reverse=True):
+        log.info('  %-39s %.3fs (%d new modules)', step, seconds,
+            new_modules)
+
+    for (hook, seconds) in warm_up_timings:
+        log.info('  warm-up %-31s %.3fs', hook, seconds)
+
+def should_report(settings):
+    """Return whether the startup report is turned on."""
+
+    return asbool(settings.get('asb.startup_report', False))
@@ -3,8 +3,6 @@
 import urllib.parse
 import urllib.request
 
-import bs4
-
 def parse_tcodf_url(link):
     """Parse a TCoDf URL, and make sure it's actually a TCoDf URL."""
 
@@ -79,6 +77,7 @@ def thread_id(link):
         link = ('http://forums.dragonflycave.com/showthread.php?p={}'
             .format(post))
 
+        import bs4
         page = bs4.BeautifulSoup(urllib.request.urlopen(link))
 
         print_link = page.find('a', text='Show Printable Version')
@@ -120,6 +119,8 @@ def user_info(tcodf_id):
     dict of relevant info.
     """
 
+    import bs4
+
     link = user_forum_link(tcodf_id)
     page = bs4.BeautifulSoup(urllib.request.urlopen(link))
     info = {}
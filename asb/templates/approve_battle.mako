@@ -56,7 +56,7 @@
         <td class="stat">+${pokemon.happiness_gained}</td>
 
         % if pokemon.item is not None and pokemon.item.identifier in ['lucky-egg', 'soothe-bell']:
-        <td class="icon"><img src="/static/images/items/${pokemon.item.identifier}.png"></td>
+        <td class="icon">${h.item_icon(pokemon.item)}</td>
         % else:
         <td></td>
         % endif
@@ -21,6 +21,9 @@
     <li><b>D:</b> Deny</li>
 </ul>
 
+% if not rows:
+<p>There are no transactions awaiting approval.</p>
+% else:
 <form action="/bank/approve" method="POST">
 ${form.csrf_token() | n}
 ${h.form_error_list(form.csrf_token.errors)}
@@ -40,24 +43,24 @@ ${h.form_error_list(form.csrf_token.errors)}
 </thead>
 
 <tbody>
-% for transaction in form.transactions:
+% for (field, transaction) in rows:
 <tr>
-    % for option in transaction.what_do:
+    % for option in field.what_do:
     <td class="input">${option() | n}</td>
     % endfor
 
-    <td>${h.link(transaction.transaction.trainer)}</td>
-    <td class="price">$${transaction.transaction.amount}</td>
-    <td class="input">$${transaction.correction(size=2, maxlength=3)}</td>
+    <td>${h.link(transaction.trainer)}</td>
+    <td class="price">$${transaction.amount}</td>
+    <td class="input">$${field.correction(size=2, maxlength=3)}</td>
     <td>
-        <a href="${transaction.transaction.link}" target="_blank">
-            Post #${transaction.transaction.tcod_post_id}
+        <a href="${transaction.link}" target="_blank">
+            Post #${transaction.tcod_post_id}
         </a>
     </td>
 
     <td class="notes">
         <ul>
-            % for note in transaction.transaction.notes:
+            % for note in transaction.notes:
             % if note.trainer is None:
             <li>??? said: ${note.note}</li>
             % elif note.trainer == request.user:
@@ -67,7 +70,7 @@ ${h.form_error_list(form.csrf_token.errors)}
             % endif
             % endfor
 
-            % for prev_trans in transaction.transaction.previous_transactions:
+            % for prev_trans in previous[transaction.id]:
             <li>
                 % if prev_trans.state == 'pending':
                 ${prev_trans.trainer.name} has another claim for this post
@@ -105,9 +108,12 @@ ${h.form_error_list(form.csrf_token.errors)}
             </li>
             % endfor
 
-            <li>${transaction.notes(size=60, placeholder='Add a note') | n}</li>
+            <li>
+                ${field.transaction_id() | n}
+                ${field.notes(size=60, placeholder='Add a note') | n}
+            </li>
 
-            % for (field, errors) in transaction.errors.items():
+            % for errors in field.errors.values():
             % for error in errors:
             <li class="form-error">${error}</li>
             % endfor
@@ -122,3 +128,8 @@ ${h.form_error_list(form.csrf_token.errors)}
 
 ${form.submit() | n}
 </form>
+% endif
+
+% if page is not None:
+${h.pager(page)}
+% endif
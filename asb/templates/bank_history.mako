@@ -1,4 +1,5 @@
 <%inherit file='/base.mako'/>\
+<%namespace name='h' file='/helpers/helpers.mako'/>\
 <%namespace name='t' file='/helpers/tables.mako'/>\
 <%block name='title'>Bank - The Cave of Dragonflies ASB</%block>\
 
@@ -6,3 +7,4 @@
 
 <h1>Transaction history</h1>
 ${t.transaction_table(transactions)}
+${h.pager(page)}
@@ -1,3 +1,4 @@
+<%namespace name="h" file="/helpers/helpers.mako"/>\
 <%
     from asb.views.user import LoginForm
     login_form = LoginForm(csrf_context=request.session)
@@ -7,15 +8,16 @@
 <html>
 <head>
     <title><%block name='title'>The Cave of Dragonflies ASB</%block></title>
-    <link rel="stylesheet" href="/static/asb.css">
-    <link rel="stylesheet" href="/static/icons.css">
-    <link rel="icon" href="/static/images/favicon.png">
+    <link rel="stylesheet" href="${h.asset('asb.css')}">
+    <link rel="stylesheet" href="${h.asset('icons.css')}">
+    <link rel="stylesheet" href="${h.asset('item-icons.css')}">
+    <link rel="icon" href="${h.asset('images/favicon.png')}">
 </head>
 
 <%block name='body_tag'><body></%block>
 <header>
 <a href="/">
-    <img src="/static/images/banner.png"
+    <img src="${h.asset('images/banner.png')}"
     alt="The Cave of Dragonflies ASB Database">
 </a>
 
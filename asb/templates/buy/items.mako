@@ -56,7 +56,7 @@ ${cart_form.csrf_token() | n}
         errors.extend('{}: {}'.format(item.name, error) for error in field.errors)
     %>
     <tr>
-        <td class="icon"><img src="/static/images/items/${item.identifier}.png" alt=""></td>
+        <td class="icon">${h.item_icon(item)}</td>
         <td class="focus-column">${h.link(item)}</td>
         <td class="price">$${item.price}</td>
         <td class="input">${field(size=2) | n}</td>
@@ -110,6 +110,7 @@ ${h.form_error_list(*browse.errors.values())}
     </tr>
 </thead>
 
+<% summaries = browse.summaries() %>
 % for category, items in browse.categorized_items():
 <tbody>
     <tr class="subheader-row">
@@ -119,10 +120,10 @@ ${h.form_error_list(*browse.errors.values())}
     % for item, button in items:
     <tr>
         <td class="input">${button}</td>
-        <td class="icon"><img src="/static/images/items/${item.identifier}.png" alt=""></td>
+        <td class="icon">${h.item_icon(item)}</td>
         <td class="focus-column"><a href="/items/${item.identifier}">${item.name}</a></td>
         <td class="price">$${item.price}</td>
-        <td>${item.summary | md.convert, chomp, n}</td>
+        <td>${summaries.get(item.id) | md.convert, chomp, n}</td>
     </tr>
     % endfor
 </tbody>
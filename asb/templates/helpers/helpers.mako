@@ -4,6 +4,11 @@
     db_resource.__name__, **kwargs)}">${text or db_resource.name}</a>\
 </%def>
 
+<%def name="asset(path)">\
+<% from asb.assets import url %>\
+${url(path)}\
+</%def>
+
 <%def name="num(n, invisible_plus=True)">\
 % if n < 0:
 −${n * -1}\
@@ -48,30 +53,19 @@ ${pokemon_form_icon(pokemon.form, gender=pokemon.gender.identifier,
 "></span>\
 </%def>
 
+<%def name="item_icon(item)">\
+<span class="item-icon item-${item.identifier}"></span>\
+</%def>
+
 <%def name="pokemon_sprite(pokemon)">\
 ${pokemon_form_sprite(pokemon.form, gender=pokemon.gender.identifier,
                       shiny=pokemon.is_shiny)}\
 </%def>
 
 <%def name="pokemon_form_sprite(form, gender=None, shiny=False, alt='')">\
-<%
-   if shiny:
-       path = '/static/images/pokemon/shiny'
-   else:
-       path = '/static/images/pokemon'
-
-   filename = '{}/{}.png'.format(path, form.identifier)
-
-   if gender is not None:
-       from pkg_resources import resource_exists
-
-       alt_filename = '{}/{}-{}.png'.format(path, form.identifier, gender)
-
-       if resource_exists('asb', alt_filename):
-           filename = alt_filename
-%>\
+<% from asb.sprites import sprite_url %>\
 <div class="portrait">
-    <img src="${filename}" alt="${alt}">
+    <img src="${sprite_url(form.identifier, gender, shiny)}" alt="${alt}">
 </div>
 </%def>
 
@@ -98,6 +92,23 @@ ${pokemon_form_sprite(pokemon.form, gender=pokemon.gender.identifier,
 % endif
 </%def>
 
+<%def name="pager(page, anchor=None)">
+<%
+    fragment = '#{0}'.format(anchor) if anchor else ''
+%>
+% if page.has_previous or page.has_next:
+<p class="pager">
+    % if page.has_previous:
+    <a href="${page.first_url}${fragment}">« First</a>
+    <a href="${page.previous_url}${fragment}" rel="prev">‹ Previous</a>
+    % endif
+    % if page.has_next:
+    <a href="${page.next_url}${fragment}" rel="next">Next ›</a>
+    % endif
+</p>
+% endif
+</%def>
+
 <%def name="appeal(move)">\
 % if move.appeal == -1:
 +??\
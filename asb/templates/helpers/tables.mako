@@ -55,7 +55,7 @@
 <%def name="item_cell(pokemon)">
 % if pokemon.item is not None:
 <td class="icon">
-    <img src="/static/images/items/${pokemon.item.identifier}.png" alt="">
+    ${h.item_icon(pokemon.item)}
 </td>
 <td>${h.link(pokemon.item)}</td>
 % else:
@@ -63,6 +63,18 @@
 % endif
 </%def>
 
+# Evolution badge; only used if pokemon_table gets an evolvable set
+<%def name="evolve_col()"><col class="evolve"></%def>
+<%def name="evolve_cell(pokemon, evolvable)">
+% if pokemon.id not in evolvable:
+<td></td>
+% elif request.has_permission('edit.evolve', pokemon):
+<td class="evolve"><a href="${request.resource_url(pokemon, 'evolve')}" class="evolve-badge">Can evolve!</a></td>
+% else:
+<td class="evolve"><span class="evolve-badge">Can evolve!</span></td>
+% endif
+</%def>
+
 # KOs
 <%def name="ko_col()"><col class="stat"></%def>
 <%def name="ko_header()"><th>KOs</th></%def>
@@ -77,7 +89,7 @@
 # The actual table function
 <%def name="pokemon_table(*pokemon_lists, subheader_colspan=10,
     subheaders=None, extra_left_cols=[], skip_cols=[], extra_right_cols=[],
-    highlight_condition=None, link_subheaders=False)">\
+    highlight_condition=None, link_subheaders=False, evolvable=None)">\
 <%
   if subheaders is None:
       subheaders = [None] * len(pokemon_lists)
@@ -94,6 +106,12 @@
       ('happiness', {'col': happiness_col, 'th': happiness_header, 'td': happiness_cell}),
       ('item', {'col': item_col, 'th': item_header, 'td': item_cell})
   ] if name not in skip_cols)
+
+  # evolvable is a set of the IDs of Pokémon that can evolve right now
+  if evolvable is not None:
+      columns.append({'col': evolve_col, 'th': empty_header,
+                      'td': lambda pokemon: evolve_cell(pokemon, evolvable)})
+
   columns.extend(extra_right_cols)
 %>
 <table class="standard-table">
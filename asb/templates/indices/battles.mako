@@ -15,7 +15,11 @@ ${t.battle_table(open)}
 % endif
 
 <h1 id="waiting">Battles awaiting closure</h1>
-% if approval:
+% if approvable:
+<p><a href="/battles/approve">Go to the approval queue →</a></p>
+${t.battle_table(approvable, approval, show_end=True,
+    subheaders=['Awaiting your approval', 'Others'])}
+% elif approval:
 ${t.battle_table(approval, show_end=True)}
 % else:
 <p>None right now!</p>
@@ -0,0 +1,12 @@
+<%inherit file='/base.mako'/>\
+<%namespace name="t" file="/helpers/tables.mako"/>\
+<%block name='title'>Battle approval queue - The Cave of Dragonflies ASB</%block>\
+
+<p><a href="/battles">← Back to all battles</a></p>
+
+<h1>Battles awaiting your approval</h1>
+% if battles:
+${t.battle_table(battles, show_end=True)}
+% else:
+<p>None right now!</p>
+% endif
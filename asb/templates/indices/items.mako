@@ -1,4 +1,5 @@
 <%inherit file='/base.mako'/>\
+<%namespace name="h" file="/helpers/helpers.mako"/>\
 <%block name='title'>Items - The Cave of Dragonflies ASB</%block>\
 <% from asb.markdown import md, chomp %>
 
@@ -26,7 +27,7 @@
 
     % for item in category.items:
     <tr>
-        <td class="icon"><img src="/static/images/items/${item.identifier}.png" alt=""></td>
+        <td class="icon">${h.item_icon(item)}</td>
         <td class="focus-column"><a href="/items/${item.identifier}">${item.name}</a></td>
         % if item.price is not None:
         <td class="price">$${item.price | n, str}</td>
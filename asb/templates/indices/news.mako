@@ -10,3 +10,4 @@
 % for post in news:
 ${h.news_post(post)}
 % endfor
+${h.pager(news)}
@@ -0,0 +1,31 @@
+<%inherit file='/base.mako'/>\
+<%namespace name="h" file="/helpers/helpers.mako"/>\
+<%namespace name="t" file="/helpers/tables.mako"/>\
+<%block name='title'>Compare movesets - The Cave of Dragonflies ASB</%block>\
+
+<h1>Compare movesets</h1>
+
+<form action="${request.path}" method="GET">
+    ${form.a(placeholder='Pokémon')} vs ${form.b(placeholder='Pokémon')}
+    <button>Compare</button>
+    ${h.form_error_list(form.a.errors, form.b.errors)}
+</form>
+
+% if pokemon is not None:
+<%
+    (a, b) = pokemon
+    sections = [
+        ('Moves both {0} and {1} learn'.format(a.name, b.name), shared),
+        ('Moves only {0} learns'.format(a.name), only_a),
+        ('Moves only {0} learns'.format(b.name), only_b)
+    ]
+%>
+% for (heading, moves) in sections:
+<h2>${heading}</h2>
+% if moves:
+${t.move_table(moves)}
+% else:
+<p>None.</p>
+% endif
+% endfor
+% endif
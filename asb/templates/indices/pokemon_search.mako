@@ -0,0 +1,45 @@
+<%inherit file='/base.mako'/>\
+<%namespace name="h" file="/helpers/helpers.mako"/>\
+<%namespace name="t" file="/helpers/tables.mako"/>\
+<%block name='title'>Pokémon search - The Cave of Dragonflies ASB</%block>\
+
+<h1>Pokémon search</h1>
+
+<form action="${request.path}" method="GET">
+    <dl>
+        <dt>Learns all of</dt>
+        <dd>
+            % for move in form.moves:
+            ${move(placeholder='Move')}
+            % endfor
+        </dd>
+        % for errors in form.moves.errors:
+        % for error in errors:
+        <dd class="form-error">${error}</dd>
+        % endfor
+        % endfor
+
+        <dt>${form.type.label}</dt>
+        <dd>${form.type()}</dd>
+        % for error in form.type.errors:
+        <dd class="form-error">${error}</dd>
+        % endfor
+
+        <dt>${form.ability.label}</dt>
+        <dd>${form.ability(placeholder='Any')}</dd>
+        % for error in form.ability.errors:
+        <dd class="form-error">${error}</dd>
+        % endfor
+    </dl>
+
+    <button>Search</button>
+</form>
+
+% if results is not None:
+<h1>Results</h1>
+% if results:
+${t.pokemon_form_table(results, squashed_forms=True)}
+% else:
+<p>Nothing matches all of that.</p>
+% endif
+% endif
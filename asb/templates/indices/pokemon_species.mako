@@ -12,7 +12,7 @@
 </%def>
 
 <%def name="pop_cell(a_pokemon)">\
-% if pokemon[a_pokemon] is None:
+% if not pokemon[a_pokemon]:
 <td class="stat population-zero">0</td>\
 % else:
 <td class="stat">${h.link(a_pokemon, text=str(pokemon[a_pokemon]),
@@ -24,6 +24,8 @@
 <p><a href="/pokemon/buy">Buy Pokémon →</a></p>
 % endif
 
+<p><a href="/species/search">Search by moves, type and ability →</a></p>
+
 ${t.pokemon_form_table(
     pokemon,
     extra_right_cols=[{'col': pop_col, 'th': pop_header, 'td': pop_cell}]
@@ -29,3 +29,5 @@ ${h.pokemon_icon(pokemon)}\
     % endfor
 </tbody>
 </table>
+
+${h.pager(trainers)}
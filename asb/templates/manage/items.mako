@@ -32,7 +32,7 @@
     % for (item, quantity) in request.user.bag:
     <tr>
         <td class="icon">
-            <img src="/static/images/items/${item.identifier}.png" alt="">
+            ${h.item_icon(item)}
         </td>
         <td>${h.link(item)}</td>
         <td class="stat">${quantity}</td>
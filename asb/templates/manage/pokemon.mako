@@ -40,7 +40,7 @@
 
 <form action="/pokemon/manage#squad" method="POST">
 ${deposit.csrf_token() | n}
-${t.pokemon_table(trainer.squad, skip_cols=['trainer'],
+${t.pokemon_table(trainer.squad, skip_cols=['trainer'], evolvable=evolvable,
     extra_left_cols=[{'col': ticky_col, 'th': ticky_header, 'td': deposit_tickies}])}
 ${deposit.submit() | n}
 </form>
@@ -60,7 +60,7 @@ ${deposit.submit() | n}
 
 <form action="/pokemon/manage#pc" method="POST">
 ${withdraw.csrf_token() | n}
-${t.pokemon_table(trainer.pc, skip_cols=['trainer'],
+${t.pokemon_table(trainer.pc, skip_cols=['trainer'], evolvable=evolvable,
     extra_left_cols=[{'col': ticky_col, 'th': ticky_header, 'td': withdraw_tickies}])}
 ${withdraw.submit() | n}
 </form>
@@ -37,8 +37,8 @@ ${h.type_icon(type)}\
     </dd>
 
     <dt>Population</dt>
-    % if census:
-    <dd><a href="#census">${len(census)}</a></dd>
+    % if population:
+    <dd><a href="#census">${population}</a></dd>
     % else:
     <dd>0</dd>
     % endif
@@ -114,8 +114,14 @@ ${next(or_) | n}pay $${method.buyable_price}\
     % for layer in evo_tree:
     <tr>
         % for evo, colspan in layer:
+        % if evo is None:
+        <td colspan="${colspan}"></td>
+        % else:
         <%
-            current = evo == pokemon.species
+            # If this form isn't in the tree itself, highlight its species
+            current = (evo.id == pokemon.id or
+                       (not evo_tree_has_form and
+                        evo.species_id == pokemon.species_id))
 
             if (evo.identifier.endswith('-alola') or
                   evo.species.identifier == 'meowstic'):
@@ -125,7 +131,7 @@ ${next(or_) | n}pay $${method.buyable_price}\
         %>
         <td colspan="${colspan}" class="${'focus' if current else ''}">
             % if current:
-            ${h.pokemon_form_icon(pokemon, alt='')}${evo.name}
+            ${h.pokemon_form_icon(evo, alt='')}${evo.name}
             % else:
             ${h.pokemon_form_icon(evo, alt='')}${h.link(evo, text=text)}
             % endif
@@ -134,6 +140,7 @@ ${next(or_) | n}pay $${method.buyable_price}\
             <p class="evolution-method">${evo_method(evo.evolution_method)}</p>
             % endif
         </td>
+        % endif
         % endfor
     </tr>
     % endfor
@@ -142,16 +149,17 @@ ${next(or_) | n}pay $${method.buyable_price}\
 % if len(pokemon.species.forms) > 1:
 <h1>Forms</h1>
 
+<% from asb.sprites import sprite_url %>\
 <ul id="species-form-list">
 % for form in pokemon.species.forms:
 % if form == pokemon:
 <li class="focus portrait">
-    <img src="/static/images/pokemon/${form.identifier}.png" alt="${form.name}">
+    <img src="${sprite_url(form.identifier)}" alt="${form.name}">
 </li>
 % else:
 <li class="portrait">
     <a href="${request.resource_path(form.__parent__, form.__name__)}">
-        <img src="/static/images/pokemon/${form.identifier}.png" alt="${form.name}">
+        <img src="${sprite_url(form.identifier)}" alt="${form.name}">
     </a>
 </li>
 % endif
@@ -168,9 +176,11 @@ ${next(or_) | n}pay $${method.buyable_price}\
 % endif
 
 <h1>Moves</h1>
+<p><a href="/species/compare?a=${pokemon.identifier}">Compare with another Pokémon's moves →</a></p>
 ${t.move_table(pokemon.moves)}
 
 % if census:
 <h1 id="census">${pokemon.name} in the league</h1>
-${t.pokemon_table(census, skip_cols=['species'])}
+${t.pokemon_table(census.rows, skip_cols=['species'])}
+${h.pager(census, anchor='census')}
 % endif
@@ -44,7 +44,7 @@ ${h.form_error_list(form.money.errors)}
     % for (field, (item, quantity)) in zip(form.items, form.items.items):
     <tr>
         <td class="icon item-icon">
-            <img src="/static/images/items/${item.identifier}.png" alt="">
+            ${h.item_icon(item)}
         </td>
         <td class="focus-column">${h.link(item)}</td>
         <td class="input">${field(size=1, maxlength=2)}</td>
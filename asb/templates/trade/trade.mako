@@ -61,8 +61,7 @@
                 % for (item, qty) in items:
                     <tr>
                         <td class="icon item-icon">
-                            <img src="/static/images/items/${item.identifier}.png"
-                                 alt="">
+                            ${h.item_icon(item)}
                         </td>
                         <td class="focus-column">${h.link(item)}</td>
                         <td class="stat">${qty}</td>
@@ -33,8 +33,9 @@ following reason: ${trainer.ban.reason}</strong></p>
 ${t.pokemon_table(
     trainer.squad, trainer.pc,
     subheaders=['Active squad', 'PC'],
-    subheader_colspan=9,
-    skip_cols=['trainer']
+    subheader_colspan=10,
+    skip_cols=['trainer'],
+    evolvable=evolvable
 )}
 
 % if trainer.bag:
@@ -55,7 +56,7 @@ ${t.pokemon_table(
     % for (item, qty) in trainer.bag:
     <tr>
         <td class="icon item-icon">
-            <img src="/static/images/items/${item.identifier}.png" alt="">
+            ${h.item_icon(item)}
         </td>
         <td class="focus-column">${h.link(item)}</td>
         <td class="stat">${qty}</td>
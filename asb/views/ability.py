@@ -5,6 +5,8 @@ from sqlalchemy.orm import joinedload, subqueryload
 from sqlalchemy.orm.exc import NoResultFound
 
 from asb import db
+from asb.conditional import conditional_get
+from asb.output_cache import cacheable
 from asb.resources import AbilityIndex
 
 relevant_move_categories = {
@@ -17,7 +19,8 @@ relevant_move_categories = {
     'overcoat': 'powder',
 }
 
-@view_config(context=AbilityIndex, renderer='/indices/abilities.mako')
+@view_config(context=AbilityIndex, renderer='/indices/abilities.mako',
+  decorator=(conditional_get, cacheable))
 def ability_index(context, request):
     """The index of all the different abilities."""
 
@@ -29,7 +32,8 @@ def ability_index(context, request):
 
     return {'abilities': abilities}
 
-@view_config(context=db.Ability, renderer='/ability.mako')
+@view_config(context=db.Ability, renderer='/ability.mako',
+  decorator=(conditional_get, cacheable))
 def ability(ability, request):
     """An ability's dex page."""
 
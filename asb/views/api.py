@@ -0,0 +1,412 @@
+"""A read-only JSON API for bulk Pokédex and league data, for bots and league
+tools that would otherwise have to scrape the HTML.
+
+Every endpoint lives under /api/v1/ and returns an object like:
+
+    {"data": [...], "next": "<url or null>", "previous": "<url or null>"}
+
+Lists are paginated with asb.pagination, so ?after= and ?before= take the
+cursors from the next and previous URLs, and ?per_page= (up to 500) sets the
+page size.  ?fields=id,name,... picks which fields each row has; only those
+columns are selected, straight into tuples rather than ORM objects.
+
+Pokédex endpoints get an ETag that only depends on the data version and the
+URL, so a client that already has the current version gets a 304 without
+any queries at all.  League endpoints get an ETag of their actual content.
+
+Errors are JSON too, like:
+
+    {"status": "400 Bad Request", "message": "...", "detail": "..."}
+"""
+
+import collections
+import datetime
+import hashlib
+import json
+
+import pyramid.httpexceptions as httpexc
+from pyramid.response import Response
+from pyramid.view import view_config
+import sqlalchemy as sqla
+import sqlalchemy.orm
+
+from asb import db
+import asb.pagination
+import asb.pokedex
+
+API_VERSION = 1
+
+Field = collections.namedtuple('Field', ['columns', 'combine'])
+Field.__doc__ = """A field that API rows can have.
+
+- columns: The column expressions to select for it.
+- combine: A function to turn the values of those columns into the field's
+  value, or None if there's only one column and its value is the field's.
+"""
+
+def field(column):
+    """Return a Field for a single column."""
+
+    return Field([column], None)
+
+def identifier_of(table, foreign_key):
+    """Return a correlated subquery for the identifier of the row in table
+    that foreign_key points at.
+    """
+
+    return (
+        sqla.select([table.identifier])
+        .where(table.id == foreign_key)
+        .as_scalar()
+    )
+
+def form_type(form_id, slot):
+    """Return a correlated subquery for the identifier of a form's type in a
+    given slot.
+    """
+
+    return (
+        sqla.select([db.Type.identifier])
+        .where(db.Type.id == db.PokemonFormType.type_id)
+        .where(db.PokemonFormType.pokemon_form_id == form_id)
+        .where(db.PokemonFormType.slot == slot)
+        .as_scalar()
+    )
+
+def combine_types(*types):
+    """Turn one type per slot into a list, skipping empty slots."""
+
+    return [type for type in types if type is not None]
+
+def default_form_column(column):
+    """Return a correlated subquery for a column of a species's default form.
+    """
+
+    return (
+        sqla.select([column])
+        .where(db.PokemonForm.species_id == db.PokemonSpecies.id)
+        .where(db.PokemonForm.is_default)
+        .as_scalar()
+    )
+
+default_form_id = default_form_column(db.PokemonForm.id)
+
+evolves_from = sqla.orm.aliased(db.PokemonSpecies)
+
+species_fields = collections.OrderedDict([
+    ('id', field(db.PokemonSpecies.id)),
+    ('identifier', field(db.PokemonSpecies.identifier)),
+    ('name', field(db.PokemonSpecies.name)),
+    ('order', field(db.PokemonSpecies.order)),
+    ('rarity', field(db.PokemonSpecies.rarity_id)),
+    ('price', field(
+        sqla.select([db.Rarity.price])
+        .where(db.Rarity.id == db.PokemonSpecies.rarity_id)
+        .as_scalar()
+    )),
+    ('evolves_from', field(
+        sqla.select([evolves_from.identifier])
+        .where(evolves_from.id == db.PokemonSpecies.evolves_from_species_id)
+        .as_scalar()
+    )),
+    ('default_form', field(default_form_column(db.PokemonForm.identifier))),
+    ('types', Field([form_type(default_form_id, 1),
+                     form_type(default_form_id, 2)], combine_types)),
+    ('speed', field(default_form_column(db.PokemonForm.speed)))
+])
+
+move_fields = collections.OrderedDict([
+    ('id', field(db.Move.id)),
+    ('identifier', field(db.Move.identifier)),
+    ('name', field(db.Move.name)),
+    ('type', field(identifier_of(db.Type, db.Move.type_id))),
+    ('damage_class', field(
+        identifier_of(db.DamageClass, db.Move.damage_class_id))),
+    ('power', field(db.Move.power)),
+    ('accuracy', field(db.Move.accuracy)),
+    ('priority', field(db.Move.priority)),
+    ('target', field(identifier_of(db.MoveTarget, db.Move.target_id))),
+    ('contest_category', field(
+        identifier_of(db.ContestCategory, db.Move.contest_category_id))),
+    ('appeal', field(db.Move.appeal)),
+    ('bonus_appeal', field(db.Move.bonus_appeal)),
+    ('jam', field(db.Move.jam)),
+    ('bonus_jam', field(db.Move.bonus_jam))
+])
+
+pokemon_fields = collections.OrderedDict([
+    ('id', field(db.Pokemon.id)),
+    ('identifier', field(db.Pokemon.identifier)),
+    ('name', field(db.Pokemon.name)),
+    ('species', field(
+        sqla.select([db.PokemonSpecies.identifier])
+        .where(db.PokemonSpecies.id == db.PokemonForm.species_id)
+        .where(db.PokemonForm.id == db.Pokemon.pokemon_form_id)
+        .as_scalar()
+    )),
+    ('form', field(
+        identifier_of(db.PokemonForm, db.Pokemon.pokemon_form_id))),
+    ('gender', field(identifier_of(db.Gender, db.Pokemon.gender_id))),
+    ('ability', field(
+        sqla.select([db.Ability.identifier])
+        .where(db.Ability.id == db.PokemonFormAbility.ability_id)
+        .where(db.PokemonFormAbility.pokemon_form_id ==
+               db.Pokemon.pokemon_form_id)
+        .where(db.PokemonFormAbility.slot == db.Pokemon.ability_slot)
+        .as_scalar()
+    )),
+    ('is_shiny', field(db.Pokemon.is_shiny)),
+    ('experience', field(db.Pokemon.experience)),
+    ('happiness', field(db.Pokemon.happiness)),
+    ('is_in_squad', field(db.Pokemon.is_in_squad)),
+    ('item', field(
+        sqla.select([db.Item.identifier])
+        .where(db.Item.id == db.TrainerItem.item_id)
+        .where(db.TrainerItem.pokemon_id == db.Pokemon.id)
+        .as_scalar()
+    )),
+    ('birthday', field(db.Pokemon.birthday))
+])
+
+battle_fields = collections.OrderedDict([
+    ('id', field(db.Battle.id)),
+    ('identifier', field(db.Battle.identifier)),
+    ('name', field(db.Battle.name)),
+    ('start_date', field(db.Battle.start_date)),
+    ('end_date', field(db.Battle.end_date)),
+    ('length', field(db.Battle.length)),
+    ('needs_approval', field(db.Battle.needs_approval)),
+    ('tcodf_thread_id', field(db.Battle.tcodf_thread_id))
+])
+
+def paginator(column):
+    """Return a Paginator for API rows, keyed on an ID column."""
+
+    return asb.pagination.Paginator(column, per_page=100, max_per_page=500,
+        key=lambda row: (row[0],))
+
+species_paginator = paginator(db.PokemonSpecies.id)
+move_paginator = paginator(db.Move.id)
+pokemon_paginator = paginator(db.Pokemon.id)
+battle_paginator = paginator(db.Battle.id)
+
+def selected_fields(request, fields):
+    """Return the fields the request asks for, as a list of (name, Field)
+    pairs, or all of them if it doesn't say.
+
+    Raise HTTPBadRequest if it asks for one that doesn't exist.
+    """
+
+    names = request.GET.get('fields')
+
+    if not names:
+        return list(fields.items())
+
+    names = names.split(',')
+    unknown = [name for name in names if name not in fields]
+
+    if unknown:
+        raise httpexc.HTTPBadRequest('No such field(s): {0}'.format(
+            ', '.join(unknown)))
+
+    return [(name, fields[name]) for name in names]
+
+def projection(key_column, fields):
+    """Return a query selecting the key column and the columns for the given
+    fields.
+
+    Every field column gets a label named after its field, since SQLAlchemy
+    can't tell unlabeled subqueries apart in the results.
+    """
+
+    columns = [key_column]
+
+    for (name, field) in fields:
+        if len(field.columns) == 1:
+            columns.append(field.columns[0].label(name))
+        else:
+            columns.extend(
+                column.label('{0}_{1}'.format(name, n))
+                for (n, column) in enumerate(field.columns)
+            )
+
+    return db.DBSession.query(*columns)
+
+def serialize(value):
+    """Make a value JSON-friendly."""
+
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+
+    return value
+
+def rows(page, fields):
+    """Turn a page of projected rows into a list of dicts."""
+
+    result = []
+
+    for row in page:
+        # The first column is always the key column
+        values = iter(row[1:])
+        data = collections.OrderedDict()
+
+        for (name, field) in fields:
+            field_values = [serialize(next(values))
+                            for column in field.columns]
+
+            if field.combine is None:
+                (data[name],) = field_values
+            else:
+                data[name] = field.combine(*field_values)
+
+        result.append(data)
+
+    return result
+
+def json_response(request, page, fields, etag=None):
+    """Return a JSON response for a page of rows.
+
+    If etag is None, the response's ETag is a hash of its contents, and it's
+    a 304 if the client already has them.
+    """
+
+    body = json.dumps({
+        'data': rows(page, fields),
+        'next': page.next_url,
+        'previous': page.previous_url
+    }, separators=(',', ':')).encode('UTF-8')
+
+    if etag is None:
+        etag = hashlib.sha1(body).hexdigest()
+
+        if etag in request.if_none_match:
+            return not_modified(etag)
+
+    response = Response(body=body, content_type='application/json',
+        charset='UTF-8')
+    response.etag = etag
+    response.cache_control = 'no-cache'
+    return response
+
+def not_modified(etag):
+    """Return a 304 for a given ETag."""
+
+    response = httpexc.HTTPNotModified()
+    response.etag = etag
+    response.cache_control = 'no-cache'
+    return response
+
+def error_response(status_int, status, message, detail=None):
+    """Return a JSON error response."""
+
+    body = json.dumps({'status': status, 'message': message, 'detail': detail},
+        separators=(',', ':')).encode('UTF-8')
+
+    response = Response(body=body, content_type='application/json',
+        charset='UTF-8')
+    response.status_int = status_int
+    return response
+
+@view_config(context=Exception, path_info='^/api/')
+def error(error, request):
+    """Return a JSON error for an arbitrary uncaught exception in the API,
+    instead of the HTML error page.
+    """
+
+    return error_response(500, '500 Internal Server Error', None)
+
+@view_config(context=httpexc.HTTPError, path_info='^/api/')
+def error_specific(error, request):
+    """Return a JSON error for an uncaught HTTPError in the API, instead of
+    the HTML error page.
+    """
+
+    return error_response(error.code,
+        '{} {}'.format(error.code, error.title), error.explanation,
+        error.detail)
+
+def dex_etag(request):
+    """Return the ETag for a Pokédex endpoint, which only changes when the
+    data or the URL does.
+    """
+
+    parts = [str(API_VERSION), asb.pokedex.data_version(), request.path_qs]
+    return hashlib.sha1('|'.join(parts).encode('UTF-8')).hexdigest()
+
+def dex_list(request, key_column, fields, paginator):
+    """Return a response for a list of Pokédex things."""
+
+    # Check the parameters first, so a bad request can't get a 304
+    fields = selected_fields(request, fields)
+    etag = dex_etag(request)
+
+    if etag in request.if_none_match:
+        return not_modified(etag)
+
+    query = projection(key_column, fields)
+    page = paginator.paginate(request, query)
+
+    return json_response(request, page, fields, etag=etag)
+
+@view_config(route_name='api.species', request_method='GET')
+def species(context, request):
+    """All the Pokémon species, with their default forms' types and speed."""
+
+    return dex_list(request, db.PokemonSpecies.id, species_fields,
+        species_paginator)
+
+@view_config(route_name='api.moves', request_method='GET')
+def moves(context, request):
+    """All the moves."""
+
+    return dex_list(request, db.Move.id, move_fields, move_paginator)
+
+@view_config(route_name='api.trainer.pokemon', request_method='GET')
+def trainer_pokemon(context, request):
+    """An active trainer's active Pokémon, i.e. the ones on their profile."""
+
+    trainer_id = int(request.matchdict['id'])
+
+    trainer = (
+        db.DBSession.query(db.Trainer.id)
+        .filter_by(id=trainer_id)
+        .filter(db.Trainer.is_active())
+        .first()
+    )
+
+    if trainer is None:
+        raise httpexc.HTTPNotFound()
+
+    fields = selected_fields(request, pokemon_fields)
+
+    query = (
+        projection(db.Pokemon.id, fields)
+        .filter(db.Pokemon.trainer_id == trainer_id)
+        .filter(db.Pokemon.is_active(check_trainer=False))
+    )
+
+    page = pokemon_paginator.paginate(request, query)
+    return json_response(request, page, fields)
+
+@view_config(route_name='api.battles', request_method='GET')
+def battles(context, request):
+    """All battles, or, with ?since=YYYY-MM-DD, the ones that started or
+    ended on or after that date.
+    """
+
+    fields = selected_fields(request, battle_fields)
+    query = projection(db.Battle.id, fields)
+
+    since = request.GET.get('since')
+
+    if since is not None:
+        try:
+            since = datetime.datetime.strptime(since, '%Y-%m-%d').date()
+        except ValueError:
+            raise httpexc.HTTPBadRequest('since must be a date (YYYY-MM-DD)')
+
+        query = query.filter(sqla.or_(db.Battle.start_date >= since,
+                                      db.Battle.end_date >= since))
+
+    page = battle_paginator.paginate(request, query)
+    return json_response(request, page, fields)
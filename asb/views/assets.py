@@ -0,0 +1,52 @@
+import mimetypes
+import os
+
+import pyramid.httpexceptions as httpexc
+from pyramid.response import FileResponse
+from pyramid.view import view_config
+
+import asb.assets
+
+# A year, which is as long as you're supposed to go
+MAX_AGE = 365 * 24 * 60 * 60
+
+@view_config(route_name='assets')
+def asset(context, request):
+    """Serve a fingerprinted static file, precompressed if possible."""
+
+    built_path = '/'.join(request.matchdict['subpath'])
+    entry = asb.assets.built_paths.get(built_path)
+
+    # Only serve things that are in the manifest, so there's no way to get at
+    # anything else on the filesystem
+    if entry is None:
+        raise httpexc.HTTPNotFound()
+
+    filename = os.path.join(asb.assets.directory, built_path)
+    (content_type, _) = mimetypes.guess_type(built_path)
+    suffixes = dict(asb.assets.ENCODINGS)
+
+    # Pick whichever precompressed version the client likes best.  With no
+    # Accept-Encoding at all, best_match() happily picks the first offer, but
+    # a client that didn't ask for anything might not be able to decode it.
+    if 'Accept-Encoding' in request.headers:
+        offers = [encoding for (encoding, suffix) in asb.assets.ENCODINGS
+                  if encoding in entry['encodings']]
+        best = request.accept_encoding.best_match(offers + ['identity'])
+    else:
+        best = 'identity'
+
+    if best in suffixes:
+        filename += suffixes[best]
+
+    response = FileResponse(filename, request=request,
+        content_type=content_type or 'application/octet-stream')
+
+    if best in suffixes:
+        response.content_encoding = best
+
+    if entry['encodings']:
+        response.vary = ('Accept-Encoding',)
+
+    response.cache_control = 'public, max-age={0}, immutable'.format(MAX_AGE)
+    return response
@@ -0,0 +1,46 @@
+import pyramid.httpexceptions as httpexc
+from pyramid.view import view_config
+
+import asb.autocomplete
+
+MAX_LIMIT = 50
+
+@view_config(route_name='autocomplete', renderer='json')
+def autocomplete(context, request):
+    """Return autocomplete suggestions for the q parameter as JSON.
+
+    kinds, if given, should be a comma-separated list of the kinds of thing to
+    suggest (species, item, move, trainer); limit is how many suggestions to
+    return, up to MAX_LIMIT.
+    """
+
+    query = request.GET.get('q', '')
+
+    kinds = request.GET.get('kinds')
+
+    if kinds is not None:
+        kinds = set(kinds.split(','))
+
+        if not kinds or kinds - set(asb.autocomplete.KINDS):
+            raise httpexc.HTTPBadRequest('kinds must be some of: {0}'.format(
+                ', '.join(asb.autocomplete.KINDS)))
+
+    try:
+        limit = int(request.GET.get('limit', 10))
+    except ValueError:
+        raise httpexc.HTTPBadRequest('limit must be a number')
+
+    if not 1 <= limit <= MAX_LIMIT:
+        raise httpexc.HTTPBadRequest(
+            'limit must be between 1 and {0}'.format(MAX_LIMIT))
+
+    suggestions = asb.autocomplete.suggest(query, kinds, limit)
+
+    return [
+        {
+            'kind': suggestion.kind,
+            'name': suggestion.name,
+            'url': request.application_url + suggestion.path
+        }
+        for suggestion in suggestions
+    ]
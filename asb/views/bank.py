@@ -5,10 +5,12 @@ import itertools
 import pyramid.httpexceptions as httpexc
 from pyramid.view import view_config
 import sqlalchemy as sqla
+import sqlalchemy.orm
 import wtforms
 
 from asb import db
 import asb.forms
+import asb.pagination
 import asb.tcodf
 
 
@@ -126,17 +128,11 @@ class TransactionClearForm(asb.forms.CSRFTokenForm):
 
     clear = wtforms.SubmitField('Clear non-pending transactions')
 
-class ApprovalForm(asb.forms.CSRFTokenForm):
-    """A form for approving and denying bank transactions.
-
-    Transactions must be added manually using the approval_form method below.
-    """
-
-    submit = wtforms.SubmitField('Submit')
-
 class ApprovalTransactionForm(wtforms.Form):
     """A single transaction in an ApprovalForm."""
 
+    transaction_id = wtforms.IntegerField(widget=wtforms.widgets.HiddenInput())
+
     what_do = wtforms.RadioField(choices=[
         ('ignore', None),
         ('approve', None),
@@ -173,37 +169,104 @@ class ApprovalTransactionForm(wtforms.Form):
                     "this transaction."
                 )
 
-def approval_form(user, *args, **kwargs):
-    """Create and return an approval form."""
+class ApprovalForm(asb.forms.CSRFTokenForm):
+    """A form for approving and denying bank transactions."""
 
-    # Get all pending transactions, except for the approver's own
-    transactions = (
+    transactions = wtforms.FieldList(
+        wtforms.FormField(ApprovalTransactionForm))
+    submit = wtforms.SubmitField('Submit')
+
+PendingTransaction = collections.namedtuple('PendingTransaction',
+    ['transaction_id'])
+PendingTransaction.__doc__ = """The data for a transaction's row in a fresh
+ApprovalForm.
+
+- transaction_id: The transaction's ID.
+"""
+
+approval_paginator = asb.pagination.Paginator(db.BankTransaction.id,
+    per_page=50)
+
+def pending_transactions(user):
+    """Return a query for all pending transactions, except for the approver's
+    own.
+    """
+
+    return (
         db.DBSession.query(db.BankTransaction)
         .filter_by(state='pending')
         .filter(db.BankTransaction.trainer_id != user.id)
-        .order_by(db.BankTransaction.id)
-        .all()
+        .options(sqla.orm.joinedload('trainer'))
     )
 
-    # Make form
-    class Subform(wtforms.Form):
-        """A subform to hold all the transaction sub-subforms."""
+def approval_details(transactions):
+    """Load the notes on some transactions and any previous claims of the
+    same posts, so that the approval page doesn't have to go back to the
+    database for every row.
+
+    Each transaction's (and previous claim's) notes are loaded into its notes
+    attribute.  Return a dict of transaction IDs to lists of previous claims,
+    oldest first.
+    """
+
+    previous = {transaction.id: [] for transaction in transactions}
+
+    if not transactions:
+        return previous
 
-        pass
+    # Previous claims, by the same trainers of the same posts
+    post_ids = {transaction.tcod_post_id for transaction in transactions
+                if transaction.tcod_post_id is not None}
+    trainer_ids = {transaction.trainer_id for transaction in transactions}
 
-    for transaction_ in transactions:
-        class Subsubform(ApprovalTransactionForm):
-            """An ApprovalTransactionForm that also holds the transaction."""
+    if post_ids:
+        claims = (
+            db.DBSession.query(db.BankTransaction)
+            .filter(db.BankTransaction.tcod_post_id.in_(post_ids))
+            .filter(db.BankTransaction.trainer_id.in_(trainer_ids))
+            .filter(db.BankTransaction.id < max(previous))
+            .options(sqla.orm.joinedload('trainer'),
+                     sqla.orm.joinedload('approver'))
+            .order_by(db.BankTransaction.id)
+            .all()
+        )
+    else:
+        claims = []
+
+    claims_by_post = collections.defaultdict(list)
+
+    for claim in claims:
+        claims_by_post[claim.trainer_id, claim.tcod_post_id].append(claim)
+
+    for transaction in transactions:
+        previous[transaction.id] = [
+            claim for claim in
+            claims_by_post[transaction.trainer_id, transaction.tcod_post_id]
+            if claim.id < transaction.id
+        ]
+
+    # Notes, for the transactions and the previous claims alike
+    noted = {transaction.id: transaction for transaction in transactions}
+    noted.update((claim.id, claim) for claim in claims)
+
+    notes = (
+        db.DBSession.query(db.BankTransactionNote)
+        .filter(db.BankTransactionNote.bank_transaction_id.in_(noted))
+        .options(sqla.orm.joinedload('trainer'))
+        .order_by(db.BankTransactionNote.id)
+        .all()
+    )
 
-            transaction = transaction_
+    notes_by_transaction = collections.defaultdict(list)
 
-        setattr(Subform, 'transaction-{0}'.format(transaction_.id),
-            wtforms.FormField(Subsubform))
+    for note in notes:
+        notes_by_transaction[note.bank_transaction_id].append(note)
 
-    class Form(ApprovalForm):
-        transactions = wtforms.FormField(Subform)
+    for (transaction_id, transaction) in noted.items():
+        sqla.orm.attributes.set_committed_value(transaction, 'notes',
+            notes_by_transaction[transaction_id])
 
-    return Form(*args, **kwargs)
+    return previous
 
 def can_collect_allowance(trainer):
     """Return whether or not this trainer can collect allowance."""
@@ -258,6 +321,8 @@ def recent_transaction_header(transaction):
         return 'Pending'
     elif not transaction.is_read:
         transaction.is_read = True
+        db.TrainerNotifications.bump_bank(transaction.trainer_id,
+            transaction.state, -1)
         return 'Unread'
     else:
         return 'Recent'
@@ -310,7 +375,7 @@ def bank_process(context, request):
             return stuff
 
         # Give the trainer their allowance
-        trainer.money += 3
+        db.MoneyLedger.record(trainer.id, 3, 'allowance')
         trainer.last_collected_allowance = datetime.datetime.utcnow().date()
 
         return httpexc.HTTPSeeOther('/bank')
@@ -328,23 +393,26 @@ def bank_process(context, request):
             return stuff
 
         # Add the transactions
-        for transaction_field in deposit_form.transactions:
-            if transaction_field.amount.data:
-                transaction = db.BankTransaction(
-                    trainer_id=trainer.id,
-                    amount=transaction_field.amount.data,
-                    tcod_post_id=transaction_field.link.post_id
-                )
-                db.DBSession.add(transaction)
+        transaction_fields = [field for field in deposit_form.transactions
+                              if field.amount.data]
+        ids = db.ids.bank_transactions.allocate(len(transaction_fields))
+
+        for (transaction_field, id) in zip(transaction_fields, ids):
+            transaction = db.BankTransaction(
+                id=id,
+                trainer_id=trainer.id,
+                amount=transaction_field.amount.data,
+                tcod_post_id=transaction_field.link.post_id
+            )
+            db.DBSession.add(transaction)
 
-                # Add note, if applicable
-                if transaction_field.notes.data:
-                    db.DBSession.flush()
-                    db.DBSession.add(db.BankTransactionNote(
-                        bank_transaction_id=transaction.id,
-                        trainer_id=trainer.id,
-                        note=transaction_field.notes.data
-                    ))
+            # Add note, if applicable
+            if transaction_field.notes.data:
+                db.DBSession.add(db.BankTransactionNote(
+                    bank_transaction_id=transaction.id,
+                    trainer_id=trainer.id,
+                    note=transaction_field.notes.data
+                ))
 
         request.session.flash("Success!  You'll receive your money as soon as "
             "an ASB mod verifies and approves your transaction.")
@@ -354,6 +422,10 @@ def bank_process(context, request):
         # Mark the user's processed transactions as acknowledged
         for transaction in itertools.chain(transactions['approved'],
           transactions['denied']):
+            if not transaction.is_read:
+                db.TrainerNotifications.bump_bank(trainer.id,
+                    transaction.state, -1)
+
             transaction.state = 'acknowledged'
 
         return httpexc.HTTPSeeOther('/bank')
@@ -366,7 +438,19 @@ def bank_process(context, request):
 def bank_approve(context, request):
     """The bank approving page."""
 
-    return {'form': approval_form(request.user, csrf_context=request.session)}
+    page = approval_paginator.paginate(request,
+        pending_transactions(request.user))
+
+    form = ApprovalForm(csrf_context=request.session, transactions=[
+        PendingTransaction(transaction.id) for transaction in page
+    ])
+
+    return {
+        'form': form,
+        'rows': list(zip(form.transactions, page)),
+        'previous': approval_details(page.rows),
+        'page': page
+    }
 
 @view_config(route_name='bank.approve', request_method='POST',
   renderer='/bank_approve.mako', permission='bank.approve')
@@ -374,38 +458,138 @@ def bank_approve_process(context, request):
     """Process the bank approval form."""
 
     approver = request.user
+    form = ApprovalForm(request.POST, csrf_context=request.session)
+
+    # Only look at transactions that are still pending; if another mod got to
+    # one first, it just drops out of the form.  Locking them means a
+    # simultaneous submission (e.g. a double click) waits for this one to
+    # finish, and then finds them already settled.
+    submitted_ids = {field.transaction_id.data
+                     for field in form.transactions}
+
+    if submitted_ids:
+        transactions = (
+            pending_transactions(approver)
+            .filter(db.BankTransaction.id.in_(submitted_ids))
+            .order_by(db.BankTransaction.id)
+            .with_for_update(of=db.BankTransaction)
+            .all()
+        )
+    else:
+        transactions = []
 
-    form = approval_form(request.user, request.POST,
-        csrf_context=request.session)
+    transactions = {transaction.id: transaction
+                    for transaction in transactions}
+    fields = [field for field in form.transactions
+              if field.transaction_id.data in transactions]
 
     if not form.validate():
-        return {'form': form}
-
-    for field in form.transactions:
-        transaction = field.transaction
+        return {
+            'form': form,
+            'rows': [(field, transactions[field.transaction_id.data])
+                     for field in fields],
+            'previous': approval_details(list(transactions.values())),
+            'page': None
+        }
+
+    notes = []
+    approved = []
+    denied = []
+    corrections = {}
+
+    for field in fields:
+        transaction_id = field.transaction_id.data
 
         if field.notes.data:
-            db.DBSession.add(db.BankTransactionNote(
-                bank_transaction_id=transaction.id,
-                trainer_id=approver.id,
-                note=field.notes.data
-            ))
-
-        if field.what_do.data == 'ignore':
-            continue
-        elif field.what_do.data == 'approve':
-            if field.correction.data is not None:
-                transaction.amount = field.correction.data
+            notes.append({
+                'bank_transaction_id': transaction_id,
+                'trainer_id': approver.id,
+                'note': field.notes.data
+            })
 
-            transaction.trainer.money += transaction.amount
-            transaction.state = 'approved'
+        if field.what_do.data == 'approve':
+            approved.append(transaction_id)
+
+            if field.correction.data is not None:
+                corrections[transaction_id] = field.correction.data
         elif field.what_do.data == 'deny':
-            transaction.state = 'denied'
+            denied.append(transaction_id)
+
+    if notes:
+        db.DBSession.execute(db.BankTransactionNote.__table__.insert(), notes)
+
+    # Settle everything in a handful of set-based updates.  The rows are
+    # locked, so the state check is just a backstop.
+    def settle(transaction_ids, state, **values):
+        if transaction_ids:
+            (db.DBSession.query(db.BankTransaction)
+                .filter(db.BankTransaction.id.in_(transaction_ids))
+                .filter_by(state='pending')
+                .update(dict(values, state=state, approver_id=approver.id),
+                        synchronize_session=False))
+
+    if corrections:
+        amount = sqla.case(corrections, value=db.BankTransaction.id,
+            else_=db.BankTransaction.amount)
+        settle(approved, 'approved', amount=amount)
+    else:
+        settle(approved, 'approved')
+
+    settle(denied, 'denied')
+
+    settled_ids = approved + denied
+
+    if settled_ids:
+        # Only count the transactions this request actually settled
+        def settled(state, trainer_id=None):
+            criteria = [
+                db.BankTransaction.id.in_(settled_ids),
+                db.BankTransaction.state == state,
+                db.BankTransaction.approver_id == approver.id
+            ]
+
+            if trainer_id is not None:
+                criteria.append(db.BankTransaction.trainer_id == trainer_id)
+
+            return sqla.and_(*criteria)
+
+        def total(state, trainer_id):
+            return (
+                sqla.select([sqla.func.count('*')])
+                .where(settled(state, trainer_id))
+                .as_scalar()
+            )
 
-        transaction.approver_id = approver.id
+        trainer_ids = {transactions[transaction_id].trainer_id
+                       for transaction_id in settled_ids}
+
+        # Pay everyone out in one go
+        payouts = (
+            db.DBSession.query(db.BankTransaction.trainer_id,
+                sqla.func.sum(db.BankTransaction.amount))
+            .filter(settled('approved'))
+            .group_by(db.BankTransaction.trainer_id)
+        )
+
+        db.MoneyLedger.record_many(dict(payouts), 'bank')
+
+        notifications = db.TrainerNotifications
+        owner = notifications.trainer_id
+
+        (db.DBSession.query(notifications)
+            .filter(owner.in_(trainer_ids))
+            .update({
+                notifications.unread_approved:
+                    notifications.unread_approved + total('approved', owner),
+                notifications.unread_denied:
+                    notifications.unread_denied + total('denied', owner)
+            }, synchronize_session=False))
 
     return httpexc.HTTPSeeOther('/bank/approve')
 
+transaction_paginator = asb.pagination.Paginator(db.BankTransaction.id,
+    descending=True)
+
 def transaction_month(transaction):
     """Return a header stating what month this transaction happened in, for
     the bank history page.
@@ -421,12 +605,11 @@ def transaction_month(transaction):
 def bank_history(context, request):
     """A list of all the user's previous transactions."""
 
-    transactions = (
+    page = transaction_paginator.paginate(request,
         db.DBSession.query(db.BankTransaction)
         .filter_by(trainer_id=request.user.id)
-        .order_by(db.BankTransaction.id.desc())
     )
 
-    transactions = itertools.groupby(transactions, transaction_month)
+    transactions = itertools.groupby(page, transaction_month)
 
-    return {'transactions': transactions}
+    return {'transactions': transactions, 'page': page}
@@ -314,8 +314,36 @@ def battle_index(context, request):
         elif battle.length != 'cancelled':
             battles['closed'].append(battle)
 
+    # Point out the ones this user can approve, if they can approve any
+    battles['approvable'] = []
+
+    if request.has_permission('battle.approve-queue'):
+        approvable = {
+            id for (id,) in
+            db.Battle.awaiting_approval(request.user.id)
+            .with_entities(db.Battle.id)
+        }
+
+        battles['approvable'] = [battle for battle in battles['approval']
+                                 if battle.id in approvable]
+        battles['approval'] = [battle for battle in battles['approval']
+                               if battle.id not in approvable]
+
     return battles
 
+@view_config(context=BattleIndex, name='approve',
+  renderer='/indices/battles_approve.mako', permission='battle.approve-queue')
+def battle_approval_queue(context, request):
+    """A list of all the closed battles this user can approve."""
+
+    battles = (
+        db.Battle.awaiting_approval(request.user.id)
+        .options(sqla.orm.joinedload('ref'))
+        .all()
+    )
+
+    return {'battles': battles}
+
 @view_config(context=db.Battle, renderer='/battle.mako', request_method='GET')
 def battle(battle, request):
     """A battle."""
@@ -388,6 +416,7 @@ def edit_battle_process(battle, request):
     if form.title.data:
         battle.name = form.title.data
         battle.set_identifier()
+        db.BattleNameCounter.claim(battle.name)
 
     return httpexc.HTTPSeeOther(request.resource_path(battle))
 
@@ -510,6 +539,7 @@ def approve_battle_finalize(battle, request):
 
     # Dish out prize/ref money
     ref_money = 0
+    payouts = collections.Counter()
 
     for team in battle.teams:
         # Add up how many Pokémon were used *against* this team
@@ -533,16 +563,18 @@ def approve_battle_finalize(battle, request):
 
         # Give that much money to each trainer on this team
         for battle_trainer in team.trainers:
-            if not battle_trainer.trainer:
+            if battle_trainer.trainer_id is None:
                 continue
 
-            battle_trainer.trainer.money += prize_money
+            payouts[battle_trainer.trainer_id] += prize_money
 
     # Divide up ref money
     ref_money //= len(battle.all_refs)
 
     for ref in battle.all_refs:
-        ref.trainer.money += ref_money
+        payouts[ref.trainer_id] += ref_money
+
+    db.MoneyLedger.record_many(payouts, 'battle')
 
     battle.needs_approval = False
 
@@ -569,6 +601,106 @@ def reopen_battle(battle, request):
 
     return httpexc.HTTPSeeOther(request.resource_path(battle))
 
+def add_battle_participants(battle_id, teams):
+    """Add teams to a new battle, given as a list of lists of trainers, and
+    snapshot all the trainers' squads into battle_pokemon.
+
+    This takes three statements no matter how many trainers or Pokémon there
+    are; the trainers and Pokémon are copied over with INSERT ... SELECT.
+    """
+
+    team_numbers = {}
+    positions = {}
+
+    for (number, team) in enumerate(teams, 1):
+        for trainer in team:
+            team_numbers[trainer.id] = number
+            positions[trainer.id] = len(positions)
+
+    # Teams
+    db.DBSession.execute(db.BattleTeam.__table__.insert().values([
+        {'battle_id': battle_id, 'team_number': number}
+        for number in range(1, len(teams) + 1)
+    ]))
+
+    # Trainers, in the order they were entered
+    trainers = (
+        sqla.select([
+            sqla.literal(battle_id).label('battle_id'),
+            db.Trainer.id.label('trainer_id'),
+            db.Trainer.name,
+            sqla.case(team_numbers, value=db.Trainer.id).label('team_number')
+        ])
+        .where(db.Trainer.id.in_(team_numbers))
+        .order_by(sqla.case(positions, value=db.Trainer.id))
+    )
+
+    insert_from_select(db.BattleTrainer.__table__, trainers)
+
+    # Pokémon, using the default form unless the form carries into battle
+    default_form = db.PokemonForm.__table__.alias('default_form')
+
+    pokemon = (
+        sqla.select([
+            db.Pokemon.id.label('pokemon_id'),
+            db.BattleTrainer.id.label('battle_trainer_id'),
+            db.Pokemon.name,
+            sqla.case(
+                [(db.PokemonSpecies.form_carries_into_battle,
+                  db.Pokemon.pokemon_form_id)],
+                else_=default_form.c.id
+            ).label('pokemon_form_id'),
+            db.Pokemon.gender_id,
+            db.Pokemon.ability_slot,
+            db.TrainerItem.item_id,
+            db.Pokemon.is_shiny,
+            db.Pokemon.experience,
+            db.Pokemon.happiness,
+            sqla.false().label('participated')
+        ])
+        .select_from(
+            db.BattleTrainer.__table__
+            .join(db.Pokemon.__table__, sqla.and_(
+                db.Pokemon.trainer_id == db.BattleTrainer.trainer_id,
+                db.Pokemon.is_in_squad
+            ))
+            .join(db.PokemonForm.__table__,
+                db.PokemonForm.id == db.Pokemon.pokemon_form_id)
+            .join(db.PokemonSpecies.__table__,
+                db.PokemonSpecies.id == db.PokemonForm.species_id)
+            .join(default_form, sqla.and_(
+                default_form.c.species_id == db.PokemonSpecies.id,
+                default_form.c.is_default
+            ))
+            .outerjoin(db.TrainerItem.__table__,
+                db.TrainerItem.pokemon_id == db.Pokemon.id)
+        )
+        .where(db.BattleTrainer.battle_id == battle_id)
+        .order_by(db.BattleTrainer.id, db.Pokemon.id)
+    )
+
+    insert_from_select(db.BattlePokemon.__table__, pokemon)
+
+def insert_from_select(table, query):
+    """Insert the results of a query into a table, in order.
+
+    The query's columns must be named after the table's columns.  IDs come
+    from the table's sequence if the database has sequences, and are left to
+    autoincrement otherwise.
+    """
+
+    query = query.alias()
+    names = [column.name for column in query.c]
+    columns = list(query.c)
+
+    if db.DBSession.get_bind().dialect.supports_sequences:
+        names.insert(0, 'id')
+        columns.insert(0, table.c.id.default.next_value())
+
+    db.DBSession.execute(
+        table.insert().from_select(names, sqla.select(columns))
+    )
+
 @view_config(context=BattleIndex, name='new', renderer='/new_battle.mako',
   request_method='GET', permission='battle.open')
 def new_battle(context, request):
@@ -588,7 +720,7 @@ def new_battle_process(context, request):
         return {'form': form}
 
     # Create battle
-    battle_id = db.DBSession.execute(db.Battle.battles_id_seq)
+    battle_id = db.ids.battles.next_id()
     battle = db.Battle(
         id=battle_id,
         name='temp-{}'.format(battle_id),
@@ -596,54 +728,21 @@ def new_battle_process(context, request):
         start_date=datetime.datetime.utcnow().date()
     )
 
-    db.DBSession.add(battle)
+    teams = form.trainers.teams
+    battle.set_auto_name(
+        teams=[[trainer.name for trainer in team] for team in teams])
 
-    # Add teams, trainers, and Pokémon
-    for (number, team) in enumerate(form.trainers.teams, 1):
-        battle_team = db.BattleTeam(battle_id=battle_id, team_number=number)
-        db.DBSession.add(battle_team)
-
-        for trainer in team:
-            battle_trainer = db.BattleTrainer(
-                battle_id=battle_id,
-                trainer_id=trainer.id,
-                name = trainer.name,
-                team_number=number
-            )
-
-            db.DBSession.add(battle_trainer)
-            db.DBSession.flush()
-
-            for pokemon in trainer.squad:
-                if pokemon.species.form_carries_into_battle:
-                    form_id = pokemon.pokemon_form_id
-                else:
-                    form_id = pokemon.species.default_form.id
-
-                battle_pokemon = db.BattlePokemon(
-                    pokemon_id=pokemon.id,
-                    battle_trainer_id=battle_trainer.id,
-                    name=pokemon.name,
-                    pokemon_form_id=form_id,
-                    gender_id=pokemon.gender_id,
-                    ability_slot=pokemon.ability_slot,
-                    item_id=None if pokemon.item is None else pokemon.item.id,
-                    is_shiny=pokemon.is_shiny,
-                    experience=pokemon.experience,
-                    happiness=pokemon.happiness
-                )
-
-                db.DBSession.add(battle_pokemon)
+    db.DBSession.add(battle)
 
     # Add the ref
-    battle_ref = db.BattleReferee(
+    db.DBSession.add(db.BattleReferee(
         battle_id=battle_id,
         trainer_id=request.user.id
-    )
-
-    db.DBSession.add(battle_ref)
+    ))
 
-    battle.set_auto_name()
     db.DBSession.flush()
 
+    # Add teams, trainers, and Pokémon
+    add_battle_participants(battle_id, teams)
+
     return httpexc.HTTPSeeOther(request.resource_path(battle))
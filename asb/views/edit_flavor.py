@@ -6,6 +6,7 @@ import wtforms
 
 import asb.db as db
 import asb.forms
+import asb.output_cache
 
 class FlavorEditForm(asb.forms.CSRFTokenForm):
     """A form for editing something's flavor text."""
@@ -85,6 +86,7 @@ def process_edit_flavor(thing, request, effect_class, foreign_key_name,
         thing.effect.is_current = False
 
     db.DBSession.add(new_effect)
+    asb.output_cache.invalidate()
 
     return httpexc.HTTPSeeOther(
         request.resource_path(thing.__parent__, thing.__name__)
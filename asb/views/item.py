@@ -8,8 +8,12 @@ from sqlalchemy.orm.exc import NoResultFound
 import wtforms
 
 from asb import db
+from asb.conditional import conditional_get
+from asb.output_cache import cacheable
 from asb.resources import ItemIndex
+import asb.autocomplete
 import asb.forms
+import asb.shop
 
 class GiveItemForm(asb.forms.CSRFTokenForm):
     """A form for choosing a Pokémon to give a particular item or use an item
@@ -30,7 +34,8 @@ relevant_move_categories = {
     'safety-goggles': 'powder'
 }
 
-@view_config(context=ItemIndex, renderer='/indices/items.mako')
+@view_config(context=ItemIndex, renderer='/indices/items.mako',
+  decorator=(conditional_get, cacheable))
 def item_index(context, request):
     """The index of all the different items."""
 
@@ -43,7 +48,8 @@ def item_index(context, request):
 
     return {'item_categories': item_categories}
 
-@view_config(context=db.Item, renderer='/item.mako')
+@view_config(context=db.Item, renderer='/item.mako',
+  decorator=(conditional_get, cacheable))
 def item(context, request):
     """An item's dex page."""
 
@@ -274,30 +280,41 @@ class BuyItemsForm(asb.forms.CSRFTokenForm):
     item = asb.forms.MultiSubmitField(coerce=lambda value: value)
 
     def __init__(self, *args, **kwargs):
-        """Do usual form setup, then query all the buyable items, keep the
-        results, and set item choices.
-        """
+        """Do usual form setup, then set item choices from the shop catalog."""
 
         super().__init__(*args, **kwargs)
 
-        self.buyable_items = (
-            db.DBSession.query(db.Item)
-            .join(db.ItemCategory)
-            .filter(db.Item.price.isnot(None))
-            .order_by(db.ItemCategory.order, db.Item.order, db.Item.name)
-            .all()
-        )
+        self.item_categories = asb.shop.catalog().item_categories
 
         self.item.choices = [
-            (item.identifier, '+') for item in self.buyable_items
+            (item.identifier, '+')
+            for (category, items) in self.item_categories
+            for item in items
         ]
 
+    def summaries(self):
+        """Return a dict of item IDs to current effect summaries.
+
+        These can be edited, so unlike the items themselves, they aren't part
+        of the shop catalog.
+        """
+
+        return dict(
+            db.DBSession.query(db.ItemEffect.item_id, db.ItemEffect.summary)
+            .filter(db.ItemEffect.is_current)
+            .join(db.Item)
+            .filter(db.Item.price.isnot(None))
+        )
+
     def categorized_items(self):
         """Return items with their buttons, grouped by category."""
 
-        items = zip(self.buyable_items, self.item)
-        items = itertools.groupby(items, lambda item: item[0].category)
-        return items
+        buttons = iter(self.item)
+
+        return [
+            (category, [(item, next(buttons)) for item in items])
+            for (category, items) in self.item_categories
+        ]
 
 class ItemField(wtforms.TextField):
     """A text field for the name of an item to buy, which also fetches and
@@ -318,7 +335,18 @@ class ItemField(wtforms.TextField):
             self.item = None
             return
 
-        # Try to fetch the item
+        # Look in the catalog first, since any buyable item will be there
+        self.item = asb.shop.catalog().items.get(identifier)
+
+        if self.item is not None:
+            return
+
+        # Otherwise, see if it exists at all, for the sake of the error; the
+        # autocomplete index can tell us if it doesn't without a query
+        if not asb.autocomplete.has('item', identifier):
+            self.item = None
+            return
+
         try:
             item = (
                 db.DBSession.query(db.Item)
@@ -334,7 +362,8 @@ class ItemField(wtforms.TextField):
         """Make sure we got an actual, buyable item."""
 
         if self.item is None:
-            raise wtforms.validators.ValidationError('No such item found.')
+            raise wtforms.validators.ValidationError('No such item found.' +
+                asb.autocomplete.did_you_mean(self.data, 'item'))
         elif self.item.price is None:
             raise wtforms.validators.ValidationError(
                 '{} is unbuyable.'.format(self.item.name))
@@ -378,14 +407,9 @@ def get_item_buying_stuff(request):
         # If it's absent/empty, just return what we have
         return (quick_buy, browse, None, None)
 
-    cart_items = {
-        item.identifier: item for item in
-        db.DBSession.query(db.Item)
-        .filter(db.Item.identifier.in_(cart))
-        .all()
-    }
-
-    cart_items = [cart_items[item] for item in cart]
+    catalog_items = asb.shop.catalog().items
+    cart_items = [catalog_items[item] for item in cart
+                  if item in catalog_items]
 
     # Four: the cart form
     # Stick all the item fields in a subform for easy iterating
@@ -476,12 +500,10 @@ def buy_items_process(context, request):
             # Make sure they have enough
             grand_total = sum(item.price * qty for item, qty in final_cart)
 
-            if grand_total > request.user.money:
+            if not db.MoneyLedger.record(request.user.id, -grand_total,
+              'items', non_negative=True):
                 cart_form.buy.errors.append("You can't afford all that!")
-                items = itertools.groupby(item_query.all(),
-                    lambda item: item.category)
-                return {'items': items, 'quick_buy': quick_buy, 'cart': cart,
-                    'cart_form': cart_form}
+                return return_dict
 
             # Give them the items
             for item, quantity in final_cart:
@@ -490,7 +512,6 @@ def buy_items_process(context, request):
                         item_id=item.id)
                     db.DBSession.add(new_item)
 
-            request.user.money -= grand_total
             del request.session['item_cart']
 
             return httpexc.HTTPSeeOther('/items/manage')
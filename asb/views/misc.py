@@ -3,9 +3,11 @@ import random
 import pyramid.httpexceptions as httpexc
 from pyramid.view import view_config
 import sqlalchemy as sqla
+from zope.sqlalchemy import mark_changed
 
 from asb import db
 import asb.forms
+import asb.pokedex
 
 empty_bulletin_messages = [
     'The bulletin is empty for the time being.  Someone has arranged all the '
@@ -27,14 +29,19 @@ bank_state_labels = [
     ('from-mod', 'manually added by a mod')
 ]
 
-(max_pokemon,) = db.DBSession.query(sqla.func.max(db.PokemonSpecies.id)).one()
+@asb.pokedex.cached
+def max_pokemon():
+    """Return the highest Pokémon species ID."""
+
+    (max_id,) = db.DBSession.query(sqla.func.max(db.PokemonSpecies.id)).one()
+    return max_id
 
 def empty_bulletin_message():
     """Return a silly message for when the trainer/mod bulletin is empty."""
 
     pokemon = (
         db.DBSession.query(db.PokemonSpecies)
-        .get(random.randrange(1, max_pokemon + 1))
+        .get(random.randrange(1, max_pokemon() + 1))
     )
 
     return random.choice(empty_bulletin_messages).format(pokemon=pokemon.name)
@@ -77,40 +84,46 @@ def home(context, request):
         ]
     elif trainer is not None:
         bulletin = []
+        notifications = trainer.notifications
 
-        # Check if they're eligible for any promotions
-        for promotion in trainer.promotions:
-            if promotion.end_date is not None:
-                message = 'Check out the {0} — ends {1}!'.format(
-                    promotion.name, promotion.end_date.strftime('%Y %B %d')
-                )
-            else:
-                message = 'Check out the {0}!'.format(promotion.name)
+        if notifications is None:
+            # Shouldn't happen, but it's easy enough to fix.  The ORM doesn't
+            # know about recount()'s writes, so tell the transaction manager
+            # to commit them.
+            db.TrainerNotifications.recount(trainer.id)
+            mark_changed(db.DBSession())
+            db.DBSession.expire(trainer, ['notifications'])
+            notifications = trainer.notifications
 
-            path = '/pokemon/buy#{0}'.format(promotion.identifier)
-            bulletin.append((message, path))
+        # Check if they're eligible for any promotions
+        if notifications.promotions or db.Promotion.any_public_running():
+            for promotion in trainer.promotions:
+                if promotion.end_date is not None:
+                    message = 'Check out the {0} — ends {1}!'.format(
+                        promotion.name, promotion.end_date.strftime('%Y %B %d')
+                    )
+                else:
+                    message = 'Check out the {0}!'.format(promotion.name)
+
+                path = '/pokemon/buy#{0}'.format(promotion.identifier)
+                bulletin.append((message, path))
 
         # Check if any of their Pokémon need their forms chosen
-        form_uncertain_pokemon = (
-            db.DBSession.query(db.Pokemon)
-            .filter_by(trainer_id=trainer.id, form_uncertain=True)
-            .all()
-        )
+        if notifications.form_uncertain:
+            form_uncertain_pokemon = (
+                db.DBSession.query(db.Pokemon)
+                .filter_by(trainer_id=trainer.id, form_uncertain=True)
+                .all()
+            )
 
-        for pokemon in form_uncertain_pokemon:
-            bulletin.append((
-                "{}'s form needs to be chosen".format(pokemon.name),
-                request.resource_path(pokemon, 'edit')
-            ))
+            for pokemon in form_uncertain_pokemon:
+                bulletin.append((
+                    "{}'s form needs to be chosen".format(pokemon.name),
+                    request.resource_path(pokemon, 'edit')
+                ))
 
         # Check if any of their bank transactions have been approved/denied
-        transaction_counts = dict(
-            db.DBSession.query(db.BankTransaction.state, sqla.func.count('*'))
-            .filter_by(trainer_id=trainer.id, is_read=False)
-            .filter(db.BankTransaction.state != 'pending')
-            .group_by(db.BankTransaction.state)
-        )
-
+        transaction_counts = notifications.bank_counts
         transactions = sum(transaction_counts.values())
 
         if transactions:
@@ -127,11 +140,13 @@ def home(context, request):
             bulletin.append((message, '/bank#recent'))
 
         # Check if they have any gifts to claim
-        for gift in trainer.pending_gifts():
-            bulletin.append((
-                'You have a gift from {0}!'.format(gift.lots[0].sender.name),
-                request.resource_path(gift.__parent__, gift.__name__)
-            ))
+        if notifications.pending_gifts:
+            for gift in trainer.pending_gifts():
+                bulletin.append((
+                    'You have a gift from {0}!'.format(
+                        gift.lots[0].sender.name),
+                    request.resource_path(gift.__parent__, gift.__name__)
+                ))
 
         stuff['bulletin'] = bulletin
 
@@ -161,18 +176,7 @@ def home(context, request):
             mod_stuff.append((message, '/bank/approve'))
 
         # See if there are any battles to approve
-        pending_battles = (
-            db.DBSession.query(db.Battle)
-            .filter_by(needs_approval=True)
-            .all()
-        )
-
-        # Count up the ones they can actually approve, i.e. weren't involved in
-        # XXX Filter those out in the query?
-        pending_battles = sum(
-            1 for battle in pending_battles
-            if request.has_permission('battle.approve', battle)
-        )
+        pending_battles = db.Battle.awaiting_approval(trainer.id).count()
 
         if pending_battles:
             if pending_battles == 1:
@@ -181,7 +185,7 @@ def home(context, request):
                 message = ('There are {} closed battles awaiting approval'
                     .format(pending_battles))
 
-            mod_stuff.append((message, '/battles#waiting'))
+            mod_stuff.append((message, '/battles/approve'))
 
         stuff['mod_stuff'] = mod_stuff
 
@@ -2,12 +2,15 @@ import itertools
 
 import pyramid.httpexceptions as httpexc
 from pyramid.view import view_config
-from sqlalchemy import or_
-from sqlalchemy.orm import joinedload, subqueryload, subqueryload_all
+from sqlalchemy.orm import joinedload, subqueryload_all
 from sqlalchemy.orm.exc import NoResultFound
 
 from asb import db
+from asb.conditional import conditional_get
+import asb.learnsets
+from asb.output_cache import cacheable
 from asb.resources import MoveIndex
+from asb.views.pokemon.species import form_table_forms
 from asb.views.type import attacking_labels, empty_matchup_dict
 
 def type_matchups(move):
@@ -89,7 +92,8 @@ relevant_move_categories = {
 }
 
 @view_config(context=MoveIndex, name='contests',
-  renderer='/indices/contest_moves.mako')
+  renderer='/indices/contest_moves.mako',
+  decorator=(conditional_get, cacheable))
 def contest_move_index(context, request):
     """An alternate move index, displaying contest data instead of battle
     data.
@@ -116,7 +120,8 @@ def contest_move_index(context, request):
     return {'supercategories': supercategories,
         'pure_points_moves': pure_points_moves}
 
-@view_config(context=MoveIndex, renderer='/indices/moves.mako')
+@view_config(context=MoveIndex, renderer='/indices/moves.mako',
+  decorator=(conditional_get, cacheable))
 def move_index(context, request):
     """The index of all the moves."""
 
@@ -129,7 +134,8 @@ def move_index(context, request):
 
     return {'moves': moves}
 
-@view_config(context=db.Move, renderer='/move.mako')
+@view_config(context=db.Move, renderer='/move.mako',
+  decorator=(conditional_get, cacheable))
 def move(move, request):
     """A move's dex page."""
 
@@ -145,20 +151,7 @@ def move(move, request):
             .one()
         )
 
-    pokemon = (
-        db.DBSession.query(db.PokemonForm)
-        .join(db.PokemonSpecies)
-        .filter(db.PokemonForm.moves.any(db.Move.id == move.id))
-        .filter(or_(db.PokemonSpecies.forms_are_squashable == False,
-                    db.PokemonForm.is_default == True))
-        .options(
-            joinedload('species'),
-            subqueryload('types'),
-            subqueryload('abilities'),
-            joinedload('abilities.ability')
-        )
-        .order_by(db.PokemonForm.order)
-    )
+    pokemon = form_table_forms(asb.learnsets.learners(move.id))
 
     return {
         'move': move,
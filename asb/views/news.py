@@ -6,6 +6,7 @@ import wtforms
 
 from asb import db
 import asb.forms
+import asb.pagination
 from asb.resources import NewsIndex
 
 class NewsForm(asb.forms.CSRFTokenForm):
@@ -25,16 +26,16 @@ class NewsDeleteForm(asb.forms.CSRFTokenForm):
         [wtforms.validators.Required('Please check here')])
     delete = wtforms.SubmitField('Delete')
 
+news_paginator = asb.pagination.Paginator(db.NewsPost.post_time,
+    db.NewsPost.id, descending=True, per_page=20)
+
 @view_config(context=NewsIndex, renderer='/indices/news.mako')
 def news_index(context, request):
-    """The entire news archive."""
+    """The news archive."""
 
-    return {
-        'news':
-            db.DBSession.query(db.NewsPost)
-            .order_by(db.NewsPost.post_time.desc())
-            .all()
-    }
+    news = news_paginator.paginate(request, db.DBSession.query(db.NewsPost))
+
+    return {'news': news}
 
 @view_config(context=db.NewsPost, renderer='/news.mako')
 def news(news_post, request):
@@ -1,46 +1,166 @@
-import sqlalchemy as sqla
+import collections
 
 import asb.db
+import asb.evolution
+
+class EvolutionFacts:
+    """Everything about a batch of Pokémon that deciding whether they can
+    evolve needs from the database, fetched up front in three queries: which
+    evolutions they've unlocked, which items they've battled with as their
+    current species, and which items they're holding.
+
+    The Pokédex side of things comes from asb.evolution, so once this is
+    built, checking any number of evolutions doesn't need any more queries.
+    """
+
+    def __init__(self, pokemon):
+        self.unlocked = collections.defaultdict(set)
+        self.battled_items = set()
+        self.held_items = {}
+
+        ids = [a_pokemon.id for a_pokemon in pokemon]
+
+        if not ids:
+            return
+
+        unlocked = (
+            asb.db.DBSession.query(
+                asb.db.PokemonUnlockedEvolution.pokemon_id,
+                asb.db.PokemonUnlockedEvolution.evolved_species_id)
+            .filter(asb.db.PokemonUnlockedEvolution.pokemon_id.in_(ids))
+        )
+
+        for (pokemon_id, species_id) in unlocked:
+            self.unlocked[pokemon_id].add(species_id)
+
+        # Only battles as the Pokémon's current species count, so fetch the
+        # species too and weed out the rest below
+        battled = (
+            asb.db.DBSession.query(asb.db.BattlePokemon.pokemon_id,
+                asb.db.BattlePokemon.item_id, asb.db.PokemonForm.species_id)
+            .join(asb.db.BattlePokemon.form)
+            .join(asb.db.BattlePokemon.trainer)
+            .join(asb.db.BattleTrainer.battle)
+            .filter(
+                 asb.db.BattlePokemon.pokemon_id.in_(ids),
+                 asb.db.BattlePokemon.participated,
+                 asb.db.BattlePokemon.item_id.isnot(None),
+                 asb.db.Battle.end_date.isnot(None),
+                 ~asb.db.Battle.needs_approval
+            )
+            .distinct()
+        )
+
+        current_species = {
+            a_pokemon.id: pokemon_species_id(a_pokemon)
+            for a_pokemon in pokemon
+        }
+
+        for (pokemon_id, item_id, species_id) in battled:
+            if current_species[pokemon_id] == species_id:
+                self.battled_items.add((pokemon_id, item_id))
+
+        held = (
+            asb.db.DBSession.query(asb.db.TrainerItem.pokemon_id,
+                asb.db.TrainerItem.item_id)
+            .filter(asb.db.TrainerItem.pokemon_id.in_(ids))
+        )
+
+        self.held_items = dict(held)
+
+def pokemon_species_id(pokemon):
+    """Return a Pokémon's species ID without loading its form."""
+
+    return asb.evolution.data().forms[pokemon.pokemon_form_id].species_id
+
+def get_evolutions(pokemon, facts=None):
+    """Return a list of (form, needs_buying, needs_item) triples for all the
+    forms this Pokémon can evolve into.
+
+    facts should be an EvolutionFacts covering this Pokémon; if it's left
+    out, one will be built just for this Pokémon.
+    """
+
+    if facts is None:
+        facts = EvolutionFacts([pokemon])
+
+    evo_forms = []
+
+    for form in asb.evolution.evolved_forms(pokemon_species_id(pokemon)):
+        (can_evolve, buy, item) = can_evolve_into(pokemon, form, facts)
+
+        if can_evolve:
+            evo_forms.append((form, buy, item))
+
+    return evo_forms
+
+def roster_evolutions(pokemon):
+    """Return a dict of Pokémon IDs to get_evolutions() for each of the given
+    Pokémon, with only as many queries as it takes to build one
+    EvolutionFacts.
+
+    Pokémon that can't evolve are left out.
+    """
+
+    facts = EvolutionFacts(pokemon)
+    roster = {}
+
+    for a_pokemon in pokemon:
+        evo_forms = get_evolutions(a_pokemon, facts)
+
+        if evo_forms:
+            roster[a_pokemon.id] = evo_forms
+
+    return roster
+
+def evolvable_pokemon(trainer):
+    """Return a set of the IDs of all of a trainer's Pokémon that can evolve
+    right now.
+    """
+
+    return set(roster_evolutions(trainer.squad + trainer.pc))
 
 def can_evolve(pokemon):
     """Return whether or not this Pokémon can evolve at all."""
 
-    return any(
-        can_evolve_into(pokemon, form)[0]
-        for species in pokemon.species.evolutions
-        for form in species.forms
-    )
+    return bool(get_evolutions(pokemon))
 
-def can_potentially_evolve_into(pokemon, form):
+def can_potentially_evolve_into(pokemon, form, facts=None):
     """Determine whether this form is a valid evolution for this Pokémon in the
     first place, before checking the actual requirements.
     """
 
+    data = asb.evolution.data()
+    current_form = data.forms[pokemon.pokemon_form_id]
+
     # Make sure it's the right species
-    if form.species.evolves_from_species_id != pokemon.form.species_id:
+    if form.species.evolves_from_species_id != current_form.species_id:
         return False
 
     # If this Pokémon can switch forms, or doesn't have forms (yet), it gets to
     # choose its post-evolution form
-    can_pick_forms = (len(pokemon.species.forms) == 1 or
-                      pokemon.species.can_switch_forms)
+    can_pick_forms = (len(data.species_forms[current_form.species_id]) == 1 or
+                      current_form.species.can_switch_forms)
 
     if can_pick_forms:
         # If it can switch, check the requirements to switch to this form
-        return check_form_condition(pokemon, form)
+        return check_form_condition(pokemon, form, facts)
     else:
-	# If it can't switch, make sure it's evolving into the corresponding
-	# form
-        return form.form_order == pokemon.form.form_order
+        # If it can't switch, make sure it's evolving into the corresponding
+        # form
+        return form.form_order == current_form.form_order
 
-def can_evolve_into(pokemon, form):
+def can_evolve_into(pokemon, form, facts=None):
     """Return three things: whether or not this Pokémon can evolve into this
     form, whether or not they'll have to pay, and whether or not the
     appropriate item will have to be consumed.
     """
 
+    if facts is None:
+        facts = EvolutionFacts([pokemon])
+
     # Make sure this species and form are valid in the first place
-    if not can_potentially_evolve_into(pokemon, form):
+    if not can_potentially_evolve_into(pokemon, form, facts):
         return (False, False, False)
 
     evo = form.evolution_method
@@ -58,9 +178,10 @@ def can_evolve_into(pokemon, form):
         return (True, False, False)
     elif evo.happiness is not None and pokemon.happiness >= evo.happiness:
         return (True, False, False)
-    elif evo.item is not None and has_battled_with(pokemon, evo.item):
+    elif (evo.item_id is not None and
+          (pokemon.id, evo.item_id) in facts.battled_items):
         return (True, False, True)
-    elif form.species in pokemon.unlocked_evolutions:
+    elif form.species_id in facts.unlocked[pokemon.id]:
         return (True, False, evo.item_id is not None)
     elif (evo.buyable_price is not None and
           pokemon.trainer.money >= evo.buyable_price):
@@ -69,7 +190,7 @@ def can_evolve_into(pokemon, form):
         # No dice
         return (False, False, False)
 
-def check_form_condition(pokemon, form):
+def check_form_condition(pokemon, form, facts=None):
     """Check the specified Pokémon form's conditions, and return whether the
     Pokémon meets them.
 
@@ -95,44 +216,26 @@ def check_form_condition(pokemon, form):
         # meaning it requires an item that hasn't been added yet
         return False
 
-    if c.item_id is not None and pokemon.trainer_item.item_id != c.item_id:
-        # Wrong held item
-        return False
+    if c.item_id is not None:
+        if facts is not None:
+            held_item_id = facts.held_items.get(pokemon.id)
+        elif pokemon.trainer_item is not None:
+            held_item_id = pokemon.trainer_item.item_id
+        else:
+            held_item_id = None
+
+        if held_item_id != c.item_id:
+            # Wrong held item
+            return False
 
     if c.ability_id is not None:
         # Check the ability that this Pokémon would have if it were this form
-        try:
-            pfa = asb.db.DBSession.query(db.PokemonFormAbility).get(
-               (form.id, pokemon.ability_slot))
-        except sqla.orm.exc.NoResultFound:
-            # Welp
-            return False
+        ability_id = asb.evolution.data().form_abilities.get(
+            (form.id, pokemon.ability_slot))
 
-        if pfa.ability_id != c.ability_id:
+        if ability_id != c.ability_id:
             # Wrong ability
             return False
 
     # If we haven't bailed yet, we're good to go
     return True
-
-def has_battled_with(pokemon, item):
-    """Check whether the Pokémon has battled with this item, as its current
-    species.
-    """
-
-    battle = (
-        asb.db.DBSession.query(asb.db.BattlePokemon)
-        .join(asb.db.BattlePokemon.form)
-        .join(asb.db.BattlePokemon.trainer)
-        .join(asb.db.BattleTrainer.battle)
-        .filter(
-             asb.db.BattlePokemon.pokemon_id == pokemon.id,
-             asb.db.BattlePokemon.participated,
-             asb.db.BattlePokemon.item_id == item.id,
-             asb.db.PokemonForm.species_id == pokemon.form.species_id,
-             asb.db.Battle.end_date.isnot(None),
-             ~asb.db.Battle.needs_approval
-        )
-    )
-
-    return asb.db.DBSession.query(battle.exists()).scalar()
@@ -1,3 +1,4 @@
+import collections
 import datetime
 
 from pyramid.view import view_config
@@ -6,7 +7,9 @@ import sqlalchemy as sqla
 import wtforms
 
 from asb import db
+import asb.autocomplete
 import asb.forms
+import asb.shop
 
 
 class PokemonBrowseForm(asb.forms.CSRFTokenForm):
@@ -69,11 +72,22 @@ class PokemonSpeciesField(wtforms.StringField):
         elif identifier in ('nidoran-male', 'nidoranm'):
             identifier = 'nidoran-m'
 
-        # Try to fetch the species
+        # Look in the catalog first, since any buyable species will be there
+        species = asb.shop.catalog().species.get(identifier)
+
+        if species is not None:
+            self.data = (name, species)
+            return
+
+        # Otherwise, see if it exists at all, for the sake of the error; the
+        # autocomplete index can tell us if it doesn't without a query
+        if not asb.autocomplete.has('species', identifier):
+            self.data = (name, None)
+            return
+
         try:
             species = (db.DBSession.query(db.PokemonSpecies)
                 .filter_by(identifier=identifier)
-                .options(sqla.orm.joinedload('default_form'))
                 .one()
             )
 
@@ -86,7 +100,8 @@ class PokemonSpeciesField(wtforms.StringField):
 
         name, species = self.data
         if species is None:
-            raise wtforms.validators.ValidationError('No such Pokémon found')
+            raise wtforms.validators.ValidationError('No such Pokémon found.' +
+                asb.autocomplete.did_you_mean(name, 'species'))
         elif species.rarity is None:
             raise wtforms.validators.ValidationError(
                 "{0} isn't buyable".format(species.name))
@@ -102,29 +117,44 @@ def fetch_cart(cart):
     """Take a cart — a list of (species, promotion) tuples, where each species
     and promotion is an identifier — and return the same list, except with the
     actual species and promotion objects.
+
+    Buyable species come from the shop catalog; anything else (i.e. species
+    that are only available through a promotion) has to be fetched.
     """
 
-    species = (species for (species, promotion) in cart)
-    promotions = (promotion for (species, promotion) in cart)
+    catalog_species = asb.shop.catalog().species
+    species = {}
+    other_species = set()
+    promotions = set()
 
-    # Fetch all the Pokémon in the cart
-    species = (
-        db.DBSession.query(db.PokemonSpecies)
-        .filter(db.PokemonSpecies.identifier.in_(species))
-        .options(
-            sqla.orm.joinedload('rarity'),
-            sqla.orm.joinedload('default_form')
+    for (a_species, promotion) in cart:
+        if a_species in catalog_species:
+            species[a_species] = catalog_species[a_species]
+        else:
+            other_species.add(a_species)
+
+        if promotion is not None:
+            promotions.add(promotion)
+
+    if other_species:
+        species.update(
+            (a_species.identifier, a_species) for a_species in
+            db.DBSession.query(db.PokemonSpecies)
+            .filter(db.PokemonSpecies.identifier.in_(other_species))
+            .options(
+                sqla.orm.joinedload('default_form'),
+                sqla.orm.subqueryload_all('default_form.abilities.ability'),
+                sqla.orm.subqueryload('forms'),
+                sqla.orm.subqueryload('genders')
+            )
         )
-        .all()
-    )
-    species = {species.identifier: species for species in species}
 
-    promotions = (
-        db.DBSession.query(db.Promotion)
-        .filter(db.Promotion.identifier.in_(promotions))
-        .all()
-    )
-    promotions = {promotion.identifier: promotion for promotion in promotions}
+    if promotions:
+        promotions = {
+            promotion.identifier: promotion for promotion in
+            db.DBSession.query(db.Promotion)
+            .filter(db.Promotion.identifier.in_(promotions))
+        }
 
     # Fix duplicates
     new_cart = [
@@ -147,7 +177,7 @@ def get_pokemon_buying_stuff(request):
         'promotions': [],
         'cart': cart,
         'cart_species': fetch_cart(cart),
-        'rarities': get_rarities()
+        'rarities': asb.shop.catalog().rarities
     }
 
     stuff['browse'].add.choices = [
@@ -183,23 +213,6 @@ def get_pokemon_buying_stuff(request):
 
     return stuff
 
-def get_rarities():
-    """Fetch all the rarities and all the info we'll need about their Pokémon
-    for the "buy Pokémon" page.
-    """
-
-    return (
-        db.DBSession.query(db.Rarity)
-        .options(
-            sqla.orm.subqueryload_all(
-                'pokemon_species.default_form.abilities.ability'
-            ),
-            sqla.orm.subqueryload('pokemon_species.default_form.types'),
-        )
-        .order_by(db.Rarity.id)
-        .all()
-    )
-
 def pokemon_checkout_form(cart, request):
     """Return a PokemonCheckoutForm based on the given cart."""
 
@@ -217,7 +230,6 @@ def pokemon_checkout_form(cart, request):
     # Now for all the subforms.  We're going to need to set these names in a
     # class definition in a moment, hence the underscore on these ones.
     for (species_, promotion_) in cart:
-        species_ = db.DBSession.merge(species_)
         species_seen.setdefault(species_.identifier, 0)
         species_seen[species_.identifier] += 1
         n = species_seen[species_.identifier]
@@ -396,13 +408,35 @@ def pokemon_checkout_commit(context, request):
     if not form.validate():
         return {'form': form}
 
+    # Pay up, unless they've spent their money elsewhere in the meantime
+    if not db.MoneyLedger.record(trainer.id, -grand_total, 'pokemon',
+      non_negative=True):
+        request.session.flash("You can't afford all that!")
+        return httpexc.HTTPSeeOther('/pokemon/buy')
+
     # Okay this is it.  Time to actually create these Pokémon.
     squad_count = len(trainer.squad)
+
+    # Only promotions meant for this trainer in particular are counted in
+    # their notifications
+    targeted_promotions = set()
+    promotion_ids = {subform.promotion.id for subform in form.pokemon
+                     if subform.promotion is not None}
+
+    if promotion_ids:
+        targeted_promotions = {promotion_id for (promotion_id,) in
+            db.DBSession.query(db.PromotionRecipient.promotion_id)
+            .filter_by(trainer_id=trainer.id, received=False)
+            .filter(db.PromotionRecipient.promotion_id.in_(promotion_ids))
+        }
+
+    new_forms = collections.Counter()
     today = datetime.datetime.utcnow().date()
 
-    for subform in form.pokemon:
-        # Get the next available ID for this Pokémon
-        id = db.DBSession.execute(db.Pokemon.pokemon_id_seq)
+    subforms = list(form.pokemon)
+    ids = db.ids.pokemon.allocate(len(subforms))
+
+    for (subform, id) in zip(subforms, ids):
 
         # Figure out form/gender/ability
         if hasattr(subform, 'form_'):
@@ -440,6 +474,7 @@ def pokemon_checkout_commit(context, request):
 
         db.DBSession.add(pokemon)
         pokemon.update_identifier()
+        new_forms[form_id] += 1
 
         # Mark the promotion as recieved, if applicable
         if subform.promotion is not None:
@@ -452,7 +487,9 @@ def pokemon_checkout_commit(context, request):
             db.DBSession.merge(promotion_recipient)
 
     # Finish up and return to the "Your Pokémon" page
-    trainer.money -= grand_total
+    db.PokemonFormPopulation.bump(new_forms)
+    db.TrainerNotifications.bump(trainer.id,
+        promotions=-len(targeted_promotions))
     del request.session['cart']
 
     return httpexc.HTTPSeeOther('/pokemon/manage')
@@ -106,7 +106,13 @@ def edit_pokemon_commit(pokemon, request):
     pokemon.update_identifier()
 
     if form.form is not None:
-        pokemon.pokemon_form_id = form.form.data
+        with db.PokemonFormPopulation.tracking([pokemon.id]):
+            pokemon.pokemon_form_id = form.form.data
+
+        if pokemon.form_uncertain:
+            db.TrainerNotifications.bump(pokemon.trainer_id,
+                form_uncertain=-1)
+
         pokemon.form_uncertain = False
 
     if form.color.data == 'normal':
@@ -154,7 +160,15 @@ def super_edit_commit(pokemon, request):
             ))
 
     if form.trainer is not None:
-        pokemon.trainer_id = form.trainer.id
+        if pokemon.form_uncertain:
+            db.TrainerNotifications.bump(pokemon.trainer_id,
+                form_uncertain=-1)
+            db.TrainerNotifications.bump(form.trainer.id, form_uncertain=1)
+
+        # The new trainer might not be active
+        with db.PokemonFormPopulation.tracking([pokemon.id]):
+            pokemon.trainer_id = form.trainer.id
+
         pokemon.is_in_squad = False
 
         if pokemon.trainer_item is not None:
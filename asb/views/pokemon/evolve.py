@@ -2,7 +2,7 @@ import pyramid.httpexceptions as httpexc
 from pyramid.view import view_config
 import wtforms
 
-from . import can_evolve_into
+from . import get_evolutions
 from asb import db
 import asb.forms
 
@@ -15,20 +15,6 @@ class PokemonEvolutionForm(asb.forms.CSRFTokenForm):
     evolution = wtforms.RadioField(coerce=int)
     submit = wtforms.SubmitField('Confirm')
 
-def get_evolutions(pokemon):
-    """Return all the Pokémon forms that this Pokémon can evolve into."""
-
-    evo_forms = []  # Each element will be (form, needs_buying, needs_item)
-
-    for species in pokemon.species.evolutions:
-        for form in species.forms:
-            (can_evolve, buy, item) = can_evolve_into(pokemon, form)
-
-            if can_evolve:
-                evo_forms.append((form, buy, item))
-
-    return evo_forms
-
 @view_config(name='evolve', context=db.Pokemon, permission='edit.evolve',
   request_method='GET', renderer='evolve_pokemon.mako')
 def evolve_pokemon(pokemon, request):
@@ -72,26 +58,31 @@ def evolve_pokemon_commit(pokemon, request):
             # evo, buy, and item are already set thanks to the loop
             break
 
-    # Make sure it's holding the right item, and take it away if so
-    if item:
-        if (pokemon.trainer_item is None or pokemon.trainer_item.item_id !=
-                evo.evolution_method.item_id):
-            # Not holding the right item; back to the form after all
-            form.evolution.errors.append(
-                '{} must be holding the right item.'.format(pokemon.name))
-            return {'pokemon': pokemon, 'evolutions': evolutions, 'form': form}
-        else:
-            db.DBSession.delete(pokemon.trainer_item)
+    # Make sure it's holding the right item
+    if item and (pokemon.trainer_item is None or
+            pokemon.trainer_item.item_id != evo.evolution_method.item_id):
+        # Not holding the right item; back to the form after all
+        form.evolution.errors.append(
+            '{} must be holding the right item.'.format(pokemon.name))
+        return {'pokemon': pokemon, 'evolutions': evolutions, 'form': form}
 
     # Take money if appropriate
-    if buy:
-        pokemon.trainer.money -= evo.evolution_method.buyable_price
+    if buy and not db.MoneyLedger.record(pokemon.trainer_id,
+            -evo.evolution_method.buyable_price, 'evolution',
+            non_negative=True):
+        form.evolution.errors.append("You can't afford that!")
+        return {'pokemon': pokemon, 'evolutions': evolutions, 'form': form}
+
+    # Take the item away if appropriate
+    if item:
+        db.DBSession.delete(pokemon.trainer_item)
 
     # If it's not nicknamed, we'll need to update its name
     not_nicknamed = pokemon.name == pokemon.species.name
 
     # POOF
-    pokemon.pokemon_form_id = form.evolution.data
+    with db.PokemonFormPopulation.tracking([pokemon.id]):
+        pokemon.pokemon_form_id = form.evolution.data
 
     # Do the name thing
     if not_nicknamed:
@@ -2,6 +2,7 @@ import pyramid.httpexceptions as httpexc
 from pyramid.view import view_config
 import wtforms
 
+from . import evolvable_pokemon
 from asb import db
 import asb.forms
 from asb.resources import PokemonIndex
@@ -74,7 +75,8 @@ def manage_pokemon(context, request):
     else:
         withdraw = None
 
-    return {'trainer': trainer, 'deposit': deposit, 'withdraw': withdraw}
+    return {'trainer': trainer, 'deposit': deposit, 'withdraw': withdraw,
+            'evolvable': evolvable_pokemon(trainer)}
 
 @view_config(name='manage', context=PokemonIndex, permission='account.manage',
   request_method='POST', renderer='/manage/pokemon.mako')
@@ -96,7 +98,8 @@ def manage_pokemon_commit(context, request):
         form = None
 
     if form is None or not form.validate():
-        return {'trainer': trainer, 'deposit': deposit, 'withdraw': withdraw}
+        return {'trainer': trainer, 'deposit': deposit, 'withdraw': withdraw,
+                'evolvable': evolvable_pokemon(trainer)}
 
     # Move Pokémon
     pokemon = (
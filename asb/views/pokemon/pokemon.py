@@ -3,6 +3,7 @@ import sqlalchemy as sqla
 
 from . import can_evolve, can_potentially_evolve_into
 from asb import db
+import asb.evolution
 from asb.resources import PokemonIndex
 
 
@@ -34,19 +35,18 @@ def pokemon(pokemon, request):
 
     evo_info = {}
 
-    for evo_species in pokemon.species.evolutions:
-        for evo_form in evo_species.forms:
-            if can_potentially_evolve_into(pokemon, evo_form):
-                method = evo_form.evolution_method
+    for evo_form in asb.evolution.evolved_forms(pokemon.form.species_id):
+        if can_potentially_evolve_into(pokemon, evo_form):
+            method = evo_form.evolution_method
 
-                if method is None:
-                    continue
+            if method is None:
+                continue
 
-                if method.happiness:
-                    evo_info['happiness'] = method.happiness
+            if method.happiness:
+                evo_info['happiness'] = method.happiness
 
-                if method.experience:
-                    evo_info['experience'] = method.experience
+            if method.experience:
+                evo_info['experience'] = method.experience
 
     battles = [bp.trainer.battle for bp in pokemon.battle_pokemon
                if bp.participated]
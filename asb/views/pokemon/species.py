@@ -1,10 +1,15 @@
 import collections
-import itertools
 
 from pyramid.view import view_config
 import sqlalchemy as sqla
+import wtforms
 
 from asb import db
+import asb.autocomplete
+from asb.output_cache import cacheable, cacheable_briefly
+import asb.evolution
+import asb.learnsets
+import asb.pagination
 from asb.resources import SpeciesIndex
 
 def or_iter():
@@ -18,40 +23,110 @@ def or_iter():
     while True:
         yield ' <em>OR</em> '
 
-def show_form_evo(form):
-    """Determine whether to show this Pokémon form's evolution method
-    separately.
+census_paginator = asb.pagination.Paginator(db.Pokemon.name, db.Pokemon.id)
+
+def lookup(mapping, name):
+    """Look up a name's identifier in one of the learnset index's identifier
+    mappings, and return the ID it maps to (or None).
+    """
+
+    try:
+        return mapping.get(db.helpers.identifier(name))
+    except ValueError:
+        return None
+
+def move_validator(form, field):
+    """Make sure a move field is either blank or has an actual move in it."""
+
+    moves = asb.learnsets.index().move_identifiers
+
+    if field.data and lookup(moves, field.data) is None:
+        raise wtforms.validators.ValidationError('No such move: {0}.{1}'
+            .format(field.data, asb.autocomplete.did_you_mean(field.data,
+                                                                'move')))
+
+def pokemon_validator(form, field):
+    """Make sure a Pokémon field has an actual Pokémon in it."""
+
+    forms = asb.learnsets.index().form_identifiers
+
+    if lookup(forms, field.data) is None:
+        raise wtforms.validators.ValidationError('No such Pokémon: {0}.{1}'
+            .format(field.data, asb.autocomplete.did_you_mean(field.data,
+                                                                'species')))
+
+class SpeciesSearchForm(wtforms.Form):
+    """A form for finding Pokémon by the moves they learn, their type and
+    their abilities.
+
+    The type field's choices have to be filled in.
+    """
+
+    moves = wtforms.FieldList(
+        wtforms.StringField('Move', [move_validator]),
+        min_entries=4,
+        max_entries=4
+    )
+
+    type = wtforms.SelectField('Type', default='')
+    ability = wtforms.StringField('Ability')
+
+    def validate_ability(form, field):
+        """Make sure the ability field is either blank or has an actual
+        ability in it.
+        """
+
+        abilities = asb.learnsets.index().ability_identifiers
+
+        if field.data and lookup(abilities, field.data) is None:
+            raise wtforms.validators.ValidationError(
+                'No such ability: {0}.'.format(field.data))
+
+class SpeciesCompareForm(wtforms.Form):
+    """A form for picking two Pokémon to compare movesets."""
+
+    a = wtforms.StringField('Pokémon', [wtforms.validators.Required(),
+        pokemon_validator])
+    b = wtforms.StringField('Pokémon', [wtforms.validators.Required(),
+        pokemon_validator])
+
+def form_table_forms(form_ids):
+    """Fetch forms by ID, with everything pokemon_form_table needs, in
+    Pokédex order.
     """
 
-    # XXX Sighhhh I'd like to not special-case this someday
-    return (form.is_default or form.identifier.endswith('-alola') or
-            form.species.identifier == 'meowstic')
+    if not form_ids:
+        return []
+
+    return (
+        db.DBSession.query(db.PokemonForm)
+        .filter(db.PokemonForm.id.in_(form_ids))
+        .options(
+            sqla.orm.joinedload('species'),
+            sqla.orm.subqueryload('types'),
+            sqla.orm.subqueryload('abilities'),
+            sqla.orm.joinedload('abilities.ability')
+        )
+        .order_by(db.PokemonForm.order)
+        .all()
+    )
 
-@view_config(context=SpeciesIndex, renderer='/indices/pokemon_species.mako')
+@view_config(context=SpeciesIndex, renderer='/indices/pokemon_species.mako',
+  decorator=cacheable_briefly)
 def species_index(context, request):
     """The index page for all the species of Pokémon.
 
     (Forms, actually.  Whatever.)
     """
 
-    # A subquery to count how many of each Pokémon form there are in the league
-    population_subquery = (
-        db.DBSession.query(db.Pokemon.pokemon_form_id,
-            sqla.func.count('*').label('population'))
-        .select_from(db.Pokemon)
-        .filter(db.Pokemon.is_active())
-        .group_by(db.Pokemon.pokemon_form_id)
-        .subquery()
-    )
-
     # Get all the Pokémon and population counts.  Making this an OrderedDict
     # means we can just pass it to pokemon_form_table as is.
     pokemon = collections.OrderedDict(
         db.DBSession.query(db.PokemonForm,
-            population_subquery.c.population)
+            db.PokemonFormPopulation.population)
         .select_from(db.PokemonForm)
         .join(db.PokemonSpecies)
-        .outerjoin(population_subquery)
+        .outerjoin(db.PokemonFormPopulation)
         .options(
              sqla.orm.joinedload('species'),
              sqla.orm.subqueryload('abilities'),
@@ -64,7 +139,99 @@ def species_index(context, request):
 
     return {'pokemon': pokemon}
 
-@view_config(context=db.PokemonForm, renderer='/pokemon_species.mako')
+@view_config(context=SpeciesIndex, name='search',
+  renderer='/indices/pokemon_search.mako', decorator=cacheable)
+def species_search(context, request):
+    """Find Pokémon that learn all of up to four moves, and optionally have a
+    particular type and ability.
+    """
+
+    form = SpeciesSearchForm(request.GET)
+
+    form.type.choices = [('', 'Any')] + [
+        (identifier, name) for (identifier, name) in
+        db.DBSession.query(db.Type.identifier, db.Type.name)
+        .order_by(db.Type.name)
+    ]
+
+    if not request.GET or not form.validate():
+        return {'form': form, 'results': None}
+
+    learnsets = asb.learnsets.index()
+
+    move_ids = [lookup(learnsets.move_identifiers, move)
+                for move in form.moves.data if move]
+
+    if form.type.data:
+        type_ids = [
+            db.DBSession.query(db.Type.id)
+            .filter_by(identifier=form.type.data)
+            .scalar()
+        ]
+    else:
+        type_ids = []
+
+    if form.ability.data:
+        ability_ids = [lookup(learnsets.ability_identifiers,
+                              form.ability.data)]
+    else:
+        ability_ids = []
+
+    if not (move_ids or type_ids or ability_ids):
+        return {'form': form, 'results': None}
+
+    form_ids = asb.learnsets.search(move_ids, type_ids, ability_ids)
+    return {'form': form, 'results': form_table_forms(form_ids)}
+
+@view_config(context=SpeciesIndex, name='compare',
+  renderer='/indices/pokemon_compare.mako', decorator=cacheable)
+def species_compare(context, request):
+    """Compare two Pokémon's movesets."""
+
+    form = SpeciesCompareForm(request.GET)
+
+    if 'b' not in request.GET or not form.validate():
+        return {'form': form, 'pokemon': None}
+
+    forms = asb.learnsets.index().form_identifiers
+    form_ids = [lookup(forms, form.a.data), lookup(forms, form.b.data)]
+
+    # Comparing something with itself is silly, but it shouldn't break
+    pokemon = {
+        form.id: form for form in
+        db.DBSession.query(db.PokemonForm)
+        .filter(db.PokemonForm.id.in_(form_ids))
+        .options(sqla.orm.joinedload('species'))
+    }
+
+    pokemon = [pokemon[form_id] for form_id in form_ids]
+    (shared, only_a, only_b) = asb.learnsets.compare(*form_ids)
+    move_ids = shared + only_a + only_b
+
+    if move_ids:
+        moves = {
+            move.id: move for move in
+            db.DBSession.query(db.Move)
+            .filter(db.Move.id.in_(move_ids))
+            .options(
+                sqla.orm.joinedload('type'),
+                sqla.orm.joinedload('damage_class'),
+                sqla.orm.joinedload('effect')
+            )
+        }
+    else:
+        moves = {}
+
+    return {
+        'form': form,
+        'pokemon': pokemon,
+        'shared': [moves[move_id] for move_id in shared],
+        'only_a': [moves[move_id] for move_id in only_a],
+        'only_b': [moves[move_id] for move_id in only_b]
+    }
+
+@view_config(context=db.PokemonForm, renderer='/pokemon_species.mako',
+  decorator=cacheable_briefly)
 def species(pokemon, request):
     """The dex page of a Pokémon species.
 
@@ -113,37 +280,11 @@ def species(pokemon, request):
             abilities.append(ability)
 
 
-    # Build the evolution tree.  n.b. this algorithm assumes that all final
-    # evolutions within a family are at the same evo stage.  I'd be surprised
-    # if that ever stopped being true, though.
-
-    family = pokemon.species.family
-
-    # Start with all the final evolutions
-    prevos = set(species.pre_evolution for species in family.species)
-    finals = []
-
-    for species in family.species:
-        if species not in prevos:
-            for form in species.forms:
-                if show_form_evo(form):
-                    finals.append(form)
-
-    evo_tree = [finals]
+    # The evolution tree is built ahead of time
+    evo_tree = asb.evolution.tree(pokemon.species.pokemon_family_id)
 
-    # Build backwards, with each pre-evo appearing "above" its evo.  Pokémon
-    # with multiple evos (now or at a later stage) will appear multiple times.
-    while evo_tree[0][0].species.evolves_from_species_id is not None:
-        evo_tree.insert(0, [evo.pre_evolution_form for evo in evo_tree[0]])
-
-    # Collapse each layer; for example, [A, A, B] would become [(A, 2), (B, 1)]
-    for n, layer in enumerate(evo_tree):
-        evo_tree[n] = [(evo, sum(1 for _ in group))
-            for evo, group in itertools.groupby(layer)]
-
-
-    # Find all the Pokémon of this species/form in the league
-    census = (
+    # Find the Pokémon of this species/form in the league
+    census = census_paginator.paginate(request,
         db.DBSession.query(db.Pokemon)
         .filter_by(pokemon_form_id=pokemon.id)
         .filter(db.Pokemon.is_active())
@@ -152,15 +293,21 @@ def species(pokemon, request):
              sqla.orm.joinedload('trainer'),
              sqla.orm.joinedload('gender')
         )
-        .order_by(db.Pokemon.name)
-        .all()
+    )
+
+    population = (
+        db.DBSession.query(db.PokemonFormPopulation.population)
+        .filter_by(pokemon_form_id=pokemon.id)
+        .scalar()
     )
 
     return {
         'pokemon': pokemon,
         'abilities': abilities,
         'type_matchups': type_matchups,
-        'evo_tree': evo_tree,
+        'evo_tree': evo_tree.layers,
+        'evo_tree_has_form': pokemon.id in evo_tree.form_ids,
         'or_iter': or_iter,
-        'census': census
+        'census': census,
+        'population': population
     }
@@ -1,7 +1,5 @@
 import datetime
-import email.mime.text
 import random
-import smtplib
 
 import pyramid.httpexceptions as httpexc
 import pyramid.security
@@ -119,9 +117,12 @@ def reset_password_request_process(context, request):
     )
     db.DBSession.add(pw_request)
 
-    # Send it
+    # Send it (imported here since this is the only place we need them)
     # XXX Pull all this info from config, and also figure out how to format
     #     weird usernames/emails in the "To" field
+    import email.mime.text
+    import smtplib
+
     message = email.mime.text.MIMEText(email_template.format(pw_request.token))
     message['Subject'] = 'TCoD ASBdb password reset'
     message['From'] = ('The Cave of Dragonflies ASB Database '
@@ -235,6 +235,12 @@ def build_trade_post(context, request):
     if not form.validate():
         return {'form': form, 'trade_info': trade_info}
 
+    # Take the money first, in case they've spent it since loading the form
+    if 'money' in contents and not db.MoneyLedger.record(request.user.id,
+      -form.money.data, 'trade', non_negative=True):
+        form.money.errors.append("You don't have that much money.")
+        return {'form': form, 'trade_info': trade_info}
+
     # Actually build this thing.  Assume it's a Christmas gift for now.
     trade = db.Trade(is_gift=True, reveal_date=datetime.date(2015, 12, 25))
     db.DBSession.add(trade)
@@ -252,7 +258,6 @@ def build_trade_post(context, request):
 
     # Add stuff
     if 'money' in contents:
-        request.user.money -= form.money.data
         lot.money = form.money.data
 
     if 'items' in contents:
@@ -280,21 +285,23 @@ def build_trade_post(context, request):
             .all()
         )
 
-        for a_pokemon in pokemon:
-            a_pokemon.is_in_squad = False
+        # They're out of circulation until the trade's done
+        with db.PokemonFormPopulation.tracking(form.pokemon.data):
+            for a_pokemon in pokemon:
+                a_pokemon.is_in_squad = False
 
-            db.DBSession.add(db.TradeLotPokemon(
-                trade_lot_id=lot.id,
-                pokemon_id=a_pokemon.id
-            ))
-
-            if a_pokemon.trainer_item is not None:
-                db.DBSession.add(db.TradeLotItem(
+                db.DBSession.add(db.TradeLotPokemon(
                     trade_lot_id=lot.id,
-                    trainer_item_id=a_pokemon.trainer_item.id,
-                    item_id=a_pokemon.trainer_item.item_id
+                    pokemon_id=a_pokemon.id
                 ))
 
+                if a_pokemon.trainer_item is not None:
+                    db.DBSession.add(db.TradeLotItem(
+                        trade_lot_id=lot.id,
+                        trainer_item_id=a_pokemon.trainer_item.id,
+                        item_id=a_pokemon.trainer_item.item_id
+                    ))
+
     del request.session['trade']
 
     return httpexc.HTTPSeeOther(
@@ -356,6 +363,10 @@ def trade_confirm(lot, request):
     elif form.confirm.data:
         lot.state = 'proposed'
         lot.notify_recipient = True
+
+        if lot.trade.is_gift:
+            db.TrainerNotifications.bump(lot.recipient_id, pending_gifts=1)
+
         return httpexc.HTTPSeeOther(request.path)
     elif form.cancel.data:
         return cancel_lot(lot, request)
@@ -372,6 +383,9 @@ def trade_reconsider(lot, request):
         lot.state = 'draft'
         lot.notify_recipient = False
 
+        if lot.trade.is_gift:
+            db.TrainerNotifications.bump(lot.recipient_id, pending_gifts=-1)
+
         return httpexc.HTTPSeeOther(
             request.resource_path(lot.trade.__parent__, lot.trade.__name__)
         )
@@ -382,11 +396,17 @@ def cancel_lot(lot, request):
     """Cancel a trade lot."""
 
     trade = lot.trade
+    pokemon_ids = [pokemon.id for pokemon in lot.pokemon]
 
     if lot.money is not None:
-        lot.sender.money += lot.money
+        db.MoneyLedger.record(lot.sender_id, lot.money, 'trade')
+
+    if lot.state == 'proposed' and trade.is_gift:
+        db.TrainerNotifications.bump(lot.recipient_id, pending_gifts=-1)
+
+    with db.PokemonFormPopulation.tracking(pokemon_ids):
+        db.DBSession.delete(lot)
 
-    db.DBSession.delete(lot)
     db.DBSession.expire(trade)
 
     if not trade.lots:
@@ -408,19 +428,30 @@ def gift_accept(lot, request):
     if not form.validate():
         return {'trade': trade, 'accept_form': form}
 
+    if form.accept.data or form.decline.data:
+        db.TrainerNotifications.bump(lot.recipient_id, pending_gifts=-1)
+
     if form.accept.data:
         lot.state = 'accepted'
 
         if lot.money is not None:
-            lot.recipient.money += lot.money
+            db.MoneyLedger.record(lot.recipient_id, lot.money, 'trade')
 
         for item in lot.items:
             item.trainer_id = lot.recipient_id
 
-        for pokemon in lot.pokemon:
-            pokemon.trainer_id = lot.recipient_id
+        uncertain = sum(1 for pokemon in lot.pokemon if pokemon.form_uncertain)
+        db.TrainerNotifications.bump(lot.sender_id, form_uncertain=-uncertain)
+        db.TrainerNotifications.bump(lot.recipient_id,
+            form_uncertain=uncertain)
+
+        pokemon_ids = [pokemon.id for pokemon in lot.pokemon]
 
-        trade.completed_date = datetime.datetime.utcnow().date()
+        with db.PokemonFormPopulation.tracking(pokemon_ids):
+            for pokemon in lot.pokemon:
+                pokemon.trainer_id = lot.recipient_id
+
+            trade.completed_date = datetime.datetime.utcnow().date()
 
         request.session.flash('Gift accepted!')
         return httpexc.HTTPSeeOther(
@@ -431,9 +462,12 @@ def gift_accept(lot, request):
         lot.state = 'rejected'
 
         if lot.money is not None:
-            lot.sender.money += lot.money
+            db.MoneyLedger.record(lot.sender_id, lot.money, 'trade')
+
+        pokemon_ids = [pokemon.id for pokemon in lot.pokemon]
 
-        trade.completed_date = datetime.datetime.utcnow().date()
+        with db.PokemonFormPopulation.tracking(pokemon_ids):
+            trade.completed_date = datetime.datetime.utcnow().date()
 
         request.session.flash('Gift declined.')
         return httpexc.HTTPSeeOther(
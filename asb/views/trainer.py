@@ -7,9 +7,13 @@ import sqlalchemy.orm
 import wtforms
 
 from asb import db
+import asb.autocomplete
 import asb.forms
+import asb.pagination
 import asb.tcodf
 from asb.resources import TrainerIndex
+import asb.views.pokemon
+import asb.views.user
 
 class TrainerEditForm(asb.forms.CSRFTokenForm):
     """A form for editing a trainer.
@@ -136,7 +140,8 @@ class TrainerEditForm(asb.forms.CSRFTokenForm):
         elif not input:
             raise wtforms.validators.ValidationError('Enter a Pokémon')
         elif not species:
-            raise wtforms.validators.ValidationError('No such Pokémon found')
+            raise wtforms.validators.ValidationError('No such Pokémon found.' +
+                asb.autocomplete.did_you_mean(input, 'species'))
         elif not promo_name:
             raise wtforms.validators.ValidationError(
                 'Enter a title for the prize to appear under')
@@ -168,30 +173,30 @@ def random_password():
         for n in range(16)
     )
 
+trainer_paginator = asb.pagination.Paginator(db.Trainer.name, db.Trainer.id)
+
 @view_config(context=TrainerIndex, renderer='/indices/trainers.mako')
 def trainer_index(context, request):
     """The index of all the trainers in the league."""
 
+    # Correlated, so that we only count Pokémon for the trainers on this page
+    active_pokemon = sqla.and_(db.Pokemon.trainer_id == db.Trainer.id,
+                          db.Pokemon.is_active(check_trainer=False))
+
     pokemon_count = (
-        db.DBSession.query(db.Pokemon.trainer_id, sqla.func.count('*')
-            .label('count'))
-        .select_from(db.Pokemon)
-        .filter(db.Pokemon.is_active(check_trainer=False))
-        .group_by(db.Pokemon.trainer_id)
-        .subquery()
+        sqla.select([sqla.func.count('*')])
+        .where(active_pokemon)
+        .as_scalar()
     )
 
     trainers = (
-        db.DBSession.query(db.Trainer, pokemon_count.c.count)
-        .select_from(db.Trainer)
-        .join(pokemon_count, pokemon_count.c.trainer_id == db.Trainer.id)
-        .options(sqla.orm.subqueryload('squad'))
+        db.DBSession.query(db.Trainer, pokemon_count)
         .filter(db.Trainer.is_active())
-        .order_by(db.Trainer.name)
-        .all()
+        .filter(sqla.exists().where(active_pokemon))
+        .options(sqla.orm.subqueryload('squad'))
     )
 
-    return {'trainers': trainers}
+    return {'trainers': trainer_paginator.paginate(request, trainers)}
 
 @view_config(context=db.Trainer, renderer='/trainer.mako')
 def trainer(trainer, request):
@@ -237,7 +242,8 @@ def trainer(trainer, request):
     return {'trainer': trainer, 'profile_link': profile_link,
             'wins': wins, 'losses': losses, 'draws': draws,
             'open_battles': open_battles, 'ref_open': ref_open,
-            'ref_done': ref_done}
+            'ref_done': ref_done,
+            'evolvable': asb.views.pokemon.evolvable_pokemon(trainer)}
 
 @view_config(name='edit', context=db.Trainer, renderer='/edit_trainer.mako',
   request_method='GET', permission='trainer.edit')
@@ -289,6 +295,8 @@ def edit_commit(trainer, request):
                 .all()
             )
 
+            asb.views.user.forget_principal(trainer.id)
+
         if form.trainer_item is not None:
             # Move item
             form.trainer_item.trainer_id = form.item_recipient.trainer.id
@@ -305,6 +313,7 @@ def edit_commit(trainer, request):
 
             # Add transaction
             transaction = db.BankTransaction(
+                id=db.ids.bank_transactions.next_id(),
                 trainer_id=trainer.id,
                 amount=amount,
                 state='from-mod',
@@ -312,7 +321,6 @@ def edit_commit(trainer, request):
             )
 
             db.DBSession.add(transaction)
-            db.DBSession.flush()
 
             # Add note
             note = db.BankTransactionNote(
@@ -324,7 +332,8 @@ def edit_commit(trainer, request):
             db.DBSession.add(note)
 
             # Add money (possibly negative)
-            trainer.money += amount
+            db.MoneyLedger.record(trainer.id, amount, 'mod')
+            db.TrainerNotifications.bump_bank(trainer.id, 'from-mod', 1)
 
         if form.promo_name.data:
             promotion = db.Promotion(
@@ -347,6 +356,7 @@ def edit_commit(trainer, request):
             )
 
             db.DBSession.add(recipient)
+            db.TrainerNotifications.bump(trainer.id, promotions=1)
     elif password_form.reset.data:
         # Handle the password reset form
         if not password_form.validate():
@@ -361,11 +371,15 @@ def edit_commit(trainer, request):
         if not ban_form.validate():
             return return_dict
 
-        db.DBSession.add(db.BannedTrainer(
-            trainer_id=trainer.id,
-            banned_by_trainer_id=request.user.id,
-            reason = ban_form.reason.data
-        ))
+        with db.PokemonFormPopulation.tracking(trainer_id=trainer.id):
+            db.DBSession.add(db.BannedTrainer(
+                trainer_id=trainer.id,
+                banned_by_trainer_id=request.user.id,
+                reason = ban_form.reason.data
+            ))
+
+        asb.views.user.forget_principal(trainer.id)
+        asb.autocomplete.refresh_trainers(trainer.id)
 
     # Calling it like this avoids the trailing slash and thus a second redirect
     return httpexc.HTTPSeeOther(
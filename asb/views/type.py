@@ -7,6 +7,8 @@ from sqlalchemy.orm import joinedload, subqueryload, subqueryload_all
 from sqlalchemy.orm.exc import NoResultFound
 
 from asb import db
+from asb.conditional import conditional_get
+from asb.output_cache import cacheable
 from asb.resources import TypeIndex
 
 def empty_matchup_dict():
@@ -28,13 +30,15 @@ defending_labels = {
     'ineffective': 'Immune to'
 }
 
-@view_config(context=TypeIndex, renderer='/indices/types.mako')
+@view_config(context=TypeIndex, renderer='/indices/types.mako',
+  decorator=(conditional_get, cacheable))
 def type_index(context, request):
     """The index of all the types, featuring a type chart."""
 
     return {'types': db.DBSession.query(db.Type).order_by(db.Type.id).all()}
 
-@view_config(context=db.Type, renderer='/type.mako')
+@view_config(context=db.Type, renderer='/type.mako',
+  decorator=(conditional_get, cacheable))
 def type_(context, request):
     """A type's dex page."""
 
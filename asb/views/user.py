@@ -1,58 +1,131 @@
+import collections
 import datetime
+import time
 
-import pbkdf2
 import pyramid.httpexceptions as httpexc
 import pyramid.security
 from pyramid.view import view_config
 import sqlalchemy as sqla
 import sqlalchemy.orm
+import transaction
 import wtforms
 
 from asb import db
+import asb.autocomplete
 import asb.forms
 import asb.tcodf
 
+Principal = collections.namedtuple('Principal',
+    ['trainer_id', 'roles', 'is_validated', 'banned_by', 'ban_reason'])
+
+# Per-worker cache of Principals, keyed by trainer ID; each value is a
+# (principal, expiry time) pair.  Other workers only find out about changes
+# when their copy expires, so the TTL should stay short.
+principal_cache = {}
+
+def load_principal(trainer_id):
+    """Fetch a trainer's roles, validation state, and ban in one query.
+
+    Return None if there's no such trainer.
+    """
+
+    banned_by = sqla.orm.aliased(db.Trainer)
+
+    rows = (
+        db.DBSession.query(db.Trainer.is_validated, db.Role.identifier,
+                           banned_by.name, db.BannedTrainer.reason)
+        .filter(db.Trainer.id == trainer_id)
+        .outerjoin(db.TrainerRole, db.TrainerRole.trainer_id == db.Trainer.id)
+        .outerjoin(db.Role, db.Role.id == db.TrainerRole.role_id)
+        .outerjoin(db.BannedTrainer,
+                   db.BannedTrainer.trainer_id == db.Trainer.id)
+        .outerjoin(banned_by,
+                   banned_by.id == db.BannedTrainer.banned_by_trainer_id)
+        .all()
+    )
+
+    if not rows:
+        return None
+
+    (is_validated, role, banned_by_name, ban_reason) = rows[0]
+    roles = tuple(role for (_, role, _, _) in rows if role is not None)
+
+    return Principal(trainer_id, roles, is_validated, banned_by_name,
+                     ban_reason)
+
+def get_principal(request):
+    """Get the Principal for the logged-in user, from the cache if possible.
+
+    This is a reified request method, so it's only ever looked up once per
+    request, no matter how many times permissions get checked.
+    """
+
+    trainer_id = pyramid.security.unauthenticated_userid(request)
+
+    if trainer_id is None:
+        return None
+
+    ttl = float(request.registry.settings.get('asb.principal_cache_ttl', 30))
+    now = time.monotonic()
+
+    try:
+        (principal, expiry) = principal_cache[trainer_id]
+    except KeyError:
+        pass
+    else:
+        if expiry > now:
+            return principal
+
+    principal = load_principal(trainer_id)
+
+    if principal is not None and ttl > 0:
+        principal_cache[trainer_id] = (principal, now + ttl)
+
+    return principal
+
+def forget_principal(*trainer_ids):
+    """Drop trainers from the principal cache, both now and once the current
+    transaction commits (so that a request that loads the old data in between
+    can't put it back).
+    """
+
+    def forget(success=True):
+        for trainer_id in trainer_ids:
+            principal_cache.pop(trainer_id, None)
+
+    forget()
+    transaction.get().addAfterCommitHook(forget)
+
 def get_user(request):
     """Get the logged-in user for a request."""
 
-    id = pyramid.security.unauthenticated_userid(request)
+    principal = request.principal
 
-    if id is None:
+    if principal is None:
         return None
 
-    user = (
-        db.DBSession.query(db.Trainer)
-        .options(sqla.orm.joinedload('ban'))
-        .get(id)
-    )
-
-    if user.ban is not None:
+    if principal.ban_reason is not None:
         request.session.flash(
             'You have been banned by {0} for the following reason: {1}'
-            .format(user.ban.banned_by.name, user.ban.reason)
+            .format(principal.banned_by, principal.ban_reason)
         )
         request.response.headers.extend(pyramid.security.forget(request))
         return None
 
-    return user
+    return db.DBSession.query(db.Trainer).get(principal.trainer_id)
 
 def get_user_roles(userid, request):
     """Get a user's roles for Pyramid authorization."""
 
-    try:
-        user = (
-            db.DBSession.query(db.Trainer)
-            .filter_by(id=userid)
-            .options(sqla.orm.subqueryload('roles'))
-            .one()
-        )
-    except sqla.orm.exc.NoResultFound:
+    principal = request.principal
+
+    if principal is None or principal.ban_reason is not None:
         return None
 
-    roles = [role.identifier for role in user.roles]
+    roles = list(principal.roles)
     roles.append('user:{}'.format(userid))
 
-    if user.is_validated:
+    if principal.is_validated:
         roles.append('validated')
 
     return roles
@@ -247,6 +320,7 @@ def register_commit(context, request):
 
     db.DBSession.add(user)
     db.DBSession.flush()  # Set their ID
+    db.TrainerNotifications.recount(user.id)
 
     user.set_password(form.password.data)
     user.update_identifier()
@@ -300,6 +374,11 @@ def validate(context, request):
         old_trainer.password_hash = trainer.password_hash
         old_trainer.name = trainer.name
 
+        (db.DBSession.query(db.TrainerNotifications)
+            .filter(db.TrainerNotifications.trainer_id.in_(
+                [trainer.id, old_trainer.id]))
+            .delete(synchronize_session=False))
+
         db.DBSession.delete(trainer)
         db.DBSession.flush()
 
@@ -309,11 +388,16 @@ def validate(context, request):
         trainer.unclaimed_from_hack = False
 
         # Update all their Pokémon's IDs
-        for pokemon in trainer.pokemon:
-            pokemon.id = db.DBSession.execute(asb.db.Pokemon.pokemon_id_seq)
+        ids = db.ids.pokemon.allocate(len(trainer.pokemon))
+
+        for (pokemon, new_id) in zip(trainer.pokemon, ids):
+            pokemon.id = new_id
             pokemon.birthday = datetime.datetime.utcnow().date()
             pokemon.update_identifier()
 
+        db.DBSession.flush()
+        db.TrainerNotifications.recount(trainer.id)
+
     username = info['username']
 
     if trainer.name != username:
@@ -323,7 +407,12 @@ def validate(context, request):
         trainer.update_identifier()
 
     trainer.tcodf_user_id = form.profile_link.tcodf_user_id
-    trainer.is_validated = True
+
+    with db.PokemonFormPopulation.tracking(trainer_id=trainer.id):
+        trainer.is_validated = True
+
+    forget_principal(trainer.id)
+    asb.autocomplete.refresh_trainers(trainer.id)
 
     return httpexc.HTTPSeeOther('/')
 
@@ -406,6 +495,7 @@ def settings_process(context, request):
 
         trainer.name = info['username']
         trainer.update_identifier()
+        asb.autocomplete.refresh_trainers(trainer.id)
     elif settings.save.data:
         if not settings.validate():
             return return_dict
@@ -438,25 +528,31 @@ def settings_process(context, request):
             db.DBSession.execute(sqla.sql.delete(table,
                 table.pokemon_id.in_(pokemon_ids)))
 
-        for table in [db.TrainerItem, db.Pokemon, db.BankTransaction,
-          db.PromotionRecipient]:
-            db.DBSession.execute(sqla.sql.delete(table,
-                table.trainer_id == trainer.id))
+        with db.PokemonFormPopulation.tracking(trainer_id=trainer.id):
+            for table in [db.TrainerItem, db.Pokemon, db.BankTransaction,
+              db.PromotionRecipient]:
+                db.DBSession.execute(sqla.sql.delete(table,
+                    table.trainer_id == trainer.id))
 
         if reset_delete.delete.data:
             # DELETE THEM
             # Roles carry over on reset, so we only delete them here
-            db.DBSession.execute(sqla.sql.delete(db.TrainerRole,
-                db.TrainerRole.trainer_id == trainer.id))
+            for table in [db.TrainerRole, db.TrainerNotifications,
+              db.MoneyLedger]:
+                db.DBSession.execute(sqla.sql.delete(table,
+                    table.trainer_id == trainer.id))
 
             db.DBSession.delete(trainer)
+            forget_principal(trainer.id)
+            asb.autocomplete.refresh_trainers(trainer.id)
 
             return httpexc.HTTPSeeOther('/',
                 headers=pyramid.security.forget(request))
         else:
             # Reset them
-            trainer.money = 45
+            db.MoneyLedger.set_balance(trainer.id, 45, 'reset')
             trainer.is_newbie = True
             trainer.last_collected_allowance = None
+            db.TrainerNotifications.recount(trainer.id)
 
     return httpexc.HTTPSeeOther('/')
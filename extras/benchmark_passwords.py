@@ -0,0 +1,69 @@
+"""Measure how many password checks (i.e. logins) per second one core can do
+with the old pbkdf2.crypt hashes and with asb.passwords.
+
+Run from the repository root, e.g.:
+
+    python extras/benchmark_passwords.py --seconds 5
+"""
+
+import argparse
+import sys
+import time
+
+import asb.passwords
+
+# Parse args
+parser = argparse.ArgumentParser(description='Benchmark password checking.')
+parser.add_argument('--seconds', type=float, default=3,
+    help='How long to run each benchmark for.')
+parser.add_argument('--iterations', type=int, default=4000,
+    help='PBKDF2 iterations for the new hashes.')
+parser.add_argument('--scrypt', action='store_true',
+    help='Also benchmark scrypt with its default parameters.')
+
+args = parser.parse_args(sys.argv[1:])
+
+def benchmark(label, check):
+    """Call check() repeatedly for a while, and print how many times per second
+    it managed.
+    """
+
+    count = 0
+    start = time.perf_counter()
+    end = start + args.seconds
+
+    while time.perf_counter() < end:
+        assert check()
+        count += 1
+
+    elapsed = time.perf_counter() - start
+    print('{0:<32} {1:>8.1f} logins/s/core'.format(label, count / elapsed))
+
+password = 'correct horse battery staple'
+
+# Old hashes
+try:
+    import pbkdf2
+except ImportError:
+    print('pbkdf2 not installed; skipping pbkdf2.crypt')
+else:
+    old_hash = pbkdf2.crypt(password)
+    benchmark('pbkdf2.crypt (400 iterations)',
+              lambda: pbkdf2.crypt(password, old_hash) == old_hash)
+
+# New hashes, first at the same cost as the old ones and then as configured
+asb.passwords.configure({'asb.password_pbkdf2_iterations': 400})
+new_hash = asb.passwords.hash_password(password)
+benchmark('pbkdf2-sha256 (400 iterations)',
+          lambda: asb.passwords.check_password(password, new_hash))
+
+asb.passwords.configure({'asb.password_pbkdf2_iterations': args.iterations})
+new_hash = asb.passwords.hash_password(password)
+benchmark('pbkdf2-sha256 ({0} iterations)'.format(args.iterations),
+          lambda: asb.passwords.check_password(password, new_hash))
+
+if args.scrypt:
+    asb.passwords.configure({'asb.password_scheme': 'scrypt'})
+    new_hash = asb.passwords.hash_password(password)
+    benchmark('scrypt ({0})'.format(asb.passwords.current_hasher.parameters),
+              lambda: asb.passwords.check_password(password, new_hash))
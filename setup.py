@@ -23,7 +23,12 @@ requires = [
 
 entry_points = {
     'paste.app_factory': 'main = asb:main',
-    'console_scripts': 'asbdb = asb.db.cli:main'
+    'console_scripts': [
+        'asbdb = asb.db.cli:main',
+        'asbassets = asb.assets:main',
+        'asbsprites = asb.sprites:main',
+        'asbtemplates = asb.startup:precompile_main'
+    ]
 }
 
 setuptools.setup(